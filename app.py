@@ -1,10 +1,27 @@
 import streamlit as st
-import tempfile
-import os
+import io
+import time
+import uuid
 import pandas as pd
 
-from inhoudsanalyse import vergelijk_werkprocessen
+from artefacten import OpgeslagenBestand, artefact_opslag
+from dossier import parse_dossier
+from inhoudsanalyse import (KOPPELING_NAAM, KOPPELING_SEMANTISCH, KOPPELING_TEKST, embedding_cache,
+                            vergelijk_werkprocessen_incrementeel)
+from resultaatcache import hash_inhoud, maak_sleutel, resultaat_cache
 from comparator import vergelijk_kds
+from export import CSV_MIME, EXCEL_MIME, PARQUET_MIME, naar_csv, naar_excel, naar_parquet
+from modelbeheer import MODEL_VARIANT, voorverwarm_model
+from taken import FOUT, KLAAR, taak_beheer
+from werkprocesindex import werkproces_index
+
+WERKPROCES_DREMPEL = 0.6
+# Verwachte stappen per analyse (paden uit instrumentatie), voor de voortgangsbalk
+KDS_STAPPEN = ["pdf_extractie", "vergelijk_kds/extractie", "vergelijk_kds/compare_all", "vergelijk_kds/excel_export"]
+WERKPROCES_STAPPEN = [
+    "pdf_extractie", "vergelijk_werkprocessen/werkprocesblokken", "vergelijk_werkprocessen/koppelen",
+    "vergelijk_werkprocessen/samenvatting", "vergelijk_werkprocessen/excel_export", "index_toevoegen"
+]
 
 st.set_page_config(page_title="Kwalificatiedossier Analyse", layout="wide")
 st.title("📚 Kwalificatiedossier Analyse Tool")
@@ -13,9 +30,138 @@ st.title("📚 Kwalificatiedossier Analyse Tool")
 for key in ["oud_pdf", "nieuw_pdf"]:
     if key not in st.session_state:
         st.session_state[key] = None
+sessie_id = st.session_state.setdefault("sessie_id", uuid.uuid4().hex)
+artefact_opslag.raak_aan(sessie_id)
+
+# Uploads en rapporten staan in de artefactopslag, gedeeld op inhoudshash en per sessie vastgehouden;
+# een nieuwe upload laat de artefacten van de vorige vergelijking in deze sessie los
+def bewaar_upload(key, upload):
+    data = upload.getvalue()
+    sleutel = f"{hash_inhoud(data)}.pdf"
+    vorige = st.session_state[key]
+    if not (isinstance(vorige, OpgeslagenBestand) and vorige.sleutel == sleutel):
+        anders = st.session_state["nieuw_pdf" if key == "oud_pdf" else "oud_pdf"]
+        artefact_opslag.laat_los(sessie_id, behalve=[anders.sleutel] if isinstance(anders, OpgeslagenBestand) else [])
+    # Ook bij dezelfde upload: schrijft het bestand opnieuw als het intussen is opgeruimd
+    artefact_opslag.bewaar(sessie_id, sleutel, data)
+    st.session_state[key] = OpgeslagenBestand(upload.name, sleutel, artefact_opslag)
+
+def lees_upload(key):
+    bestand = st.session_state[key]
+    if bestand is None:
+        return None, None
+    data = bestand.getvalue()
+    if data is None:
+        # Opgeruimd na lange inactiviteit of bij een volle opslag
+        st.session_state[key] = None
+        st.warning(f"📂 Het bestand {bestand.name} is niet meer beschikbaar; upload het opnieuw.")
+        return None, None
+    if isinstance(bestand, OpgeslagenBestand):
+        return bestand, bestand.sleutel.split(".")[0]
+    return bestand, hash_inhoud(data)
+
+def download_knoppen(sleutel, bestandsnaam, excel, df, excel_label, csv_label, parquet_label):
+    col1, col2, col3 = st.columns(3)
+    col1.download_button(
+        label=excel_label,
+        data=artefact_opslag.bereken(sessie_id, f"{sleutel}.xlsx", excel),
+        file_name=f"{bestandsnaam}.xlsx",
+        mime=EXCEL_MIME
+    )
+    col2.download_button(
+        label=csv_label,
+        data=artefact_opslag.bereken(sessie_id, f"{sleutel}.csv", lambda: naar_csv(df)),
+        file_name=f"{bestandsnaam}.csv",
+        mime=CSV_MIME
+    )
+    col3.download_button(
+        label=parquet_label,
+        data=artefact_opslag.bereken(sessie_id, f"{sleutel}.parquet", lambda: naar_parquet(df)),
+        file_name=f"{bestandsnaam}.parquet",
+        mime=PARQUET_MIME
+    )
+
+# Parse- en vergelijkingsresultaten worden gecachet op de SHA-256 van de uploads,
+# zodat een rerun zonder wijzigingen geen PDF opnieuw uitleest of vergelijkt
+def lees_dossier(bestand, upload_hash):
+    def parse():
+        bron = io.BytesIO(bestand.getvalue())
+        bron.name = bestand.name
+        return parse_dossier(bron)
+    return resultaat_cache.bereken(maak_sleutel("dossier", upload_hash), parse)
+
+# Het Excelrapport gaat direct de artefactopslag in; de resultaatcache houdt alleen de tabellen vast
+def vergelijk_kerntaken(oud, nieuw, sleutel):
+    df, excel_data = vergelijk_kds(oud, nieuw)
+    artefact_opslag.bewaar(sessie_id, f"{sleutel}.xlsx", excel_data)
+    return df
+
+# Na de werkprocesanalyse komen beide dossiers in de corpusindex; de vectoren zijn dan al berekend
+def analyseer_werkprocessen(oud, nieuw, vorige_toestand, sleutel):
+    df, samenvatting, excel_data, toestand = vergelijk_werkprocessen_incrementeel(
+        oud, nieuw, vorige=vorige_toestand, drempel=WERKPROCES_DREMPEL
+    )
+    artefact_opslag.bewaar(sessie_id, f"{sleutel}.xlsx", excel_data)
+    for dossier, blokken in zip((oud, nieuw), toestand.blokken):
+        werkproces_index.voeg_toe(dossier, vectoren=toestand.vectoren, blokken=blokken)
+    return df, samenvatting, toestand
+
+# Metingen per resultaatsleutel, zodat ook bij een cachetreffer de oorspronkelijke meting zichtbaar blijft
+def toon_metingen(rapport, sleutel):
+    metingen = st.session_state.setdefault("metingen", {})
+    if rapport is not None and rapport.stappen:
+        metingen[sleutel] = rapport
+    opgeslagen = metingen.get(sleutel)
+
+    with st.expander("⏱️ Tijd en geheugen per stap"):
+        if opgeslagen is None:
+            st.write("Geen metingen beschikbaar (instrumentatie uitgeschakeld of resultaat uit een eerdere sessie).")
+            return
+        if opgeslagen is not rapport:
+            st.caption("Resultaat kwam uit de cache; dit zijn de metingen van de oorspronkelijke berekening.")
+        st.caption(f"Totaal {opgeslagen.duur_s:.2f} s; geheugen gemeten als {opgeslagen.geheugenmodus}")
+        st.dataframe(opgeslagen.als_dataframe())
+        if opgeslagen.tellers:
+            st.dataframe(pd.DataFrame(list(opgeslagen.tellers.items()), columns=["Teller", "Aantal"]))
+
+# Analyses draaien als taak op de achtergrond; een rerun haakt aan bij de lopende taak voor
+# dezelfde uploads (ook die van een andere sessie) in plaats van opnieuw te beginnen
+def volg_taak(sleutel, functie, naam, stappen):
+    geannuleerd = st.session_state.setdefault("geannuleerde_taken", set())
+    losgekoppeld = st.session_state.setdefault("losgekoppelde_taken", set())
+    if sleutel in losgekoppeld:
+        st.info("⏹️ Deze sessie volgt de analyse niet meer; hij loopt door voor een andere sessie.")
+        if not st.button("🔁 Weer volgen", key=f"volg_{naam}"):
+            return None
+        losgekoppeld.discard(sleutel)
+
+    taak = taak_beheer.haal(sleutel)
+    if sleutel in geannuleerd or (taak is not None and taak.status == FOUT):
+        if sleutel in geannuleerd:
+            st.warning("⏹️ Analyse geannuleerd.")
+        else:
+            st.error(f"Fout bij {naam}: {taak.fout}")
+        if not st.button("🔁 Opnieuw starten", key=f"opnieuw_{naam}"):
+            return None
+        geannuleerd.discard(sleutel)
+
+    taak = taak_beheer.dien_in(sleutel, functie, naam=naam, sessie=sessie_id, stappen=stappen)
+    if taak.status == KLAAR:
+        return taak
+    if taak.actief:
+        st.progress(taak.voortgang, text=f"⏳ {taak.huidige_stap or 'In de wachtrij'}...")
+        if st.button("⏹️ Annuleren", key=f"annuleer_{naam}"):
+            if taak_beheer.annuleer(sleutel, sessie_id):
+                geannuleerd.add(sleutel)
+            elif taak.actief:
+                # Een andere sessie wacht nog op dezelfde taak: alleen deze sessie haakt af
+                losgekoppeld.add(sleutel)
+            st.rerun()
+        st.session_state["taken_actief"] = True
+    return None
 
 # Tabs voor twee functies
-tabs = st.tabs(["🔍 Vergelijk op kerntaakniveau", "🧠 Inhoudelijke werkprocesanalyse"])
+tabs = st.tabs(["🔍 Vergelijk op kerntaakniveau", "🧠 Inhoudelijke werkprocesanalyse", "🔎 Zoeken in alle dossiers"])
 
 # --- TAB 1: KDvergelijker2 --- #
 with tabs[0]:
@@ -26,38 +172,33 @@ with tabs[0]:
     with col1:
         oud_pdf = st.file_uploader("⬅️ Oud dossier (PDF)", type="pdf", key="upload_oud")
         if oud_pdf:
-            st.session_state["oud_pdf"] = oud_pdf
+            bewaar_upload("oud_pdf", oud_pdf)
     with col2:
         nieuw_pdf = st.file_uploader("➡️ Nieuw dossier (PDF)", type="pdf", key="upload_nieuw")
         if nieuw_pdf:
-            st.session_state["nieuw_pdf"] = nieuw_pdf
+            bewaar_upload("nieuw_pdf", nieuw_pdf)
 
-    oud_pdf = st.session_state["oud_pdf"]
-    nieuw_pdf = st.session_state["nieuw_pdf"]
+    oud_pdf, oud_hash = lees_upload("oud_pdf")
+    nieuw_pdf, nieuw_hash = lees_upload("nieuw_pdf")
 
     if oud_pdf and nieuw_pdf:
         st.write("Bestanden geüpload, vergelijking start...")
         try:
-            oud_pdf.seek(0)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp1:
-                tmp1.write(oud_pdf.read())
-                oud_path = tmp1.name
-
-            nieuw_pdf.seek(0)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp2:
-                tmp2.write(nieuw_pdf.read())
-                nieuw_path = tmp2.name
-
-            result_df, excel_path = vergelijk_kds(oud_path, nieuw_path)
-            st.success("✅ Vergelijking voltooid")
-            st.dataframe(result_df)
-
-            with open(excel_path, "rb") as f:
-                st.download_button(
-                    label="📥 Download Excel (kerntaakvergelijking)",
-                    data=f,
-                    file_name="kd_kerntaak_vergelijking.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            sleutel = maak_sleutel("kerntaakvergelijking", oud_hash, nieuw_hash)
+            taak = volg_taak(
+                sleutel,
+                lambda: vergelijk_kerntaken(lees_dossier(oud_pdf, oud_hash), lees_dossier(nieuw_pdf, nieuw_hash), sleutel),
+                "kerntaakvergelijking", KDS_STAPPEN
+            )
+            if taak is not None:
+                result_df = taak.resultaat
+                st.success("✅ Vergelijking voltooid")
+                st.dataframe(result_df)
+                toon_metingen(taak.rapport, sleutel)
+
+                download_knoppen(
+                    sleutel, "kd_kerntaak_vergelijking", lambda: naar_excel({"Sheet1": result_df}), result_df,
+                    "📥 Download Excel (kerntaakvergelijking)", "📥 Download CSV", "📥 Download Parquet"
                 )
         except Exception as e:
             st.error(f"Fout bij vergelijken: {e}")
@@ -67,39 +208,112 @@ with tabs[1]:
     st.header("🧠 Inhoudelijke vergelijking op werkprocesniveau")
     st.markdown("Vergelijkt werkprocessen inhoudelijk (semantisch, inclusief impactscore).")
 
-    oud_pdf = st.session_state["oud_pdf"]
-    nieuw_pdf = st.session_state["nieuw_pdf"]
+    oud_pdf, oud_hash = lees_upload("oud_pdf")
+    nieuw_pdf, nieuw_hash = lees_upload("nieuw_pdf")
 
     if oud_pdf and nieuw_pdf:
         st.write("Bestanden geüpload, werkproces-analyse start...")
         try:
-            oud_pdf.seek(0)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp1:
-                tmp1.write(oud_pdf.read())
-                oud_path = tmp1.name
-
-            nieuw_pdf.seek(0)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp2:
-                tmp2.write(nieuw_pdf.read())
-                nieuw_path = tmp2.name
-
-            df, samenvatting, excel_path = vergelijk_werkprocessen(oud_path, nieuw_path)
-            st.success("✅ Analyse voltooid")
-
-            st.subheader("📋 Gedetailleerde vergelijking per werkproces")
-            st.dataframe(df)
-
-            st.subheader("🧾 Samenvatting per kerntaak")
-            st.dataframe(samenvatting)
-
-            with open(excel_path, "rb") as f:
-                st.download_button(
-                    label="📥 Download Excelrapport (2 tabbladen)",
-                    data=f,
-                    file_name="vergelijking_resultaat.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            sleutel = maak_sleutel(
+                "werkprocesanalyse", oud_hash, nieuw_hash, model=MODEL_VARIANT, drempel=WERKPROCES_DREMPEL
+            )
+            # Bij een nieuw concept van een van beide dossiers worden alleen de gewijzigde
+            # werkprocesblokken opnieuw berekend ten opzichte van de vorige analyse in deze sessie
+            vorige_toestand = st.session_state.get("werkproces_toestand")
+            taak = volg_taak(
+                sleutel,
+                lambda: analyseer_werkprocessen(
+                    lees_dossier(oud_pdf, oud_hash), lees_dossier(nieuw_pdf, nieuw_hash), vorige_toestand, sleutel
+                ),
+                "werkprocesanalyse", WERKPROCES_STAPPEN
+            )
+            if taak is not None:
+                df, samenvatting, toestand = taak.resultaat
+                st.session_state["werkproces_toestand"] = toestand
+                st.success("✅ Analyse voltooid")
+
+                st.subheader("📋 Gedetailleerde vergelijking per werkproces")
+                st.dataframe(df)
+
+                st.subheader("🧾 Samenvatting per kerntaak")
+                st.dataframe(samenvatting)
+
+                cache_stats = embedding_cache.statistieken()
+                st.caption(
+                    f"Embeddingcache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                    f"({cache_stats['items']}/{cache_stats['max_items']} vectoren opgeslagen)"
+                )
+                koppelingen = df["Koppeling"].value_counts()
+                st.caption(
+                    f"Gekoppeld: {koppelingen.get(KOPPELING_TEKST, 0)} op identieke tekst, "
+                    f"{koppelingen.get(KOPPELING_NAAM, 0)} op naam, {koppelingen.get(KOPPELING_SEMANTISCH, 0)} semantisch; "
+                    f"{toestand.statistieken['ge-encodeerde_blokken']} werkprocessen ge-encodeerd, "
+                    f"{toestand.statistieken['hergebruikte_vectoren']} vectoren uit de vorige run hergebruikt"
+                )
+                toon_metingen(taak.rapport, sleutel)
+
+                download_knoppen(
+                    sleutel, "vergelijking_resultaat",
+                    lambda: naar_excel({"Werkprocessen": df, "Samenvatting": samenvatting}), df,
+                    "📥 Download Excelrapport (2 tabbladen)", "📥 Download CSV (werkprocessen)",
+                    "📥 Download Parquet (werkprocessen)"
                 )
         except Exception as e:
             st.error(f"Fout bij inhoudsanalyse: {e}")
     else:
         st.info("📂 Upload eerst beide PDF-bestanden in de eerste tab om de analyse te starten.")
+
+# --- TAB 3: Zoeken in de werkprocesindex --- #
+with tabs[2]:
+    st.header("🔎 Vergelijkbare werkprocessen in alle dossiers")
+    st.markdown("Zoekt in alle dossiers die eerder zijn geanalyseerd naar inhoudelijk vergelijkbare werkprocessen.")
+
+    index_stats = werkproces_index.statistieken()
+    st.caption(
+        f"Index: {index_stats['werkprocessen']} werkprocessen uit {index_stats['dossiers']} dossiers "
+        f"(zoekmethode: {index_stats['methode']})"
+    )
+    if not index_stats["werkprocessen"]:
+        st.info("📂 De index is nog leeg; dossiers worden toegevoegd bij de werkprocesanalyse.")
+    else:
+        try:
+            zoekwijze = st.radio("Zoek op", ["Vrije tekst", "Werkproces uit de index"], horizontal=True)
+            aantal = st.slider("Aantal resultaten", min_value=5, max_value=50, value=10, step=5)
+            zoek_resultaat = None
+            start = time.perf_counter()
+            if zoekwijze == "Vrije tekst":
+                zoektekst = st.text_area("Beschrijving van het werkproces")
+                if zoektekst.strip():
+                    zoek_resultaat = werkproces_index.zoek(zoektekst, k=aantal)
+            else:
+                overzicht = werkproces_index.dossiers()
+                col1, col2 = st.columns(2)
+                dossier_id = col1.selectbox(
+                    "Dossier", overzicht["Dossier"],
+                    format_func=lambda d: f"{d} – {overzicht.set_index('Dossier').loc[d, 'Kwalificatie']}"
+                )
+                werkprocessen = werkproces_index.werkprocessen(dossier_id)
+                code = col2.selectbox(
+                    "Werkproces", [w["code"] for w in werkprocessen],
+                    format_func=lambda c: f"{c} {next(w['naam'] for w in werkprocessen if w['code'] == c)}"
+                )
+                ander_dossier = st.checkbox("Alleen werkprocessen uit andere dossiers", value=True)
+                if code:
+                    zoek_resultaat = werkproces_index.zoek_werkproces(dossier_id, code, k=aantal,
+                                                                      ander_dossier=ander_dossier)
+            if zoek_resultaat is not None:
+                st.caption(f"Gezocht in {(time.perf_counter() - start) * 1000:.0f} ms")
+                st.dataframe(zoek_resultaat)
+
+            with st.expander("📚 Dossiers in de index"):
+                st.dataframe(werkproces_index.dossiers())
+        except Exception as e:
+            st.error(f"Fout bij zoeken: {e}")
+
+# Laad het embeddingmodel op de achtergrond nu de pagina staat, zodat de eerste werkprocesanalyse niet hoeft te wachten
+voorverwarm_model()
+
+# Zolang er voor deze sessie een taak loopt, ververst de pagina zichzelf om de voortgang te tonen
+if st.session_state.pop("taken_actief", False):
+    time.sleep(1)
+    st.rerun()
@@ -0,0 +1,244 @@
+"""
+Module voor het tijdelijk bewaren van uploads en rapporten per sessie.
+
+Artefacten (een geüploade PDF, een Excel-, CSV- of Parquet-rapport) staan als bestand in een
+gedeelde map, onder een sleutel die uit inhoudshashes is afgeleid: twee sessies met dezelfde
+upload of hetzelfde rapport delen één bestand. Iedere sessie die een artefact gebruikt houdt er
+een verwijzing naar vast. Zo blijven uploads en rapporten buiten het geheugen van de sessies,
+terwijl de map niet onbegrensd groeit:
+
+- een artefact zonder verwijzingen wordt na de TTL verwijderd;
+- een sessie die langer dan de TTL niet is gezien laat al haar verwijzingen los;
+- boven de maximale omvang worden de minst recent gebruikte artefacten verwijderd, eerst die
+  zonder verwijzingen (een rapport is daarna opnieuw te maken via bereken);
+- bij het starten worden achtergebleven tijdelijke bestanden en verlopen artefacten van een
+  vorig proces opgeruimd; de rest wordt overgenomen.
+
+Omgevingsvariabelen:
+    KD_ARTEFACTEN: map voor de artefacten (standaard kd-artefacten in de tijdelijke map)
+    KD_ARTEFACTEN_MAX_MB: maximale omvang van de map in MB (standaard 512)
+    KD_ARTEFACTEN_TTL: seconden dat een ongebruikt artefact of inactieve sessie blijft staan (standaard 7200)
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Set
+
+STANDAARD_MAP = os.environ.get("KD_ARTEFACTEN") or os.path.join(tempfile.gettempdir(), "kd-artefacten")
+STANDAARD_MAX_BYTES = int(float(os.environ.get("KD_ARTEFACTEN_MAX_MB", "512")) * 1024 * 1024)
+STANDAARD_TTL = float(os.environ.get("KD_ARTEFACTEN_TTL", "7200"))
+
+# Niet vaker dan dit aantal seconden een volledige opruimronde vanuit raak_aan
+OPRUIM_INTERVAL = 60
+GELDIGE_SLEUTEL = re.compile(r"^[\w-]+\.\w+$")
+
+
+@dataclass
+class Artefact:
+    """Een bewaard bestand met de sessies die ernaar verwijzen."""
+    sleutel: str
+    grootte: int
+    gebruikt: float
+    sessies: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class OpgeslagenBestand:
+    """Verwijzing naar een bewaarde upload; biedt name en getvalue() zoals een Streamlit-upload."""
+    name: str
+    sleutel: str
+    opslag: "ArtefactOpslag"
+
+    def getvalue(self) -> Optional[bytes]:
+        """De inhoud, of None als het artefact inmiddels is opgeruimd."""
+        return self.opslag.haal(self.sleutel)
+
+
+class ArtefactOpslag:
+    """Begrensde, gedeelde opslag van artefacten met verwijzingen per sessie."""
+
+    def __init__(self, map: str = STANDAARD_MAP, max_bytes: int = STANDAARD_MAX_BYTES, ttl: float = STANDAARD_TTL):
+        """
+        Initialiseert de opslag; de map wordt pas bij het eerste gebruik doorzocht.
+
+        Args:
+            map: Map waarin de artefacten worden bewaard
+            max_bytes: Maximale totale omvang van de artefacten
+            ttl: Seconden dat een artefact zonder verwijzingen, of een inactieve sessie, blijft bestaan
+        """
+        self.map = map
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._artefacten: Dict[str, Artefact] = {}
+        self._sessies: Dict[str, float] = {}  # sessie -> laatst gezien
+        self._lock = threading.RLock()
+        self._gestart = False
+        self._laatst_opgeruimd = 0.0
+        self.verwijderd = 0
+
+    def _pad(self, sleutel: str) -> str:
+        return os.path.join(self.map, sleutel)
+
+    def _start(self):
+        """Opruimronde bij het eerste gebruik: verwijdert restanten van een vorig proces."""
+        if self._gestart:
+            return
+        self._gestart = True
+        os.makedirs(self.map, exist_ok=True)
+        nu = time.time()
+        for naam in os.listdir(self.map):
+            pad = self._pad(naam)
+            try:
+                status = os.stat(pad)
+                if naam.endswith(".tmp") or not GELDIGE_SLEUTEL.match(naam) or nu - status.st_mtime > self.ttl:
+                    os.remove(pad)
+                    self.verwijderd += 1
+                else:
+                    self._artefacten[naam] = Artefact(naam, status.st_size, status.st_mtime)
+            except OSError:
+                continue
+        self._ruim_op(nu)
+
+    def _verwijs(self, artefact: Artefact, sessie: Optional[str], nu: float):
+        artefact.gebruikt = nu
+        if sessie is not None:
+            artefact.sessies.add(sessie)
+            self._sessies[sessie] = nu
+
+    def bewaar(self, sessie: Optional[str], sleutel: str, data: bytes) -> str:
+        """
+        Bewaart een artefact (als het er nog niet is) en laat de sessie ernaar verwijzen.
+
+        Args:
+            sessie: Id van de sessie, of None voor een artefact zonder eigenaar
+            sleutel: Bestandsnaam van de vorm <hash>.<extensie>, bijv. een inhoudshash met .pdf
+            data: De inhoud
+
+        Returns:
+            De sleutel
+        """
+        if not GELDIGE_SLEUTEL.match(sleutel):
+            raise ValueError(f"Ongeldige artefactsleutel {sleutel!r}; verwacht <hash>.<extensie>")
+        with self._lock:
+            self._start()
+            nu = time.time()
+            artefact = self._artefacten.get(sleutel)
+            if artefact is None or not os.path.exists(self._pad(sleutel)):
+                tijdelijk_pad = f"{self._pad(sleutel)}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tijdelijk_pad, "wb") as f:
+                    f.write(data)
+                os.replace(tijdelijk_pad, self._pad(sleutel))
+                artefact = self._artefacten[sleutel] = Artefact(sleutel, len(data), nu)
+            self._verwijs(artefact, sessie, nu)
+            self._ruim_op(nu)
+        return sleutel
+
+    def haal(self, sleutel: str, sessie: Optional[str] = None) -> Optional[bytes]:
+        """Geeft de inhoud van een artefact, of None als het er (niet meer) is."""
+        with self._lock:
+            self._start()
+            artefact = self._artefacten.get(sleutel)
+            if artefact is None:
+                return None
+            try:
+                with open(self._pad(sleutel), "rb") as f:
+                    data = f.read()
+                # De wijzigingstijd houdt de leeftijd bij voor de opruimronde van een volgend proces
+                os.utime(self._pad(sleutel))
+            except OSError:
+                del self._artefacten[sleutel]
+                return None
+            self._verwijs(artefact, sessie, time.time())
+            return data
+
+    def bereken(self, sessie: Optional[str], sleutel: str, functie: Callable[[], bytes]) -> bytes:
+        """
+        Geeft een artefact en maakt het met functie als het er nog niet is (of al is opgeruimd).
+
+        Args:
+            sessie: Id van de sessie die het artefact gebruikt
+            sleutel: Bestandsnaam van de vorm <hash>.<extensie>
+            functie: Functie zonder argumenten die de inhoud maakt
+        """
+        data = self.haal(sleutel, sessie)
+        if data is None:
+            data = functie()
+            self.bewaar(sessie, sleutel, data)
+        return data
+
+    def laat_los(self, sessie: str, behalve: Iterable[str] = ()):
+        """
+        Laat een sessie haar verwijzingen loslaten, bijv. na een nieuwe upload.
+
+        Args:
+            sessie: Id van de sessie
+            behalve: Sleutels die de sessie blijft gebruiken
+        """
+        behalve = set(behalve)
+        with self._lock:
+            for sleutel, artefact in self._artefacten.items():
+                if sleutel not in behalve:
+                    artefact.sessies.discard(sessie)
+
+    def raak_aan(self, sessie: str):
+        """Meldt dat een sessie nog actief is; ruimt zo nu en dan op."""
+        with self._lock:
+            self._start()
+            nu = time.time()
+            self._sessies[sessie] = nu
+            if nu - self._laatst_opgeruimd >= OPRUIM_INTERVAL:
+                self._ruim_op(nu)
+
+    def ruim_op(self):
+        """Voert direct een opruimronde uit."""
+        with self._lock:
+            self._start()
+            self._ruim_op(time.time())
+
+    def _ruim_op(self, nu: float):
+        self._laatst_opgeruimd = nu
+        verlopen = {sessie for sessie, gezien in self._sessies.items() if nu - gezien > self.ttl}
+        for sessie in verlopen:
+            del self._sessies[sessie]
+        for artefact in self._artefacten.values():
+            artefact.sessies -= verlopen
+
+        te_verwijderen = {s for s, a in self._artefacten.items() if not a.sessies and nu - a.gebruikt > self.ttl}
+        totaal = sum(a.grootte for s, a in self._artefacten.items() if s not in te_verwijderen)
+        if totaal > self.max_bytes:
+            # Eerst artefacten zonder verwijzingen, daarna de minst recent gebruikte
+            kandidaten = sorted(
+                (a for s, a in self._artefacten.items() if s not in te_verwijderen),
+                key=lambda a: (bool(a.sessies), a.gebruikt)
+            )
+            for artefact in kandidaten:
+                if totaal <= self.max_bytes:
+                    break
+                te_verwijderen.add(artefact.sleutel)
+                totaal -= artefact.grootte
+
+        for sleutel in te_verwijderen:
+            del self._artefacten[sleutel]
+            try:
+                os.remove(self._pad(sleutel))
+            except OSError:
+                pass
+            self.verwijderd += 1
+
+    def statistieken(self) -> Dict:
+        """Aantal artefacten, totale omvang, actieve sessies en het aantal verwijderde artefacten."""
+        with self._lock:
+            return {
+                "artefacten": len(self._artefacten),
+                "bytes": sum(a.grootte for a in self._artefacten.values()),
+                "max_bytes": self.max_bytes,
+                "sessies": len(self._sessies),
+                "verwijderd": self.verwijderd
+            }
+
+
+# Gedeelde opslag voor alle sessies in dit proces
+artefact_opslag = ArtefactOpslag()
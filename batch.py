@@ -0,0 +1,217 @@
+"""
+Batchmodus voor het vergelijken van veel oud/nieuw-paren van kwalificatiedossiers zonder Streamlit.
+
+Gebruik:
+    python batch.py <map of manifest.csv> --uitvoer rapporten/ [--workers 4]
+
+Een map wordt gekoppeld op bestandsnaam: <naam>_oud.pdf hoort bij <naam>_nieuw.pdf.
+Een manifest is een CSV met de kolommen oud, nieuw en optioneel naam; relatieve paden
+gelden ten opzichte van de map van het manifest.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Sequence
+
+import pandas as pd
+
+from export import naar_csv, naar_excel, naar_parquet
+
+ANALYSES = ("kerntaken", "werkprocessen")
+FORMATEN = ("xlsx", "csv", "parquet")
+
+
+def zoek_paren(bron: str) -> List[Dict]:
+    """
+    Bepaalt de te vergelijken paren uit een map of een manifest-CSV.
+
+    Returns:
+        Lijst van dictionaries met naam, oud en nieuw
+    """
+    paren = []
+    if os.path.isdir(bron):
+        bestanden = {f.lower(): f for f in os.listdir(bron)}
+        for kleine_naam, bestand in sorted(bestanden.items()):
+            match = re.match(r"(.+)_oud\.pdf$", kleine_naam)
+            if not match or f"{match.group(1)}_nieuw.pdf" not in bestanden:
+                continue
+            paren.append({
+                "naam": bestand[:len(match.group(1))],
+                "oud": os.path.join(bron, bestand),
+                "nieuw": os.path.join(bron, bestanden[f"{match.group(1)}_nieuw.pdf"])
+            })
+    else:
+        basis = os.path.dirname(os.path.abspath(bron))
+        with open(bron, newline="", encoding="utf-8-sig") as f:
+            for rij in csv.DictReader(f):
+                oud = os.path.join(basis, rij["oud"].strip())
+                nieuw = os.path.join(basis, rij["nieuw"].strip())
+                naam = (rij.get("naam") or "").strip() or os.path.splitext(os.path.basename(nieuw))[0]
+                paren.append({"naam": naam, "oud": oud, "nieuw": nieuw})
+
+    # Dubbele namen zouden elkaars rapporten overschrijven
+    gezien = {}
+    for paar in paren:
+        basisnaam = re.sub(r"[^\w.-]+", "_", paar["naam"])
+        gezien[basisnaam] = gezien.get(basisnaam, 0) + 1
+        paar["naam"] = basisnaam if gezien[basisnaam] == 1 else f"{basisnaam}_{gezien[basisnaam]}"
+    return paren
+
+
+def _init_worker(analyses: List[str], model_threads: int):
+    """Laadt het model een keer per workerproces en verdeelt de CPU-threads over de workers."""
+    if "werkprocessen" in analyses:
+        from modelbeheer import laad_model
+
+        laad_model(threads=model_threads)
+
+
+def _schrijf_rapport(paar_map: str, naam: str, df: pd.DataFrame, excel_data: bytes, formaten: Sequence[str]):
+    """Schrijft een rapport in de gevraagde formaten; Excel komt al als bytes uit de pipeline."""
+    for formaat in formaten:
+        data = {"xlsx": lambda: excel_data, "csv": lambda: naar_csv(df), "parquet": lambda: naar_parquet(df)}[formaat]()
+        with open(os.path.join(paar_map, f"{naam}.{formaat}"), "wb") as f:
+            f.write(data)
+
+
+def vergelijk_paar(paar: Dict, uitvoer: str, analyses: List[str], formaten: Sequence[str] = ("xlsx",)) -> Dict:
+    """
+    Vergelijkt een enkel paar en schrijft de rapporten naar uitvoer/<naam>/.
+
+    Fouten worden teruggegeven in plaats van opgegooid, zodat de batch doorloopt.
+    """
+    from comparator import vergelijk_kds
+    from dossier import parse_dossier
+    from inhoudsanalyse import vergelijk_werkprocessen
+
+    start = time.perf_counter()
+    resultaat = {"naam": paar["naam"], "oud": paar["oud"], "nieuw": paar["nieuw"], "status": "ok", "fout": ""}
+    try:
+        paar_map = os.path.join(uitvoer, paar["naam"])
+        os.makedirs(paar_map, exist_ok=True)
+
+        # Een proces per paar: extractie binnen het paar blijft sequentieel
+        oud = parse_dossier(paar["oud"], workers=1)
+        nieuw = parse_dossier(paar["nieuw"], workers=1)
+        resultaat["paginas_oud"] = oud.aantal_paginas
+        resultaat["paginas_nieuw"] = nieuw.aantal_paginas
+
+        if "kerntaken" in analyses:
+            df, excel_data = vergelijk_kds(oud, nieuw)
+            _schrijf_rapport(paar_map, "kerntaakvergelijking", df, excel_data, formaten)
+            resultaat["kerntaak_regels"] = len(df)
+
+        if "werkprocessen" in analyses:
+            df, _, excel_data = vergelijk_werkprocessen(oud, nieuw)
+            _schrijf_rapport(paar_map, "werkprocesvergelijking", df, excel_data, formaten)
+            resultaat["werkprocessen"] = len(df)
+            for impact in ["Gewijzigd", "Toegevoegd", "Verwijderd"]:
+                resultaat[impact.lower()] = int((df["Impact"] == impact).sum())
+    except Exception as e:
+        resultaat["status"] = "fout"
+        resultaat["fout"] = f"{type(e).__name__}: {e}"
+        resultaat["traceback"] = traceback.format_exc()
+
+    resultaat["duur_s"] = round(time.perf_counter() - start, 2)
+    return resultaat
+
+
+def _formatteer_duur(seconden: float) -> str:
+    minuten, seconden = divmod(int(seconden), 60)
+    uren, minuten = divmod(minuten, 60)
+    return f"{uren}u{minuten:02d}m{seconden:02d}s" if uren else f"{minuten}m{seconden:02d}s"
+
+
+def voer_batch_uit(paren: List[Dict], uitvoer: str, workers: int, analyses: List[str],
+                   formaten: Sequence[str] = ("xlsx",)) -> pd.DataFrame:
+    """
+    Vergelijkt alle paren over een procespool en schrijft een geconsolideerde samenvatting.
+
+    Returns:
+        DataFrame met een regel per paar
+    """
+    os.makedirs(uitvoer, exist_ok=True)
+    model_threads = max(1, (os.cpu_count() or 1) // workers)
+    resultaten = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(analyses, model_threads)
+    ) as pool:
+        futures = {pool.submit(vergelijk_paar, paar, uitvoer, analyses, formaten): paar for paar in paren}
+        for future in as_completed(futures):
+            try:
+                resultaat = future.result()
+            except Exception as e:
+                # Bijv. een worker die is gecrasht; het paar telt als mislukt
+                paar = futures[future]
+                resultaat = {"naam": paar["naam"], "oud": paar["oud"], "nieuw": paar["nieuw"],
+                             "status": "fout", "fout": f"{type(e).__name__}: {e}"}
+            resultaten.append(resultaat)
+
+            klaar = len(resultaten)
+            verstreken = time.perf_counter() - start
+            doorvoer = klaar / verstreken if verstreken else 0.0
+            eta = (len(paren) - klaar) / doorvoer if doorvoer else 0.0
+            melding = "ok" if resultaat["status"] == "ok" else f"FOUT ({resultaat['fout']})"
+            print(
+                f"[{klaar}/{len(paren)}] {resultaat['naam']}: {melding} | "
+                f"{doorvoer * 60:.1f} paren/min | ETA {_formatteer_duur(eta)}",
+                file=sys.stderr, flush=True
+            )
+
+    volgorde = {paar["naam"]: i for i, paar in enumerate(paren)}
+    resultaten.sort(key=lambda r: volgorde[r["naam"]])
+    for resultaat in resultaten:
+        if resultaat.get("traceback"):
+            os.makedirs(os.path.join(uitvoer, resultaat["naam"]), exist_ok=True)
+            with open(os.path.join(uitvoer, resultaat["naam"], "fout.txt"), "w", encoding="utf-8") as f:
+                f.write(resultaat.pop("traceback"))
+
+    samenvatting = pd.DataFrame(resultaten)
+    samenvatting.to_csv(os.path.join(uitvoer, "samenvatting.csv"), index=False)
+    with open(os.path.join(uitvoer, "samenvatting.xlsx"), "wb") as f:
+        f.write(naar_excel({"Samenvatting": samenvatting}))
+    return samenvatting
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vergelijk veel paren kwalificatiedossiers in batch.")
+    parser.add_argument("bron", help="Map met <naam>_oud.pdf/<naam>_nieuw.pdf of een manifest-CSV (oud,nieuw[,naam])")
+    parser.add_argument("--uitvoer", default="batch_rapporten", help="Map voor rapporten en samenvatting")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Aantal workerprocessen (standaard de helft van het aantal CPU-kernen)")
+    parser.add_argument("--analyse", choices=["beide", *ANALYSES], default="beide",
+                        help="Welke vergelijking(en) per paar uitvoeren")
+    parser.add_argument("--formaat", nargs="+", choices=FORMATEN, default=["xlsx"],
+                        help="Formaten van de rapporten per paar")
+    args = parser.parse_args(argv)
+
+    paren = zoek_paren(args.bron)
+    if not paren:
+        print(f"Geen paren gevonden in {args.bron}", file=sys.stderr)
+        return 2
+
+    analyses = list(ANALYSES) if args.analyse == "beide" else [args.analyse]
+    start = time.perf_counter()
+    samenvatting = voer_batch_uit(paren, args.uitvoer, args.workers, analyses, args.formaat)
+    mislukt = int((samenvatting["status"] != "ok").sum())
+    print(
+        f"{len(paren) - mislukt}/{len(paren)} paren vergeleken in {_formatteer_duur(time.perf_counter() - start)}; "
+        f"samenvatting in {os.path.join(args.uitvoer, 'samenvatting.csv')}",
+        file=sys.stderr
+    )
+    return 1 if mislukt else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
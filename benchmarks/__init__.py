@@ -0,0 +1,6 @@
+"""
+Benchmarks voor de analysepijplijn op synthetische kwalificatiedossiers.
+
+Uitvoeren vanuit de hoofdmap van de repository:
+    python -m benchmarks.run
+"""
@@ -0,0 +1,134 @@
+"""
+Belastingstest voor de HTTP-dienst (dienst.py): latentie (p50/p90/p99) en doorvoer onder gelijktijdige verzoeken.
+
+Gebruik (vanuit de hoofdmap van de repository, met de dienst al gestart):
+    python -m benchmarks.belasting [--url http://127.0.0.1:8765] [--analyse kerntaken]
+                                   [--verzoeken 100] [--gelijktijdig 8] [--pdf oud.pdf nieuw.pdf]
+                                   [--uniek] [--uitvoer pad.json]
+
+Zonder --pdf wordt een synthetisch dossierpaar als tekst verstuurd. Met --uniek krijgt ieder
+verzoek een eigen variant van het nieuwe dossier, zodat de resultaatcache van de dienst niets
+afvangt en de meting de echte vergelijking laat zien. Geweigerde verzoeken (503, wachtrij vol)
+tellen apart en worden niet opnieuw geprobeerd: ze laten zien waar de tegendruk begint.
+"""
+import argparse
+import base64
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.synthetisch import SynthetischeConfig, genereer_paar
+
+
+def _percentielen(duren: List[float]) -> Dict:
+    if not duren:
+        return {}
+    return {
+        "p50_ms": round(float(np.percentile(duren, 50)) * 1000, 1),
+        "p90_ms": round(float(np.percentile(duren, 90)) * 1000, 1),
+        "p99_ms": round(float(np.percentile(duren, 99)) * 1000, 1),
+        "gemiddeld_ms": round(statistics.mean(duren) * 1000, 1),
+        "max_ms": round(max(duren) * 1000, 1)
+    }
+
+
+def maak_verzoeken(aantal: int, pdf: Optional[List[str]], uniek: bool, config: SynthetischeConfig) -> List[bytes]:
+    """Maakt de JSON-bodies; bij uniek krijgt ieder verzoek een ander nieuw dossier."""
+    if pdf:
+        with open(pdf[0], "rb") as f:
+            oud = {"pdf": base64.b64encode(f.read()).decode("ascii")}
+        with open(pdf[1], "rb") as f:
+            nieuw_pdf = f.read()
+        # Een PDF valt niet zomaar te variëren; een extra byte na %%EOF verandert wel de hash
+        return [
+            json.dumps({"oud": oud, "nieuw": {"pdf": base64.b64encode(
+                nieuw_pdf + (f"\n%{i}".encode() if uniek else b"")
+            ).decode("ascii")}}).encode("utf-8")
+            for i in range(aantal)
+        ]
+
+    oud_paginas, nieuw_paginas = genereer_paar(config)
+    oud = {"tekst": "\f".join(oud_paginas)}
+    return [
+        json.dumps({"oud": oud, "nieuw": {
+            "tekst": "\f".join(nieuw_paginas) + (f"\nVerzoek {i}" if uniek else "")
+        }}).encode("utf-8")
+        for i in range(aantal)
+    ]
+
+
+def stuur(url: str, body: bytes, timeout: float) -> Tuple[int, float]:
+    """Verstuurt een verzoek en geeft (HTTP-status, duur in seconden)."""
+    verzoek = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(verzoek, timeout=timeout) as antwoord:
+            antwoord.read()
+            status = antwoord.status
+    except urllib.request.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.request.URLError, TimeoutError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def voer_uit(url: str, verzoeken: List[bytes], gelijktijdig: int, timeout: float) -> Dict:
+    """Verstuurt alle verzoeken met een vast aantal gelijktijdige clients."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=gelijktijdig) as pool:
+        uitkomsten = list(pool.map(lambda body: stuur(url, body, timeout), verzoeken))
+    totaal = time.perf_counter() - start
+
+    statussen = {}
+    for status, _ in uitkomsten:
+        statussen[str(status)] = statussen.get(str(status), 0) + 1
+    geslaagd = [duur for status, duur in uitkomsten if status == 200]
+    geweigerd = [duur for status, duur in uitkomsten if status == 503]
+    return {
+        "verzoeken": len(verzoeken),
+        "gelijktijdig": gelijktijdig,
+        "duur_s": round(totaal, 2),
+        "doorvoer_per_s": round(len(geslaagd) / totaal, 2) if totaal else None,
+        "statussen": statussen,
+        "geslaagd": _percentielen(geslaagd),
+        "geweigerd": _percentielen(geweigerd)
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Belastingstest voor de vergelijkingsdienst.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--analyse", choices=["kerntaken", "werkprocessen"], default="kerntaken")
+    parser.add_argument("--verzoeken", type=int, default=100)
+    parser.add_argument("--gelijktijdig", type=int, default=8, help="Aantal gelijktijdige clients")
+    parser.add_argument("--pdf", nargs=2, metavar=("OUD", "NIEUW"), help="PDF's in plaats van een synthetisch paar")
+    parser.add_argument("--uniek", action="store_true", help="Ieder verzoek een ander nieuw dossier (geen cachetreffers)")
+    parser.add_argument("--timeout", type=float, default=600, help="Clienttimeout per verzoek in seconden")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--uitvoer", help="Pad om het resultaat als JSON op te slaan")
+    args = parser.parse_args(argv)
+
+    url = f"{args.url.rstrip('/')}/vergelijk/{args.analyse}"
+    verzoeken = maak_verzoeken(args.verzoeken + 1, args.pdf, args.uniek, SynthetischeConfig(seed=args.seed))
+    # Een extra verzoek vooraf, zodat het laden van het model niet in de percentielen zit
+    status, duur = stuur(url, verzoeken.pop(), args.timeout)
+    print(f"Opwarmverzoek: status {status} in {duur * 1000:.0f} ms", file=sys.stderr)
+
+    resultaat = voer_uit(url, verzoeken, args.gelijktijdig, args.timeout)
+    resultaat.update({"analyse": args.analyse, "uniek": args.uniek, "url": url})
+    print(json.dumps(resultaat, indent=2))
+    if args.uitvoer:
+        with open(args.uitvoer, "w", encoding="utf-8") as f:
+            json.dump(resultaat, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Meet de duur en het piekgeheugen van iedere stap van de analyse op synthetische dossiers.
+
+Gebruik (vanuit de hoofdmap van de repository):
+    python -m benchmarks.run [--groottes klein middel groot] [--herhalingen 5] [--pdf]
+                             [--zonder-model] [--uitvoer pad.json] [--vergelijk eerder.json]
+
+Iedere stap wordt een aantal keer gemeten (mediaan en minimum) en daarna nog een keer
+onder tracemalloc voor het piekgeheugen aan Python-allocaties. Geheugen van native
+bibliotheken (torch, pdfminer-buffers) valt daarbuiten; daarvoor staat de maximale RSS
+van het proces in de resultaten. De resultaten worden als JSON opgeslagen, zodat runs
+voor en na een wijziging met --vergelijk naast elkaar kunnen worden gezet.
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+import inhoudsanalyse
+from comparator import DossierComparator
+from dossier import parse_dossier
+from embeddingcache import EmbeddingCache
+from export import naar_excel
+from extractie import extracteer_data
+from modelbeheer import MODEL_VARIANT, laad_model
+
+from benchmarks.synthetisch import SynthetischeConfig, als_dossier, genereer_paar, schrijf_pdf
+
+RESULTATEN_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultaten")
+
+GROOTTES = {
+    "klein": SynthetischeConfig(kerntaken=2, werkprocessen_per_kerntaak=4, vakkennis=15, extra_paginas=2),
+    "middel": SynthetischeConfig(kerntaken=4, werkprocessen_per_kerntaak=6, vakkennis=40, extra_paginas=10),
+    "groot": SynthetischeConfig(kerntaken=8, werkprocessen_per_kerntaak=10, vakkennis=120, extra_paginas=40),
+}
+
+
+def _meet(functie: Callable[[], object], herhalingen: int,
+          voorbereiding: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Meet een stap herhaaldelijk en een keer extra onder tracemalloc.
+
+    Args:
+        functie: De te meten stap
+        herhalingen: Aantal getimede uitvoeringen
+        voorbereiding: Wordt voor iedere uitvoering buiten de meting aangeroepen (bijv. een lege cache)
+
+    Returns:
+        Dictionary met mediaan_s, min_s, herhalingen en piek_geheugen_mb
+    """
+    tijden = []
+    for _ in range(herhalingen):
+        if voorbereiding:
+            voorbereiding()
+        start = time.perf_counter()
+        functie()
+        tijden.append(time.perf_counter() - start)
+
+    # Aparte run voor het geheugen: tracemalloc vertraagt de stap zelf te veel om mee te timen
+    if voorbereiding:
+        voorbereiding()
+    tracemalloc.start()
+    try:
+        functie()
+        _, piek = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mediaan_s": round(statistics.median(tijden), 6),
+        "min_s": round(min(tijden), 6),
+        "herhalingen": herhalingen,
+        "piek_geheugen_mb": round(piek / 2 ** 20, 3)
+    }
+
+
+def _max_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KiB op Linux en in bytes op macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTATEN_MAP)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _lees_selecties(dossier):
+    """Leest de pagina's uit die de kerntaakvergelijking en de werkprocesanalyse opvragen."""
+    return dossier.selectie("kerntaken").tekst, dossier.selectie("werkprocessen").tekst
+
+
+def benchmark_grootte(config: SynthetischeConfig, herhalingen: int, met_pdf: bool, met_model: bool) -> Dict:
+    """
+    Voert alle stappen uit voor een dossierpaar van een bepaalde grootte.
+
+    Returns:
+        Dictionary met de config, de omvang van het paar en per stap de metingen
+    """
+    oud_paginas, nieuw_paginas = genereer_paar(config)
+    stappen = {}
+
+    if met_pdf:
+        with tempfile.TemporaryDirectory() as map_:
+            oud_pdf = os.path.join(map_, "oud.pdf")
+            nieuw_pdf = os.path.join(map_, "nieuw.pdf")
+            schrijf_pdf(oud_paginas, oud_pdf)
+            schrijf_pdf(nieuw_paginas, nieuw_pdf)
+            # Lui: pagina-index plus het uitlezen van de pagina's die beide analyses nodig hebben
+            stappen["pdf_parse"] = _meet(
+                lambda: [_lees_selecties(parse_dossier(pdf, workers=1)) for pdf in (oud_pdf, nieuw_pdf)], herhalingen
+            )
+            stappen["pdf_parse_volledig"] = _meet(
+                lambda: [parse_dossier(pdf, workers=1, lui=False) for pdf in (oud_pdf, nieuw_pdf)], herhalingen
+            )
+
+    # Verse dossierobjecten per uitvoering, anders meten we de gecachte samengevoegde tekst
+    dossiers = {}
+
+    def nieuwe_dossiers():
+        dossiers["oud"] = als_dossier(oud_paginas, "oud")
+        dossiers["nieuw"] = als_dossier(nieuw_paginas, "nieuw")
+
+    stappen["extractie"] = _meet(
+        lambda: (extracteer_data(dossiers["oud"]), extracteer_data(dossiers["nieuw"])), herhalingen, nieuwe_dossiers
+    )
+
+    oud_tekst = als_dossier(oud_paginas).gefilterde_tekst
+    nieuw_tekst = als_dossier(nieuw_paginas).gefilterde_tekst
+    stappen["werkprocesblokken"] = _meet(
+        lambda: (inhoudsanalyse.extract_werkprocesblokken(oud_tekst),
+                 inhoudsanalyse.extract_werkprocesblokken(nieuw_tekst)),
+        herhalingen
+    )
+    oud_blokken = inhoudsanalyse.extract_werkprocesblokken(oud_tekst)
+    nieuw_blokken = inhoudsanalyse.extract_werkprocesblokken(nieuw_tekst)
+    oud_teksten = oud_blokken.teksten
+    nieuw_teksten = nieuw_blokken.teksten
+
+    oud_data = extracteer_data(als_dossier(oud_paginas))
+    nieuw_data = extracteer_data(als_dossier(nieuw_paginas))
+    kds_df = pd.DataFrame(DossierComparator(copy.deepcopy(oud_data), copy.deepcopy(nieuw_data)).compare_all())
+    invoer = {}
+
+    def nieuwe_comparator():
+        invoer["comparator"] = DossierComparator(copy.deepcopy(oud_data), copy.deepcopy(nieuw_data))
+
+    stappen["compare_all"] = _meet(lambda: invoer["comparator"].compare_all(), herhalingen, nieuwe_comparator)
+
+    bladen = {"Sheet1": kds_df}
+    if met_model:
+        originele_cache = inhoudsanalyse.embedding_cache
+        with tempfile.TemporaryDirectory() as cache_map:
+            def lege_cache():
+                # Iedere koude meting krijgt een eigen lege map, zodat er geen eerdere vectoren zijn
+                inhoudsanalyse.embedding_cache = EmbeddingCache(MODEL_VARIANT, map=tempfile.mkdtemp(dir=cache_map))
+
+            try:
+                alle_teksten = [t for t in oud_teksten + nieuw_teksten if t.strip()]
+                stappen["embedding_koud"] = _meet(
+                    lambda: inhoudsanalyse.encodeer_teksten(alle_teksten), herhalingen, lege_cache
+                )
+                stappen["embedding_warm"] = _meet(lambda: inhoudsanalyse.encodeer_teksten(alle_teksten), herhalingen)
+                stappen["matching"] = _meet(
+                    lambda: inhoudsanalyse.koppel_werkprocessen(
+                        inhoudsanalyse.bereken_similariteitsmatrix(oud_teksten, nieuw_teksten)
+                    ),
+                    herhalingen
+                )
+                stappen["matching_trapsgewijs"] = _meet(
+                    lambda: inhoudsanalyse.koppel_trapsgewijs(oud_blokken, nieuw_blokken), herhalingen
+                )
+                werkproces_df, samenvatting, _ = inhoudsanalyse.vergelijk_werkprocessen(
+                    als_dossier(oud_paginas), als_dossier(nieuw_paginas)
+                )
+                bladen = {"Sheet1": kds_df, "Werkprocessen": werkproces_df, "Samenvatting": samenvatting}
+            finally:
+                inhoudsanalyse.embedding_cache = originele_cache
+
+    stappen["excel_export"] = _meet(lambda: naar_excel(bladen), herhalingen)
+
+    return {
+        "config": config.als_dict(),
+        "omvang": {
+            "paginas_oud": len(oud_paginas),
+            "paginas_nieuw": len(nieuw_paginas),
+            "tekens_oud": len(oud_tekst),
+            "tekens_nieuw": len(nieuw_tekst),
+            "werkprocessen_oud": len(oud_blokken),
+            "werkprocessen_nieuw": len(nieuw_blokken),
+            "rapportregels": int(sum(len(df) for df in bladen.values()))
+        },
+        "stappen": stappen
+    }
+
+
+def vergelijk_runs(eerder: Dict, nu: Dict) -> pd.DataFrame:
+    """
+    Zet de medianen van twee runs naast elkaar.
+
+    Returns:
+        DataFrame met per grootte en stap de oude en nieuwe mediaan en de versnelling
+    """
+    regels = []
+    for grootte, resultaat in nu["resultaten"].items():
+        eerdere_stappen = eerder.get("resultaten", {}).get(grootte, {}).get("stappen", {})
+        for stap, meting in resultaat["stappen"].items():
+            oud = eerdere_stappen.get(stap, {}).get("mediaan_s")
+            regels.append({
+                "grootte": grootte,
+                "stap": stap,
+                "eerder_s": oud,
+                "nu_s": meting["mediaan_s"],
+                "versnelling": round(oud / meting["mediaan_s"], 2) if oud and meting["mediaan_s"] else None,
+                "eerder_piek_mb": eerdere_stappen.get(stap, {}).get("piek_geheugen_mb"),
+                "nu_piek_mb": meting["piek_geheugen_mb"]
+            })
+    return pd.DataFrame(regels)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de analysestappen op synthetische dossiers.")
+    parser.add_argument("--groottes", nargs="+", choices=list(GROOTTES), default=list(GROOTTES))
+    parser.add_argument("--herhalingen", type=int, default=5, help="Getimede uitvoeringen per stap")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hernoem", type=float, help="Fractie hernoemde werkprocessen")
+    parser.add_argument("--verschuif", type=float, help="Kans per kerntaak op hernummerde werkprocessen")
+    parser.add_argument("--bewerk", type=float, help="Fractie werkprocessen met bewerkte tekst")
+    parser.add_argument("--pdf", action="store_true", help="Ook PDF's genereren en de extractie daaruit meten")
+    parser.add_argument("--zonder-model", action="store_true", help="Embedding- en matchingstappen overslaan")
+    parser.add_argument("--uitvoer", help="Pad van het JSON-resultaat (standaard benchmarks/resultaten/<tijdstip>.json)")
+    parser.add_argument("--vergelijk", help="Eerder JSON-resultaat om deze run mee te vergelijken")
+    args = parser.parse_args(argv)
+    # De instrumentatie blijft meelopen (en telt dus mee in de metingen), maar logt niet per herhaling
+    logging.getLogger("kd.instrumentatie").setLevel(logging.WARNING)
+
+    mutaties = {veld: waarde for veld, waarde in (
+        ("hernoem_fractie", args.hernoem), ("verschuif_fractie", args.verschuif), ("bewerk_fractie", args.bewerk)
+    ) if waarde is not None}
+
+    met_model = not args.zonder_model
+    stappen_model = {}
+    if met_model:
+        start = time.perf_counter()
+        try:
+            laad_model()
+            stappen_model["model_laden_s"] = round(time.perf_counter() - start, 3)
+        except Exception as e:
+            print(f"Model niet beschikbaar ({type(e).__name__}: {e}); embeddingstappen worden overgeslagen",
+                  file=sys.stderr)
+            met_model = False
+
+    resultaten = {}
+    for grootte in args.groottes:
+        config = replace(GROOTTES[grootte], seed=args.seed, **mutaties)
+        print(f"Benchmark {grootte}...", file=sys.stderr, flush=True)
+        resultaten[grootte] = benchmark_grootte(config, args.herhalingen, args.pdf, met_model)
+        for stap, meting in resultaten[grootte]["stappen"].items():
+            print(f"  {stap:<18} {meting['mediaan_s'] * 1000:10.1f} ms  piek {meting['piek_geheugen_mb']:8.2f} MB",
+                  file=sys.stderr)
+
+    run = {
+        "meta": {
+            "tijdstip": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": MODEL_VARIANT if met_model else None,
+            **stappen_model,
+            "herhalingen": args.herhalingen,
+            "max_rss_mb": _max_rss_mb()
+        },
+        "resultaten": resultaten
+    }
+
+    uitvoer = args.uitvoer or os.path.join(RESULTATEN_MAP, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(uitvoer)), exist_ok=True)
+    with open(uitvoer, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+    print(f"Resultaten opgeslagen in {uitvoer}", file=sys.stderr)
+
+    if args.vergelijk:
+        with open(args.vergelijk, encoding="utf-8") as f:
+            eerder = json.load(f)
+        print(vergelijk_runs(eerder, run).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
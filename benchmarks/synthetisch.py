@@ -0,0 +1,204 @@
+"""
+Generator voor synthetische kwalificatiedossiers in de structuur die extractie.py en
+inhoudsanalyse.py verwachten.
+
+Een paar bestaat uit een oude en een nieuwe versie; de nieuwe versie ontstaat uit de oude
+via instelbare percentages hernoemde, verschoven, bewerkte, toegevoegde en verwijderde
+werkprocessen. Alles is deterministisch voor een gegeven seed.
+"""
+import random
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+from dossier import GeparseerdDossier, Pagina, is_inhoudsopgave
+
+WOORDEN = (
+    "de beveiliger signaleert risico's en rapporteert incidenten aan de opdrachtgever "
+    "controleert toegang tot het object surveilleert volgens de instructies verleent "
+    "eerste hulp bij ongevallen handelt calamiteiten af communiceert met bezoekers "
+    "houdt toezicht op naleving van huisregels registreert bevindingen in het logboek "
+    "werkt samen met collega's en hulpdiensten neemt preventieve maatregelen tegen brand "
+    "beoordeelt situaties en grijpt tijdig in volgens wet- en regelgeving"
+).split()
+
+REGELS_PER_PAGINA = 45
+
+
+@dataclass
+class SynthetischeConfig:
+    """Instellingen voor een synthetisch dossierpaar."""
+    kerntaken: int = 4
+    werkprocessen_per_kerntaak: int = 5
+    vakkennis: int = 30
+    zinnen_per_werkproces: int = 6
+    hernoem_fractie: float = 0.1
+    verschuif_fractie: float = 0.1
+    bewerk_fractie: float = 0.2
+    toevoeg_fractie: float = 0.05
+    verwijder_fractie: float = 0.05
+    extra_paginas: int = 5
+    seed: int = 0
+
+    def als_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _zin(rng: random.Random, lengte: int = 12) -> str:
+    return " ".join(rng.choice(WOORDEN) for _ in range(lengte)).capitalize() + "."
+
+
+def _naam(rng: random.Random) -> str:
+    return " ".join(rng.choice(WOORDEN) for _ in range(rng.randint(2, 5))).capitalize()
+
+
+def _bewerk(rng: random.Random, tekst: str, fractie: float = 0.2) -> str:
+    """Vervangt een deel van de woorden, zoals een redactionele herziening zou doen."""
+    woorden = tekst.split()
+    for i in range(len(woorden)):
+        if rng.random() < fractie:
+            woorden[i] = rng.choice(WOORDEN)
+    return " ".join(woorden)
+
+
+def _genereer_inhoud(config: SynthetischeConfig, rng: random.Random) -> Dict:
+    """Genereert de inhoud (los van opmaak) van een oud dossier."""
+    kerntaken = []
+    for k in range(1, config.kerntaken + 1):
+        werkprocessen = []
+        for w in range(1, config.werkprocessen_per_kerntaak + 1):
+            werkprocessen.append({
+                "nummer": w,
+                "naam": _naam(rng),
+                "zinnen": [_zin(rng) for _ in range(config.zinnen_per_werkproces)]
+            })
+        kerntaken.append({"nummer": k, "naam": _naam(rng), "werkprocessen": werkprocessen})
+    return {
+        "crebo_dossier": str(rng.randint(20000, 29999)),
+        "crebo_kwalificatie": str(rng.randint(20000, 29999)),
+        "naam": _naam(rng),
+        "versie": str(rng.randint(2016, 2024)),
+        "context": [_zin(rng) for _ in range(4)],
+        "beroepshouding": [_zin(rng) for _ in range(4)],
+        "resultaat": [_zin(rng) for _ in range(3)],
+        "vakkennis": [_naam(rng) for _ in range(config.vakkennis)],
+        "kerntaken": kerntaken
+    }
+
+
+def _muteer(inhoud: Dict, config: SynthetischeConfig, rng: random.Random) -> Dict:
+    """Maakt een nieuwe versie van een dossier volgens de mutatiefracties in de config."""
+    nieuw = {
+        **inhoud,
+        "versie": str(int(inhoud["versie"]) + 3),
+        "context": [_bewerk(rng, z) for z in inhoud["context"]],
+        "vakkennis": [(_naam(rng) if rng.random() < config.bewerk_fractie else v) for v in inhoud["vakkennis"]],
+        "kerntaken": []
+    }
+    for kerntaak in inhoud["kerntaken"]:
+        werkprocessen = []
+        for wp in kerntaak["werkprocessen"]:
+            if rng.random() < config.verwijder_fractie:
+                continue
+            wp = dict(wp)
+            if rng.random() < config.hernoem_fractie:
+                wp["naam"] = _bewerk(rng, wp["naam"], 0.4)
+            if rng.random() < config.bewerk_fractie:
+                wp["zinnen"] = [_bewerk(rng, z) for z in wp["zinnen"]]
+            werkprocessen.append(wp)
+            if rng.random() < config.toevoeg_fractie:
+                werkprocessen.append({
+                    "naam": _naam(rng),
+                    "zinnen": [_zin(rng) for _ in range(config.zinnen_per_werkproces)]
+                })
+        # Verschuiven: een werkproces vooraan invoegen hernummert alle volgende codes
+        if werkprocessen and rng.random() < config.verschuif_fractie:
+            werkprocessen.insert(0, {
+                "naam": _naam(rng),
+                "zinnen": [_zin(rng) for _ in range(config.zinnen_per_werkproces)]
+            })
+        for nummer, wp in enumerate(werkprocessen, start=1):
+            wp["nummer"] = nummer
+        nieuw["kerntaken"].append({**kerntaak, "werkprocessen": werkprocessen})
+    return nieuw
+
+
+def _opmaak(inhoud: Dict, config: SynthetischeConfig, rng: random.Random) -> List[str]:
+    """Zet dossierinhoud om naar paginateksten zoals pdfplumber die zou opleveren."""
+    voorblad = [
+        "Kwalificatiedossier",
+        f"Crebonummer kwalificatiedossier: {inhoud['crebo_dossier']}",
+        f"Crebonummer kwalificatie: {inhoud['crebo_kwalificatie']}",
+        f"Naam kwalificatie: {inhoud['naam']}",
+        f"Versie: {inhoud['versie']}",
+        "Geldig vanaf: 01-08-" + inhoud["versie"]
+    ]
+    inhoudsopgave = ["Inhoud"]
+    overzicht = ["Overzicht van het kwalificatiedossier"]
+    romp = ["Context", *inhoud["context"], "",
+            "Typerende beroepshouding", *inhoud["beroepshouding"], "",
+            "Resultaat van de beroepsgroep", *inhoud["resultaat"], "",
+            "Vakkennis en vaardigheden", *[f"• {v}" for v in inhoud["vakkennis"]], ""]
+
+    for kerntaak in inhoud["kerntaken"]:
+        kt_code = f"B1-K{kerntaak['nummer']}"
+        inhoudsopgave.append(f"{kt_code} {kerntaak['naam']} {'.' * 20} {rng.randint(5, 40)}")
+        overzicht.append(f"{kt_code} {kerntaak['naam']}")
+        romp.append(f"{kt_code} {kerntaak['naam']}")
+        for wp in kerntaak["werkprocessen"]:
+            wp_code = f"{kt_code}-W{wp['nummer']}"
+            inhoudsopgave.append(f"{wp_code} {wp['naam']} {'.' * 20} {rng.randint(5, 40)}")
+            overzicht.append(f"{wp_code} {wp['naam']}")
+            romp.append(f"{wp_code}: {wp['naam']}")
+            romp.extend(wp["zinnen"])
+
+    paginas = ["\n".join(voorblad), "\n".join(inhoudsopgave)]
+    for regels in (overzicht, romp):
+        for start in range(0, len(regels), REGELS_PER_PAGINA):
+            paginas.append("\n".join(regels[start:start + REGELS_PER_PAGINA]))
+    for _ in range(config.extra_paginas):
+        paginas.append("\n".join(_zin(rng) for _ in range(REGELS_PER_PAGINA // 2)))
+    return paginas
+
+
+def genereer_paar(config: SynthetischeConfig) -> Tuple[List[str], List[str]]:
+    """
+    Genereert een oud en een nieuw dossier als lijsten van paginateksten.
+
+    Returns:
+        Tuple van (oude pagina's, nieuwe pagina's)
+    """
+    rng = random.Random(config.seed)
+    oud = _genereer_inhoud(config, rng)
+    nieuw = _muteer(oud, config, rng)
+    return _opmaak(oud, config, rng), _opmaak(nieuw, config, rng)
+
+
+def als_dossier(paginas: List[str], naam: str = "synthetisch") -> GeparseerdDossier:
+    """Maakt een GeparseerdDossier van paginateksten, zonder PDF-stap."""
+    return GeparseerdDossier(
+        bron=naam,
+        paginas=[Pagina(nummer, tekst, is_inhoudsopgave(tekst)) for nummer, tekst in enumerate(paginas, start=1)]
+    )
+
+
+def schrijf_pdf(paginas: List[str], pad: str):
+    """
+    Schrijft paginateksten naar een eenvoudige PDF, om ook de extractiestap te kunnen meten.
+
+    Vereist reportlab (pip install reportlab); dat is geen afhankelijkheid van de applicatie zelf.
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+    except ImportError as e:
+        raise RuntimeError("Voor het genereren van PDF's is reportlab nodig: pip install reportlab") from e
+
+    pdf = canvas.Canvas(pad, pagesize=A4)
+    for tekst in paginas:
+        y = 800
+        for regel in tekst.split("\n"):
+            if regel:
+                pdf.drawString(40, y, regel[:110])
+            y -= 16
+        pdf.showPage()
+    pdf.save()
@@ -0,0 +1,221 @@
+"""
+Module voor een compacte, kolomgewijze representatie van geëxtraheerde codes en werkprocesblokken.
+
+Codes (kerntaken, werkprocessen) en werkprocesblokken worden niet als losse dictionaries
+bewaard maar als kolommen: codes zijn geïnterneerd, kerntaak en deel worden een keer per
+unieke code afgeleid, en de tekst van een blok is een begin/eind-offset in de dossiertekst
+in plaats van een eigen kopie. Een rij is op te vragen als lichtgewicht record; dat ondersteunt
+ook nog de oude dictionary-toegang (blok["tekst"]).
+
+Een BlokTabel is als Parquet te bewaren (met dictionary-gecodeerde codes) en daaruit terug te lezen.
+"""
+import io
+import sys
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from export import naar_parquet
+
+
+@lru_cache(maxsize=None)
+def bepaal_deel(code: str) -> str:
+    if code.startswith("B"):
+        return "Basisdeel"
+    elif code.startswith("P"):
+        return "Profieldeel"
+    else:
+        return "Algemeen"
+
+
+@lru_cache(maxsize=None)
+def bepaal_kerntaak(code: str) -> str:
+    """Geeft de kerntaakcode van een werkprocescode, bijv. B1-K2 voor B1-K2-W3."""
+    return sys.intern("-".join(code.split("-")[:2]))
+
+
+class CodeRegel:
+    """Een code met naam, als record uit een CodeTabel."""
+    __slots__ = ("code", "naam")
+
+    def __init__(self, code: str, naam: str):
+        self.code = code
+        self.naam = naam
+
+    def __getitem__(self, sleutel: str) -> str:
+        # Oude aanroepers gebruikten dictionaries met de sleutels code en naam
+        return getattr(self, sleutel)
+
+    def __eq__(self, ander) -> bool:
+        return isinstance(ander, CodeRegel) and (self.code, self.naam) == (ander.code, ander.naam)
+
+    def __repr__(self) -> str:
+        return f"CodeRegel({self.code!r}, {self.naam!r})"
+
+    def als_dict(self) -> Dict[str, str]:
+        return {"code": self.code, "naam": self.naam}
+
+
+class CodeTabel:
+    """Kolommen met codes en namen van kerntaken of werkprocessen, in documentvolgorde."""
+    __slots__ = ("codes", "namen", "_posities")
+
+    def __init__(self, codes: Sequence[str] = (), namen: Sequence[str] = ()):
+        self.codes: List[str] = [sys.intern(code) for code in codes]
+        self.namen: List[str] = list(namen)
+        self._posities: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[CodeRegel]:
+        return (CodeRegel(code, naam) for code, naam in zip(self.codes, self.namen))
+
+    def __getitem__(self, index: int) -> CodeRegel:
+        return CodeRegel(self.codes[index], self.namen[index])
+
+    def __eq__(self, ander) -> bool:
+        return isinstance(ander, CodeTabel) and self.codes == ander.codes and self.namen == ander.namen
+
+    def __getstate__(self):
+        return self.codes, self.namen
+
+    def __setstate__(self, toestand):
+        self.codes, self.namen = toestand
+        self._posities = None
+
+    def positie(self, code: str) -> Optional[int]:
+        """Geeft de index van de laatste rij met deze code, of None."""
+        if self._posities is None:
+            self._posities = {c: i for i, c in enumerate(self.codes)}
+        return self._posities.get(code)
+
+    def als_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({"code": pd.Categorical(self.codes), "naam": self.namen})
+
+
+class WerkprocesBlok:
+    """Een werkprocesblok als record uit een BlokTabel; de tekst wordt pas bij opvragen uitgesneden."""
+    __slots__ = ("_tabel", "_index")
+
+    def __init__(self, tabel: "BlokTabel", index: int):
+        self._tabel = tabel
+        self._index = index
+
+    code = property(lambda self: self._tabel.codes[self._index])
+    naam = property(lambda self: self._tabel.namen[self._index])
+    kerntaak = property(lambda self: self._tabel.kerntaken[self._index])
+    deel = property(lambda self: self._tabel.delen[self._index])
+    tekst = property(lambda self: self._tabel.tekst_van(self._index))
+
+    def __getitem__(self, sleutel: str) -> str:
+        # Oude aanroepers gebruikten dictionaries met code, kerntaak, naam, tekst en deel
+        if sleutel not in ("code", "naam", "kerntaak", "deel", "tekst"):
+            raise KeyError(sleutel)
+        return getattr(self, sleutel)
+
+    def __repr__(self) -> str:
+        return f"WerkprocesBlok({self.code!r}, {self.naam!r})"
+
+    def als_dict(self) -> Dict[str, str]:
+        return {"code": self.code, "kerntaak": self.kerntaak, "naam": self.naam, "tekst": self.tekst, "deel": self.deel}
+
+
+class BlokTabel:
+    """
+    Werkprocesblokken van een dossier als kolommen met offsets in een gedeelde tekstbuffer.
+
+    Attributes:
+        tekst: De buffer waarin de blokteksten staan, meestal de gefilterde dossiertekst zelf
+        codes: Geïnterneerde werkprocescodes
+        namen: Namen van de werkprocessen
+        kerntaken: Geïnterneerde kerntaakcodes, afgeleid van de codes
+        delen: Basisdeel, Profieldeel of Algemeen, afgeleid van de codes
+        start: Beginoffset van iedere bloktekst in de buffer
+        eind: Eindoffset (exclusief) van iedere bloktekst in de buffer
+    """
+    __slots__ = ("tekst", "codes", "namen", "kerntaken", "delen", "start", "eind")
+
+    def __init__(self, tekst: str = "", codes: Sequence[str] = (), namen: Sequence[str] = (),
+                 start: Sequence[int] = (), eind: Sequence[int] = ()):
+        self.tekst = tekst
+        self.codes: List[str] = [sys.intern(code) for code in codes]
+        self.namen: List[str] = list(namen)
+        self.kerntaken: List[str] = [bepaal_kerntaak(code) for code in self.codes]
+        self.delen: List[str] = [bepaal_deel(code) for code in self.codes]
+        self.start = np.asarray(start, dtype=np.int64)
+        self.eind = np.asarray(eind, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __iter__(self) -> Iterator[WerkprocesBlok]:
+        return (WerkprocesBlok(self, i) for i in range(len(self.codes)))
+
+    def __getitem__(self, index: int) -> WerkprocesBlok:
+        if not -len(self.codes) <= index < len(self.codes):
+            raise IndexError(index)
+        return WerkprocesBlok(self, index % len(self.codes))
+
+    def __getstate__(self):
+        # Alleen de stukken van de buffer die bij een blok horen gaan mee in een pickle
+        return self.codes, self.namen, self.teksten
+
+    def __setstate__(self, toestand):
+        codes, namen, teksten = toestand
+        tekst, start, eind = _buffer_uit_teksten(teksten)
+        BlokTabel.__init__(self, tekst, codes, namen, start, eind)
+
+    def tekst_van(self, index: int) -> str:
+        return self.tekst[self.start[index]:self.eind[index]]
+
+    @property
+    def teksten(self) -> List[str]:
+        """Alle blokteksten, in volgorde."""
+        return [self.tekst[s:e] for s, e in zip(self.start.tolist(), self.eind.tolist())]
+
+    def selecteer(self, indices: Sequence[int]) -> "BlokTabel":
+        """Geeft een tabel met alleen de gegeven rijen; de tekstbuffer wordt gedeeld, niet gekopieerd."""
+        indices = list(indices)
+        return BlokTabel(
+            self.tekst, [self.codes[i] for i in indices], [self.namen[i] for i in indices],
+            self.start[indices], self.eind[indices]
+        )
+
+    def niet_leeg(self) -> "BlokTabel":
+        """Geeft de blokken waarvan de tekst niet leeg is."""
+        return self.selecteer([i for i in range(len(self)) if self.eind[i] > self.start[i]])
+
+    def als_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "code": pd.Categorical(self.codes),
+            "kerntaak": pd.Categorical(self.kerntaken),
+            "naam": self.namen,
+            "tekst": self.teksten,
+            "deel": pd.Categorical(self.delen)
+        })
+
+    def naar_parquet(self) -> bytes:
+        """Schrijft de blokken als Parquet; kerntaak en deel worden bij het lezen opnieuw afgeleid."""
+        return naar_parquet(self.als_dataframe()[["code", "naam", "tekst"]])
+
+    @classmethod
+    def van_teksten(cls, codes: Sequence[str], namen: Sequence[str], teksten: Sequence[str]) -> "BlokTabel":
+        """Maakt een tabel van losse blokteksten; ze worden samengevoegd tot een eigen buffer."""
+        tekst, start, eind = _buffer_uit_teksten(teksten)
+        return cls(tekst, codes, namen, start, eind)
+
+    @classmethod
+    def van_parquet(cls, data: bytes) -> "BlokTabel":
+        """Leest een tabel terug die met naar_parquet is geschreven."""
+        df = pd.read_parquet(io.BytesIO(data))
+        return cls.van_teksten(df["code"].astype(str).tolist(), df["naam"].tolist(), df["tekst"].tolist())
+
+
+def _buffer_uit_teksten(teksten: Sequence[str]):
+    """Voegt losse teksten samen tot een buffer met de bijbehorende offsets."""
+    lengtes = np.fromiter((len(t) for t in teksten), dtype=np.int64, count=len(teksten))
+    eind = np.cumsum(lengtes)
+    return "".join(teksten), eind - lengtes, eind
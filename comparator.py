@@ -1,12 +1,16 @@
 import pandas as pd
-import os
-import tempfile
+from typing import Union
+from dossier import GeparseerdDossier
+from export import naar_excel
 from extractie import extracteer_data  # dit moet de parser zijn die jouw PDF omzet naar de juiste dicts
+from instrumentatie import meet
 
-def vergelijk_kds(oud_pdf_path: str, nieuw_pdf_path: str):
+@meet("vergelijk_kds")
+def vergelijk_kds(oud_pdf_path: Union[str, GeparseerdDossier], nieuw_pdf_path: Union[str, GeparseerdDossier]):
     # Extract data
-    oud_data = extracteer_data(oud_pdf_path)
-    nieuw_data = extracteer_data(nieuw_pdf_path)
+    with meet("extractie"):
+        oud_data = extracteer_data(oud_pdf_path)
+        nieuw_data = extracteer_data(nieuw_pdf_path)
 
     # Vergelijk met DossierComparator
     comparator = DossierComparator(oud_data, nieuw_data)
@@ -15,18 +19,19 @@ def vergelijk_kds(oud_pdf_path: str, nieuw_pdf_path: str):
     # Zet om naar DataFrame
     df = pd.DataFrame(resultaten)
 
-    # Schrijf naar Excel
-    excel_path = os.path.join(tempfile.gettempdir(), "kd_kerntaak_vergelijking.xlsx")
-    df.to_excel(excel_path, index=False)
+    # Schrijf naar Excel, in het geheugen
+    with meet("excel_export"):
+        excel_data = naar_excel({"Sheet1": df})
 
-    return df, excel_path
+    return df, excel_data
 
 """
 Module voor het vergelijken van twee kwalificatiedossiers met verbeterde werkprocesherkenning en deduplicatie.
 """
 import re
-from typing import Dict, List, Tuple, Any
-import Levenshtein
+from typing import Dict, List, Any
+import numpy as np
+from similariteit import ratio_matrix, rij_maxima, kolom_maxima
 
 class DossierComparator:
     """Klasse voor het vergelijken van twee kwalificatiedossiers."""
@@ -46,6 +51,7 @@ class DossierComparator:
         self.matched_nieuw_werkprocessen = set()  # Houdt bij welke nieuwe werkprocessen al gematcht zijn
         self.processed_combinations = set()  # Houdt bij welke combinaties van oud/nieuw codes al zijn verwerkt
         
+    @meet("compare_all")
     def compare_all(self) -> List[Dict]:
         """
         Voert een volledige vergelijking uit tussen de twee dossiers.
@@ -60,22 +66,28 @@ class DossierComparator:
         self.processed_combinations = set()
         
         # Vergelijk metadata
-        self._compare_metadata()
+        with meet("metadata"):
+            self._compare_metadata()
         
         # Vergelijk kerntaken
-        self._compare_kerntaken()
+        with meet("kerntaken"):
+            self._compare_kerntaken()
         
         # Vergelijk werkprocessen met verbeterde logica
-        self._compare_werkprocessen_improved()
+        with meet("werkprocessen"):
+            self._compare_werkprocessen_improved()
         
         # Vergelijk context, beroepshouding en resultaat
-        self._compare_text_sections()
+        with meet("tekstsecties"):
+            self._compare_text_sections()
         
         # Vergelijk vakkennis en vaardigheden
-        self._compare_vakkennis_vaardigheden()
+        with meet("vakkennis"):
+            self._compare_vakkennis_vaardigheden()
         
         # Verwijder dubbele vermeldingen
-        self._remove_duplicates()
+        with meet("deduplicatie"):
+            self._remove_duplicates()
         
         return self.comparison_results
     
@@ -147,8 +159,8 @@ class DossierComparator:
     def _compare_kerntaken(self):
         """Vergelijkt de kerntaken van beide dossiers."""
         # Maak dictionaries van kerntaken voor snellere lookup
-        oud_kerntaken = {kt["code"]: kt["naam"] for kt in self.oud_data["kerntaken"]}
-        nieuw_kerntaken = {kt["code"]: kt["naam"] for kt in self.nieuw_data["kerntaken"]}
+        oud_kerntaken = dict(zip(self.oud_data["kerntaken"].codes, self.oud_data["kerntaken"].namen))
+        nieuw_kerntaken = dict(zip(self.nieuw_data["kerntaken"].codes, self.nieuw_data["kerntaken"].namen))
         
         # Verzamel alle unieke codes
         alle_codes = set(list(oud_kerntaken.keys()) + list(nieuw_kerntaken.keys()))
@@ -183,82 +195,70 @@ class DossierComparator:
         Vergelijkt werkprocessen met verbeterde logica die beter rekening houdt met 
         verschuivingen in codering en exacte tekstmatches.
         """
-        # Maak lijsten en dictionaries voor werkprocessen
+        # Werkprocessen komen als CodeTabel: kolommen met codes en namen, aangesproken op index
         oud_werkprocessen = self.oud_data["werkprocessen"]
         nieuw_werkprocessen = self.nieuw_data["werkprocessen"]
+        oud_codes, oud_namen = oud_werkprocessen.codes, oud_werkprocessen.namen
+        nieuw_codes, nieuw_namen = nieuw_werkprocessen.codes, nieuw_werkprocessen.namen
         
-        # Maak dictionaries voor snellere lookup
-        oud_wp_by_code = {wp["code"]: wp for wp in oud_werkprocessen}
-        nieuw_wp_by_code = {wp["code"]: wp for wp in nieuw_werkprocessen}
+        # Bereken alle naamsimilariteiten in een keer; stap 2 en 3 lezen hieruit
+        naam_matrix = ratio_matrix(oud_namen, nieuw_namen)
         
-        # Maak dictionaries voor lookup op naam
-        oud_wp_by_naam = {}
-        for wp in oud_werkprocessen:
-            if wp["naam"] not in oud_wp_by_naam:
-                oud_wp_by_naam[wp["naam"]] = []
-            oud_wp_by_naam[wp["naam"]].append(wp)
-            
-        nieuw_wp_by_naam = {}
-        for wp in nieuw_werkprocessen:
-            if wp["naam"] not in nieuw_wp_by_naam:
-                nieuw_wp_by_naam[wp["naam"]] = []
-            nieuw_wp_by_naam[wp["naam"]].append(wp)
+        # Maak een lookup op naam voor de nieuwe werkprocessen
+        nieuw_indices_by_naam = {}
+        for j, naam in enumerate(nieuw_namen):
+            nieuw_indices_by_naam.setdefault(naam, []).append(j)
         
         # STAP 1: Match werkprocessen met exact dezelfde naam (prioriteit boven codering)
-        for oud_wp in oud_werkprocessen:
-            if oud_wp["code"] in self.matched_oud_werkprocessen:
+        for i, oud_code in enumerate(oud_codes):
+            if oud_code in self.matched_oud_werkprocessen:
                 continue
                 
-            if oud_wp["naam"] in nieuw_wp_by_naam:
-                # Er zijn nieuwe werkprocessen met dezelfde naam
-                for nieuw_wp in nieuw_wp_by_naam[oud_wp["naam"]]:
-                    if nieuw_wp["code"] in self.matched_nieuw_werkprocessen:
-                        continue
-                        
-                    # We hebben een match op naam gevonden
-                    oud_code = oud_wp["code"]
-                    nieuw_code = nieuw_wp["code"]
-                    
-                    # Controleer of deze combinatie al is verwerkt
-                    if (oud_code, nieuw_code) in self.processed_combinations:
-                        continue
-                    
-                    if oud_code == nieuw_code:
-                        impact = "Geen wijziging in naam of codering"
-                    else:
-                        impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {nieuw_code}"
-                    
-                    self.comparison_results.append({
-                        "codering_oud": oud_code,
-                        "naam_oud": oud_wp["naam"],
-                        "codering_nieuw": nieuw_code,
-                        "naam_nieuw": nieuw_wp["naam"],
-                        "impact": impact,
-                        "pagina": "7-14"
-                    })
-                    
-                    # Markeer als gematcht en verwerkt
-                    self.matched_oud_werkprocessen.add(oud_code)
-                    self.matched_nieuw_werkprocessen.add(nieuw_code)
-                    self.processed_combinations.add((oud_code, nieuw_code))
-                    break  # Ga naar het volgende oude werkproces
+            # Er kunnen nieuwe werkprocessen met dezelfde naam zijn
+            for j in nieuw_indices_by_naam.get(oud_namen[i], ()):
+                nieuw_code = nieuw_codes[j]
+                if nieuw_code in self.matched_nieuw_werkprocessen:
+                    continue
+                
+                # Controleer of deze combinatie al is verwerkt
+                if (oud_code, nieuw_code) in self.processed_combinations:
+                    continue
+                
+                if oud_code == nieuw_code:
+                    impact = "Geen wijziging in naam of codering"
+                else:
+                    impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {nieuw_code}"
+                
+                self.comparison_results.append({
+                    "codering_oud": oud_code,
+                    "naam_oud": oud_namen[i],
+                    "codering_nieuw": nieuw_code,
+                    "naam_nieuw": nieuw_namen[j],
+                    "impact": impact,
+                    "pagina": "7-14"
+                })
+                
+                # Markeer als gematcht en verwerkt
+                self.matched_oud_werkprocessen.add(oud_code)
+                self.matched_nieuw_werkprocessen.add(nieuw_code)
+                self.processed_combinations.add((oud_code, nieuw_code))
+                break  # Ga naar het volgende oude werkproces
         
         # STAP 2: Zoek naar patronen van verschuiving in codering
         # Analyseer de niet-gematchte werkprocessen om patronen te vinden
-        unmatched_oud = [wp for wp in oud_werkprocessen if wp["code"] not in self.matched_oud_werkprocessen]
-        unmatched_nieuw = [wp for wp in nieuw_werkprocessen if wp["code"] not in self.matched_nieuw_werkprocessen]
+        unmatched_oud = [i for i, code in enumerate(oud_codes) if code not in self.matched_oud_werkprocessen]
         
         # Sorteer op code om patronen gemakkelijker te detecteren
-        unmatched_oud.sort(key=lambda wp: wp["code"])
-        unmatched_nieuw.sort(key=lambda wp: wp["code"])
+        unmatched_oud.sort(key=lambda i: oud_codes[i])
         
         # Zoek naar verschuivingspatronen (bijv. B1-K1-W5 -> B1-K1-W6)
-        for oud_wp in unmatched_oud:
-            if oud_wp["code"] in self.matched_oud_werkprocessen:
+        for i in unmatched_oud:
+            oud_code, oud_naam = oud_codes[i], oud_namen[i]
+            if oud_code in self.matched_oud_werkprocessen:
                 continue
                 
             # Extraheer kerntaak en werkproces nummer
-            oud_match = re.match(r'(B\d+-K\d+)-W(\d+)', oud_wp["code"])
+            oud_match = re.match(r'(B\d+-K\d+)-W(\d+)', oud_code)
             if not oud_match:
                 continue
                 
@@ -269,87 +269,90 @@ class DossierComparator:
             for offset in [1, 2, 3, -1, -2, -3]:
                 nieuw_wp_num = oud_wp_num + offset
                 nieuw_code = f"{oud_kerntaak}-W{nieuw_wp_num}"
+                j = nieuw_werkprocessen.positie(nieuw_code)
                 
-                if nieuw_code in nieuw_wp_by_code and nieuw_code not in self.matched_nieuw_werkprocessen:
-                    nieuw_wp = nieuw_wp_by_code[nieuw_code]
+                if j is not None and nieuw_code not in self.matched_nieuw_werkprocessen:
+                    nieuw_naam = nieuw_namen[j]
                     
                     # Controleer of deze combinatie al is verwerkt
-                    if (oud_wp["code"], nieuw_code) in self.processed_combinations:
+                    if (oud_code, nieuw_code) in self.processed_combinations:
                         continue
                     
-                    # Bereken similariteit
-                    similarity = Levenshtein.ratio(oud_wp["naam"].lower(), nieuw_wp["naam"].lower())
+                    similarity = naam_matrix[i, j]
                     
                     # Als er een goede match is of als de namen exact hetzelfde zijn
-                    if similarity > 0.7 or oud_wp["naam"] == nieuw_wp["naam"]:
-                        if oud_wp["naam"] == nieuw_wp["naam"]:
-                            impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_wp['code']} naar {nieuw_code}"
+                    if similarity > 0.7 or oud_naam == nieuw_naam:
+                        if oud_naam == nieuw_naam:
+                            impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {nieuw_code}"
                         else:
-                            impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_wp['code']} naar {nieuw_code}. "
-                            impact += f"Naamswijziging: {self._describe_text_change(oud_wp['naam'], nieuw_wp['naam'])}"
+                            impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {nieuw_code}. "
+                            impact += f"Naamswijziging: {self._describe_text_change(oud_naam, nieuw_naam)}"
                         
                         self.comparison_results.append({
-                            "codering_oud": oud_wp["code"],
-                            "naam_oud": oud_wp["naam"],
+                            "codering_oud": oud_code,
+                            "naam_oud": oud_naam,
                             "codering_nieuw": nieuw_code,
-                            "naam_nieuw": nieuw_wp["naam"],
+                            "naam_nieuw": nieuw_naam,
                             "impact": impact,
                             "pagina": "7-14"
                         })
                         
                         # Markeer als gematcht en verwerkt
-                        self.matched_oud_werkprocessen.add(oud_wp["code"])
+                        self.matched_oud_werkprocessen.add(oud_code)
                         self.matched_nieuw_werkprocessen.add(nieuw_code)
-                        self.processed_combinations.add((oud_wp["code"], nieuw_code))
+                        self.processed_combinations.add((oud_code, nieuw_code))
                         break  # Ga naar het volgende oude werkproces
         
         # STAP 3: Voor de resterende werkprocessen, zoek de beste match op basis van tekstuele overeenkomst
-        for oud_wp in oud_werkprocessen:
-            if oud_wp["code"] in self.matched_oud_werkprocessen:
+        # Verwerkte combinaties bevatten altijd een gematcht nieuw werkproces, dus een masker
+        # van nog vrije nieuwe werkprocessen volstaat
+        nieuw_vrij = np.array([code not in self.matched_nieuw_werkprocessen for code in nieuw_codes], dtype=bool)
+        nieuw_indices_by_code = {}
+        for j, code in enumerate(nieuw_codes):
+            nieuw_indices_by_code.setdefault(code, []).append(j)
+        
+        for i, oud_code in enumerate(oud_codes):
+            if oud_code in self.matched_oud_werkprocessen:
                 continue
                 
             best_match = None
             best_score = 0.5  # Verhoogde drempelwaarde voor betere matches
             
-            for nieuw_wp in nieuw_werkprocessen:
-                if nieuw_wp["code"] in self.matched_nieuw_werkprocessen:
-                    continue
-                    
-                # Controleer of deze combinatie al is verwerkt
-                if (oud_wp["code"], nieuw_wp["code"]) in self.processed_combinations:
-                    continue
-                
-                score = Levenshtein.ratio(oud_wp["naam"].lower(), nieuw_wp["naam"].lower())
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = nieuw_wp
+            if nieuw_vrij.any():
+                scores = np.where(nieuw_vrij, naam_matrix[i], -1.0)
+                # argmax kiest bij gelijke scores het eerste werkproces, net als de oorspronkelijke lus
+                beste_index = int(np.argmax(scores))
+                if scores[beste_index] > best_score:
+                    best_score = scores[beste_index]
+                    best_match = beste_index
             
-            if best_match:
-                if oud_wp["naam"] == best_match["naam"]:
-                    impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_wp['code']} naar {best_match['code']}"
+            if best_match is not None:
+                oud_naam, beste_code, beste_naam = oud_namen[i], nieuw_codes[best_match], nieuw_namen[best_match]
+                if oud_naam == beste_naam:
+                    impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {beste_code}"
                 else:
-                    impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_wp['code']} naar {best_match['code']}. "
-                    impact += f"Naamswijziging: {self._describe_text_change(oud_wp['naam'], best_match['naam'])}"
+                    impact = f"Werkproces heeft nieuwe codering gekregen: van {oud_code} naar {beste_code}. "
+                    impact += f"Naamswijziging: {self._describe_text_change(oud_naam, beste_naam)}"
                 
                 self.comparison_results.append({
-                    "codering_oud": oud_wp["code"],
-                    "naam_oud": oud_wp["naam"],
-                    "codering_nieuw": best_match["code"],
-                    "naam_nieuw": best_match["naam"],
+                    "codering_oud": oud_code,
+                    "naam_oud": oud_naam,
+                    "codering_nieuw": beste_code,
+                    "naam_nieuw": beste_naam,
                     "impact": impact,
                     "pagina": "7-14"
                 })
                 
                 # Markeer als gematcht en verwerkt
-                self.matched_oud_werkprocessen.add(oud_wp["code"])
-                self.matched_nieuw_werkprocessen.add(best_match["code"])
-                self.processed_combinations.add((oud_wp["code"], best_match["code"]))
+                self.matched_oud_werkprocessen.add(oud_code)
+                self.matched_nieuw_werkprocessen.add(beste_code)
+                self.processed_combinations.add((oud_code, beste_code))
+                nieuw_vrij[nieuw_indices_by_code[beste_code]] = False
             else:
                 # Geen match gevonden, werkproces is verwijderd
                 self.comparison_results.append({
-                    "codering_oud": oud_wp["code"],
-                    "naam_oud": oud_wp["naam"],
+                    "codering_oud": oud_code,
+                    "naam_oud": oud_namen[i],
                     "codering_nieuw": "-",
                     "naam_nieuw": "-",
                     "impact": "Werkproces verwijderd in het nieuwe dossier",
@@ -357,15 +360,15 @@ class DossierComparator:
                 })
         
         # STAP 4: Voeg de overgebleven nieuwe werkprocessen toe als toegevoegd
-        for nieuw_wp in nieuw_werkprocessen:
-            if nieuw_wp["code"] in self.matched_nieuw_werkprocessen:
+        for nieuw_code, nieuw_naam in zip(nieuw_codes, nieuw_namen):
+            if nieuw_code in self.matched_nieuw_werkprocessen:
                 continue
                 
             self.comparison_results.append({
                 "codering_oud": "-",
                 "naam_oud": "-",
-                "codering_nieuw": nieuw_wp["code"],
-                "naam_nieuw": nieuw_wp["naam"],
+                "codering_nieuw": nieuw_code,
+                "naam_nieuw": nieuw_naam,
                 "impact": "Nieuw werkproces toegevoegd in het nieuwe dossier",
                 "pagina": "7-14"
             })
@@ -416,13 +419,18 @@ class DossierComparator:
     
     def _compare_vakkennis_vaardigheden(self):
         """Vergelijkt de vakkennis en vaardigheden van beide dossiers."""
+        oud_items = self.oud_data["vakkennis_vaardigheden"]
+        nieuw_items = self.nieuw_data["vakkennis_vaardigheden"]
+        
+        # Een matrix voor beide richtingen: rijmaxima voor oud, kolommaxima voor nieuw
+        matrix = ratio_matrix(oud_items, nieuw_items)
+        drempel = 0.8
+        
         # Vind unieke items in het oude dossier
-        oud_uniek = [item for item in self.oud_data["vakkennis_vaardigheden"] 
-                    if not self._has_similar_item(item, self.nieuw_data["vakkennis_vaardigheden"])]
+        oud_uniek = [item for item, score in zip(oud_items, rij_maxima(matrix)) if score < drempel]
         
         # Vind unieke items in het nieuwe dossier
-        nieuw_uniek = [item for item in self.nieuw_data["vakkennis_vaardigheden"] 
-                      if not self._has_similar_item(item, self.oud_data["vakkennis_vaardigheden"])]
+        nieuw_uniek = [item for item, score in zip(nieuw_items, kolom_maxima(matrix)) if score < drempel]
         
         # Analyseer de verschillen
         impact = self._analyze_vakkennis_differences(oud_uniek, nieuw_uniek)
@@ -436,48 +444,6 @@ class DossierComparator:
             "pagina": "7-9"
         })
     
-    def _has_similar_item(self, target: str, candidates: List[str], threshold: float = 0.8) -> bool:
-        """
-        Controleert of er een vergelijkbaar item bestaat in een lijst van kandidaten.
-        
-        Args:
-            target: De string waarvoor een match gezocht wordt
-            candidates: Lijst van kandidaat-strings
-            threshold: Minimale similariteitsscore om als match te beschouwen
-            
-        Returns:
-            Boolean die aangeeft of er een vergelijkbaar item is gevonden
-        """
-        best_match, score = self._find_best_match(target, candidates)
-        return score >= threshold
-    
-    def _find_best_match(self, target: str, candidates: List[str]) -> Tuple[str, float]:
-        """
-        Vindt de beste match voor een string in een lijst van kandidaten.
-        
-        Args:
-            target: De string waarvoor een match gezocht wordt
-            candidates: Lijst van kandidaat-strings
-            
-        Returns:
-            Tuple van (beste match, similariteitsscore)
-        """
-        if not candidates:
-            return "", 0.0
-            
-        best_match = ""
-        best_score = 0.0
-        
-        for candidate in candidates:
-            # Bereken Levenshtein ratio (0-1 waar 1 perfecte match is)
-            score = Levenshtein.ratio(target.lower(), candidate.lower())
-            
-            if score > best_score:
-                best_score = score
-                best_match = candidate
-                
-        return best_match, best_score
-    
     def _describe_text_change(self, old_text: str, new_text: str) -> str:
         """
         Geeft een duidelijke beschrijving van de wijzigingen tussen twee teksten.
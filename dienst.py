@@ -0,0 +1,393 @@
+"""
+Module voor een lokale HTTP-dienst rond de kerntaak- en werkprocesvergelijking.
+
+Andere applicaties (importscripts, planningstools) kunnen zo vergelijkingen aanvragen zonder
+Streamlit en zonder per aanroep torch en het model opnieuw te laden: het model blijft in het
+proces geladen en verzoeken draaien op een begrensde pool van workerthreads. Staan er al meer
+verzoeken in de wachtrij dan toegestaan, dan antwoordt de dienst direct met 503 en een
+Retry-After-header in plaats van verzoeken onbeperkt op te stapelen. Gelijke verzoeken (dezelfde
+invoer en parameters) delen één berekening en komen daarna uit de resultaatcache.
+
+Gebruik:
+    python dienst.py [--host 127.0.0.1] [--poort 8765] [--workers 2] [--wachtrij 8]
+
+Eindpunten:
+    GET  /status                    Gezondheid, wachtrij en cachestatistieken (JSON)
+    POST /vergelijk/kerntaken       Kerntaakvergelijking
+    POST /vergelijk/werkprocessen   Werkprocesvergelijking; parameter drempel (standaard 0.6)
+
+Invoer is JSON of multipart/form-data met de velden oud en nieuw:
+    JSON:      {"oud": {"pdf": "<base64>"}, "nieuw": {"tekst": "..."}, "drempel": 0.6}
+    multipart: een PDF-bestand of tekstveld per dossier
+Al uitgelezen tekst mag pagina's scheiden met een form feed, zodat inhoudsopgave-pagina's
+worden herkend. Met ?formaat=xlsx, csv of parquet komt het rapport als bestand terug; standaard
+(formaat=json) als JSON met de rijen van het rapport. Rapportbestanden staan in de artefactopslag
+(zie artefacten.py), zodat een herhaald verzoek hetzelfde bestand krijgt zonder het opnieuw te maken.
+
+Omgevingsvariabelen:
+    KD_DIENST_WORKERS: aantal gelijktijdige vergelijkingen (standaard 2)
+    KD_DIENST_WACHTRIJ: aantal verzoeken dat daarnaast mag wachten (standaard 8)
+    KD_DIENST_TIMEOUT: seconden dat een verzoek op zijn resultaat wacht (standaard 300)
+    KD_DIENST_MAX_MB: maximale omvang van een verzoek in MB (standaard 50)
+"""
+import argparse
+import base64
+import binascii
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from artefacten import ArtefactOpslag, artefact_opslag
+from comparator import vergelijk_kds
+from dossier import GeparseerdDossier, dossier_uit_tekst, parse_dossier
+from export import CSV_MIME, EXCEL_MIME, PARQUET_MIME, naar_csv, naar_excel, naar_parquet
+from inhoudsanalyse import embedding_cache, vergelijk_werkprocessen
+from modelbeheer import MODEL_VARIANT, model_geladen, voorverwarm_model
+from resultaatcache import hash_inhoud, maak_sleutel, resultaat_cache
+from taken import FOUT, GEANNULEERD, KLAAR, TaakBeheer
+
+STANDAARD_WORKERS = int(os.environ.get("KD_DIENST_WORKERS", "2"))
+STANDAARD_WACHTRIJ = int(os.environ.get("KD_DIENST_WACHTRIJ", "8"))
+STANDAARD_TIMEOUT = float(os.environ.get("KD_DIENST_TIMEOUT", "300"))
+MAX_BYTES = int(float(os.environ.get("KD_DIENST_MAX_MB", "50")) * 1024 * 1024)
+
+STANDAARD_DREMPEL = 0.6
+FORMATEN = {
+    "xlsx": EXCEL_MIME,
+    "csv": CSV_MIME,
+    "parquet": PARQUET_MIME
+}
+
+logger = logging.getLogger("kd.dienst")
+
+
+class VerzoekFout(Exception):
+    """Ongeldig verzoek; wordt als 400 (of de meegegeven status) aan de aanroeper teruggegeven."""
+
+    def __init__(self, melding: str, status: HTTPStatus = HTTPStatus.BAD_REQUEST):
+        super().__init__(melding)
+        self.status = status
+
+
+def _lees_invoer(waarde, naam: str) -> Tuple[Callable[[], GeparseerdDossier], str]:
+    """
+    Maakt een dossier van een invoerveld: PDF-bytes, {"pdf": base64} of {"tekst": ...}.
+
+    Returns:
+        Tuple van (een functie die het dossier maakt, de inhoudshash)
+    """
+    if isinstance(waarde, bytes):
+        if not waarde.startswith(b"%PDF"):
+            return _lees_invoer({"tekst": waarde.decode("utf-8", errors="replace")}, naam)
+        return _pdf_dossier(waarde, naam), hash_inhoud(waarde)
+    if isinstance(waarde, str):
+        waarde = {"tekst": waarde}
+    if not isinstance(waarde, dict) or not ({"pdf", "tekst"} & waarde.keys()):
+        raise VerzoekFout(f"Veld {naam} moet een PDF (pdf, base64) of tekst (tekst) bevatten")
+    if "pdf" in waarde:
+        try:
+            data = base64.b64decode(waarde["pdf"], validate=True)
+        except (binascii.Error, TypeError) as e:
+            raise VerzoekFout(f"Veld {naam}.pdf is geen geldige base64") from e
+        return _pdf_dossier(data, naam), hash_inhoud(data)
+    tekst = waarde["tekst"]
+    if not isinstance(tekst, str) or not tekst.strip():
+        raise VerzoekFout(f"Veld {naam}.tekst is leeg")
+    return (lambda: dossier_uit_tekst(tekst, naam)), hash_inhoud(tekst.encode("utf-8"))
+
+
+def _pdf_dossier(data: bytes, naam: str):
+    def parse():
+        bron = io.BytesIO(data)
+        bron.name = naam
+        return parse_dossier(bron)
+    return parse
+
+
+def _lees_multipart(inhoud: bytes, content_type: str) -> Dict:
+    """Haalt de velden uit een multipart/form-data-body; bestanden als bytes, tekstvelden als str."""
+    bericht = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + inhoud
+    )
+    if not bericht.is_multipart():
+        raise VerzoekFout("Ongeldige multipart/form-data")
+    velden = {}
+    for deel in bericht.iter_parts():
+        naam = deel.get_param("name", header="content-disposition")
+        if not naam:
+            continue
+        data = deel.get_payload(decode=True) or b""
+        if deel.get_filename():
+            velden[naam] = data
+            continue
+        try:
+            velden[naam] = data.decode(deel.get_content_charset() or "utf-8")
+        except (LookupError, UnicodeDecodeError) as e:
+            raise VerzoekFout(f"Veld {naam} is geen geldige tekst") from e
+    return velden
+
+
+def _dataframe_json(df: pd.DataFrame):
+    # Via to_json worden NaN en numpy-typen netjes JSON (null, int, float)
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+class VergelijkDienst:
+    """De vergelijkingen achter de HTTP-dienst: wachtrij, deduplicatie en resultaten."""
+
+    def __init__(self, workers: int = STANDAARD_WORKERS, wachtrij: int = STANDAARD_WACHTRIJ,
+                 timeout: float = STANDAARD_TIMEOUT, opslag: ArtefactOpslag = artefact_opslag):
+        """
+        Args:
+            workers: Aantal vergelijkingen dat tegelijk draait
+            wachtrij: Aantal verzoeken dat daarnaast mag wachten voordat de dienst 503 geeft
+            timeout: Seconden dat een verzoek op zijn resultaat wacht
+            opslag: Artefactopslag voor de rapportbestanden
+        """
+        self.workers = workers
+        self.wachtrij = wachtrij
+        self.timeout = timeout
+        self.opslag = opslag
+        self.taken = TaakBeheer(max_workers=workers, cache=resultaat_cache)
+        self._lock = threading.Lock()
+        self.gestart = time.time()
+        self.verzoeken = 0
+        self.geweigerd = 0
+
+    def vergelijk(self, analyse: str, velden: Dict) -> Tuple[str, Tuple]:
+        """
+        Voert een vergelijking uit, of haakt aan bij een lopende met dezelfde invoer.
+
+        Args:
+            analyse: kerntaken of werkprocessen
+            velden: Invoer met oud, nieuw en optioneel drempel
+
+        Returns:
+            Tuple van (resultaatsleutel, resultaat); het resultaat is (df,) voor kerntaken en
+            (df, samenvatting) voor werkprocessen
+        """
+        if "oud" not in velden or "nieuw" not in velden:
+            raise VerzoekFout("Verzoek moet de velden oud en nieuw bevatten")
+        maak_oud, oud_hash = _lees_invoer(velden["oud"], "oud")
+        maak_nieuw, nieuw_hash = _lees_invoer(velden["nieuw"], "nieuw")
+
+        if analyse == "kerntaken":
+            sleutel = maak_sleutel("dienst_kerntaken", oud_hash, nieuw_hash)
+
+            def functie():
+                df, _ = vergelijk_kds(maak_oud(), maak_nieuw())
+                return (df,)
+        elif analyse == "werkprocessen":
+            try:
+                drempel = float(velden.get("drempel", STANDAARD_DREMPEL))
+            except (TypeError, ValueError) as e:
+                raise VerzoekFout("drempel moet een getal zijn") from e
+            sleutel = maak_sleutel("dienst_werkprocessen", oud_hash, nieuw_hash, model=MODEL_VARIANT, drempel=drempel)
+
+            def functie():
+                df, samenvatting, _ = vergelijk_werkprocessen(maak_oud(), maak_nieuw(), drempel=drempel)
+                return df, samenvatting
+        else:
+            raise VerzoekFout(f"Onbekende analyse {analyse!r}", HTTPStatus.NOT_FOUND)
+
+        verzoek_id = uuid.uuid4().hex
+        with self._lock:
+            self.verzoeken += 1
+            # Een lopende taak met dezelfde sleutel kost geen extra plek in de wachtrij
+            bestaand = self.taken.haal(sleutel)
+            if not (bestaand is not None and bestaand.actief) and \
+                    self.taken.aantal_actief() >= self.workers + self.wachtrij:
+                self.geweigerd += 1
+                raise VerzoekFout("Wachtrij vol; probeer het later opnieuw", HTTPStatus.SERVICE_UNAVAILABLE)
+            taak = self.taken.dien_in(sleutel, functie, naam=f"dienst_{analyse}", sessie=verzoek_id)
+
+        if not taak.wacht(self.timeout):
+            # Alleen annuleren als geen ander verzoek op dezelfde taak wacht
+            self.taken.annuleer(sleutel, verzoek_id)
+            raise VerzoekFout("Vergelijking duurde te lang", HTTPStatus.GATEWAY_TIMEOUT)
+        if taak.status == FOUT:
+            if isinstance(taak.fout, ValueError):
+                # Bijv. een dossier zonder leesbare tekst of zonder werkprocessen
+                raise VerzoekFout(str(taak.fout), HTTPStatus.UNPROCESSABLE_ENTITY) from taak.fout
+            raise taak.fout
+        if taak.status == GEANNULEERD:
+            raise VerzoekFout("Vergelijking geannuleerd", HTTPStatus.GATEWAY_TIMEOUT)
+        assert taak.status == KLAAR
+        return sleutel, taak.resultaat
+
+    def antwoord(self, analyse: str, sleutel: str, resultaat: Tuple, formaat: str) -> Tuple[bytes, str, Optional[str]]:
+        """
+        Zet een resultaat om naar (body, content-type, bestandsnaam).
+
+        Rapportbestanden komen uit de artefactopslag, onder de resultaatsleutel en het formaat; zonder
+        sessie verlopen ze na de TTL van de opslag.
+        """
+        if formaat == "json":
+            return _json_antwoord(analyse, resultaat), "application/json", None
+        data = self.opslag.bereken(None, f"{sleutel}.{formaat}", lambda: _rapport(analyse, resultaat, formaat))
+        return data, FORMATEN[formaat], f"{analyse}_vergelijking.{formaat}"
+
+    def status(self) -> Dict:
+        return {
+            "status": "ok",
+            "model": MODEL_VARIANT,
+            "model_geladen": model_geladen(),
+            "workers": self.workers,
+            "wachtrij": self.wachtrij,
+            "actief": self.taken.aantal_actief(),
+            "verzoeken": self.verzoeken,
+            "geweigerd": self.geweigerd,
+            "uptime_s": round(time.time() - self.gestart, 1),
+            "embedding_cache": embedding_cache.statistieken(),
+            "artefacten": self.opslag.statistieken()
+        }
+
+
+def _json_antwoord(analyse: str, resultaat: Tuple) -> bytes:
+    """Het resultaat als JSON met de rijen van het rapport."""
+    df = resultaat[0]
+    if analyse == "kerntaken":
+        inhoud = {"analyse": analyse, "rijen": _dataframe_json(df)}
+    else:
+        inhoud = {
+            "analyse": analyse, "werkprocessen": _dataframe_json(df), "samenvatting": _dataframe_json(resultaat[1])
+        }
+    return json.dumps(inhoud, ensure_ascii=False).encode("utf-8")
+
+
+def _rapport(analyse: str, resultaat: Tuple, formaat: str) -> bytes:
+    """Maakt het rapportbestand in een van de FORMATEN."""
+    df = resultaat[0]
+    if formaat == "xlsx":
+        bladen = {"Sheet1": df} if analyse == "kerntaken" else {"Werkprocessen": df, "Samenvatting": resultaat[1]}
+        return naar_excel(bladen)
+    if formaat == "csv":
+        return naar_csv(df)
+    return naar_parquet(df)
+
+
+def maak_handler(dienst: VergelijkDienst):
+    """Geeft een requesthandler-klasse die verzoeken aan de gegeven dienst doorgeeft."""
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "KDVergelijkDienst/1.0"
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.info("%s %s", self.address_string(), format % args)
+
+        def _stuur(self, status: int, body: bytes, content_type: str, bestandsnaam: Optional[str] = None,
+                   headers: Optional[Dict[str, str]] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if bestandsnaam:
+                self.send_header("Content-Disposition", f'attachment; filename="{bestandsnaam}"')
+            for naam, waarde in (headers or {}).items():
+                self.send_header(naam, waarde)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stuur_json(self, status: int, inhoud: Dict, headers: Optional[Dict[str, str]] = None):
+            self._stuur(status, json.dumps(inhoud, ensure_ascii=False).encode("utf-8"), "application/json",
+                        headers=headers)
+
+        def do_GET(self):
+            if urlsplit(self.path).path == "/status":
+                self._stuur_json(HTTPStatus.OK, dienst.status())
+            else:
+                self._stuur_json(HTTPStatus.NOT_FOUND, {"fout": "Onbekend pad"})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            parameters = {naam: waarden[-1] for naam, waarden in parse_qs(url.query).items()}
+            start = time.perf_counter()
+            try:
+                if not url.path.startswith("/vergelijk/"):
+                    raise VerzoekFout("Onbekend pad", HTTPStatus.NOT_FOUND)
+                analyse = url.path[len("/vergelijk/"):]
+                formaat = parameters.pop("formaat", "json")
+                if formaat != "json" and formaat not in FORMATEN:
+                    raise VerzoekFout(f"Onbekend formaat {formaat!r}; kies uit json, {', '.join(FORMATEN)}")
+
+                lengte = int(self.headers.get("Content-Length") or 0)
+                if lengte > MAX_BYTES:
+                    raise VerzoekFout("Verzoek is te groot", HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                inhoud = self.rfile.read(lengte)
+                content_type = self.headers.get("Content-Type", "")
+                if content_type.startswith("multipart/form-data"):
+                    velden = _lees_multipart(inhoud, content_type)
+                else:
+                    try:
+                        velden = json.loads(inhoud or b"{}")
+                    except json.JSONDecodeError as e:
+                        raise VerzoekFout("Body is geen geldige JSON") from e
+                    if not isinstance(velden, dict):
+                        raise VerzoekFout("Body moet een JSON-object zijn")
+                # Parameters mogen ook in de querystring, bijv. ?drempel=0.7
+                velden = {**parameters, **velden}
+
+                sleutel, resultaat = dienst.vergelijk(analyse, velden)
+                body, content_type, bestandsnaam = dienst.antwoord(analyse, sleutel, resultaat, formaat)
+                self._stuur(HTTPStatus.OK, body, content_type, bestandsnaam,
+                            {"X-Duur-Ms": f"{(time.perf_counter() - start) * 1000:.0f}"})
+            except VerzoekFout as e:
+                headers = {"Retry-After": "1"} if e.status == HTTPStatus.SERVICE_UNAVAILABLE else None
+                self._stuur_json(e.status, {"fout": str(e)}, headers)
+            except Exception as e:
+                logger.exception("Fout bij %s", self.path)
+                self._stuur_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"fout": f"{type(e).__name__}: {e}"})
+
+    return Handler
+
+
+def maak_server(host: str = "127.0.0.1", poort: int = 8765, dienst: Optional[VergelijkDienst] = None) -> ThreadingHTTPServer:
+    """Maakt een HTTP-server voor de dienst; start hem met serve_forever()."""
+    server = ThreadingHTTPServer((host, poort), maak_handler(dienst or VergelijkDienst()))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Lokale HTTP-dienst voor het vergelijken van kwalificatiedossiers.")
+    parser.add_argument("--host", default="127.0.0.1", help="Adres om op te luisteren (standaard alleen lokaal)")
+    parser.add_argument("--poort", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=STANDAARD_WORKERS, help="Aantal gelijktijdige vergelijkingen")
+    parser.add_argument("--wachtrij", type=int, default=STANDAARD_WACHTRIJ,
+                        help="Aantal verzoeken dat mag wachten voordat de dienst 503 geeft")
+    parser.add_argument("--timeout", type=float, default=STANDAARD_TIMEOUT,
+                        help="Seconden dat een verzoek op zijn resultaat wacht")
+    parser.add_argument("--geen-voorverwarmen", action="store_true",
+                        help="Het model pas bij de eerste werkprocesvergelijking laden")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if not args.geen_voorverwarmen:
+        # Het model blijft daarna geladen zolang de dienst draait
+        voorverwarm_model()
+    server = maak_server(args.host, args.poort, VergelijkDienst(args.workers, args.wachtrij, args.timeout))
+    print(f"Dienst luistert op http://{args.host}:{args.poort}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
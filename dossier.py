@@ -0,0 +1,507 @@
+"""
+Module voor het uitlezen van een kwalificatiedossier-PDF in twee fasen.
+
+De volledige opmaak van pdfplumber (extract_text) is per pagina duur. Daarom maakt een
+goedkope eerste doorloop met pypdfium2 eerst een pagina-index: op welke pagina's metadata,
+kerntaak- en werkprocescodes en de secties (context, beroepshouding, resultaat, vakkennis)
+staan. Pas als een afnemer tekst opvraagt worden alleen de pagina's die hij nodig heeft door
+pdfplumber gehaald; voorblad, colofon en bijlagen zonder relevante inhoud worden overgeslagen.
+Iedere pagina wordt hooguit een keer uitgelezen, ook als beide analyses hem nodig hebben.
+
+Grote selecties (vanaf KD_PDF_STROOM_VANAF pagina's) kunnen ook als stroom worden gelezen
+(PaginaSelectie.stroom): pagina's komen dan een voor een vrij en worden niet in het dossier
+bewaard, zodat het geheugengebruik niet meegroeit met de omvang van het document. pdfplumber
+maakt daarbij alleen pagina-objecten voor de gevraagde pagina's en geeft de tekens en
+layoutobjecten van iedere pagina direct na het uitlezen weer vrij.
+
+Afnemers:
+    metadata:      pagina's met metadatavelden
+    kerntaken:     pagina's met metadata, codes of sectiekoppen, plus vervolgpagina's van secties
+    werkprocessen: van de eerste pagina met een werkprocesblok tot het einde van het document,
+                   zonder inhoudsopgave-pagina's
+
+Omgevingsvariabelen:
+    KD_PDF_WORKERS: aantal processen voor parallelle opmaak; 0 betekent een per CPU-kern
+    KD_PDF_MIN_PAGINAS_PARALLEL: minimum aantal pagina's voor parallelle opmaak (standaard 24)
+    KD_PDF_LUI: 0 leest zoals voorheen direct alle pagina's uit (standaard 1)
+    KD_PDF_VERVOLGPAGINAS: aantal pagina's na een sectie of werkprocesblok dat nog wordt
+        meegenomen, voor tekst die doorloopt op de volgende pagina (standaard 1)
+    KD_PDF_STROOM_VANAF: aantal pagina's in een selectie vanaf waar stroom() de pagina's niet
+        meer bewaart (standaard 150)
+    KD_PDF_STROOM_DEEL: aantal pagina's per opdracht aan een workerproces bij het stromen (standaard 16)
+"""
+import io
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from collections.abc import Sequence as SequenceABC
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import BinaryIO, Dict, FrozenSet, Iterator, List, Optional, Sequence, Union
+
+import pdfplumber
+
+from instrumentatie import meet, tel
+from tokenizer import CODE_ANKER, OPSOMMINGEN, PATRONEN, SECTIES
+
+try:
+    import pypdfium2
+except ImportError:  # pragma: no cover - pypdfium2 komt normaal mee met pdfplumber
+    pypdfium2 = None
+
+INHOUDSOPGAVE_PATROON = re.compile(r'\.{3,} *\d+')
+
+# Aantal processen voor parallelle extractie; 0 betekent een per CPU-kern
+STANDAARD_WORKERS = int(os.environ.get("KD_PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+# Onder dit aantal pagina's weegt het opstarten van processen niet op tegen de winst
+MIN_PAGINAS_PARALLEL = int(os.environ.get("KD_PDF_MIN_PAGINAS_PARALLEL", "24"))
+LUI_UITLEZEN = os.environ.get("KD_PDF_LUI", "1") != "0"
+VERVOLGPAGINAS = int(os.environ.get("KD_PDF_VERVOLGPAGINAS", "1"))
+STROOM_VANAF = int(os.environ.get("KD_PDF_STROOM_VANAF", "150"))
+STROOM_DEEL = int(os.environ.get("KD_PDF_STROOM_DEEL", "16"))
+
+AFNEMERS = ("metadata", "kerntaken", "werkprocessen")
+
+_SECTIEKOPPEN = {*SECTIES.values(), *OPSOMMINGEN.values()}
+# Ruime patronen voor de eerste doorloop: een pagina te veel uitlezen is goedkoper dan een missen
+KENMERK_PATRONEN = {
+    "metadata": re.compile("|".join(sorted(
+        {anker for anker, _, _ in PATRONEN.values() if anker != CODE_ANKER and anker not in _SECTIEKOPPEN}
+    ))),
+    "code": re.compile(r"B\d+\s*-\s*K\d+"),
+    "werkprocesblok": re.compile(r"B\d+\s*-\s*K\d+\s*-\s*W\d+\s*:"),
+    "sectie": re.compile("|".join(sorted(_SECTIEKOPPEN))),
+}
+# Tekst onder deze kenmerken kan doorlopen op de volgende pagina
+DOORLOPENDE_KENMERKEN = frozenset({"sectie", "werkprocesblok"})
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+# pdfium is niet thread-safe; analyses in verschillende threads moeten op elkaar wachten
+_pdfium_lock = threading.Lock()
+
+
+def is_inhoudsopgave(pagina_tekst: str) -> bool:
+    """Herkent inhoudsopgave-achtige pagina's aan stippellijnen met paginanummers."""
+    return pagina_tekst.count("...") > 5 or bool(INHOUDSOPGAVE_PATROON.search(pagina_tekst))
+
+
+@dataclass
+class Pagina:
+    """Tekst van een enkele PDF-pagina."""
+    nummer: int
+    tekst: str
+    inhoudsopgave: bool = False
+
+
+@dataclass
+class PaginaIndex:
+    """
+    Uitkomst van de eerste doorloop: de kenmerken (zie KENMERK_PATRONEN) van iedere pagina.
+
+    Attributes:
+        kenmerken: Kenmerken per pagina
+        tekens: Lengte van de tekst per pagina zonder witruimte aan begin en eind; 0 voor
+            inhoudsopgave-pagina's
+    """
+    kenmerken: List[FrozenSet[str]]
+    tekens: List[int] = field(default_factory=list)
+
+    @property
+    def aantal(self) -> int:
+        return len(self.kenmerken)
+
+    def paginas_met(self, kenmerk: str) -> List[int]:
+        """Geeft de paginanummers (vanaf 1) waarop een kenmerk voorkomt."""
+        return [nummer for nummer, kenmerken in enumerate(self.kenmerken, start=1) if kenmerk in kenmerken]
+
+
+class PaginaSelectie(SequenceABC):
+    """
+    De pagina's die een afnemer nodig heeft; een pagina wordt pas bij opvragen uitgelezen.
+
+    Attributes:
+        nummers: Paginanummers (vanaf 1) in de selectie
+        zonder_inhoudsopgave: Inhoudsopgave-pagina's tellen niet mee in de tekst
+    """
+
+    def __init__(self, dossier: "GeparseerdDossier", nummers: Sequence[int], zonder_inhoudsopgave: bool = False):
+        self.dossier = dossier
+        self.nummers = list(nummers)
+        self.zonder_inhoudsopgave = zonder_inhoudsopgave
+
+    def __len__(self) -> int:
+        return len(self.nummers)
+
+    def __getitem__(self, index: int) -> Pagina:
+        return self.dossier.pagina(self.nummers[index])
+
+    @cached_property
+    def tekst(self) -> str:
+        """De tekst van de geselecteerde pagina's; alle ontbrekende pagina's worden in een keer uitgelezen."""
+        paginas = self.dossier.lees(self.nummers)
+        return "\n".join(p.tekst for p in paginas if not (self.zonder_inhoudsopgave and p.inhoudsopgave))
+
+    def stroom(self) -> Iterator[Pagina]:
+        """
+        Levert de pagina's van de selectie een voor een, zonder inhoudsopgave-pagina's als dat zo is ingesteld.
+
+        Vanaf KD_PDF_STROOM_VANAF pagina's worden nog niet uitgelezen pagina's gestroomd en niet
+        bewaard (zie GeparseerdDossier.stroom); kleinere selecties worden zoals bij tekst
+        uitgelezen en in het dossier bewaard.
+        """
+        paginas = self.dossier.lees(self.nummers) if len(self) < STROOM_VANAF else self.dossier.stroom(self.nummers)
+        for pagina in paginas:
+            if not (self.zonder_inhoudsopgave and pagina.inhoudsopgave):
+                yield pagina
+
+
+class GeparseerdDossier:
+    """
+    Een kwalificatiedossier waarvan de pagina's bij het eerste gebruik worden uitgelezen.
+
+    Zonder PDF-bron (bijv. in de benchmarks) zijn alle pagina's al bij het aanmaken gegeven;
+    zonder pagina-index bestaat iedere selectie uit alle pagina's, zoals voorheen.
+    """
+
+    def __init__(self, bron: str, paginas: Optional[List[Pagina]] = None,
+                 pdf: Union[None, str, bytes] = None, index: Optional[PaginaIndex] = None,
+                 aantal_paginas: Optional[int] = None, workers: Optional[int] = None):
+        """
+        Args:
+            bron: Naam of pad van de PDF
+            paginas: Al uitgelezen pagina's
+            pdf: Pad of bytes van de PDF, om ontbrekende pagina's uit te lezen
+            index: Pagina-index uit de eerste doorloop
+            aantal_paginas: Totaal aantal pagina's; standaard uit de index of de gegeven pagina's
+            workers: Aantal processen voor het uitlezen; standaard KD_PDF_WORKERS
+        """
+        self.bron = bron
+        self.pdf = pdf
+        self.index = index
+        self.workers = STANDAARD_WORKERS if workers is None else workers
+        self._uitgelezen: Dict[int, Pagina] = {p.nummer: p for p in paginas or []}
+        if aantal_paginas is None:
+            aantal_paginas = index.aantal if index is not None else len(self._uitgelezen)
+        self.aantal_paginas = aantal_paginas
+        self._lock = threading.Lock()
+        self._selecties: Dict[str, PaginaSelectie] = {}
+
+    def __getstate__(self):
+        toestand = self.__dict__.copy()
+        del toestand["_lock"]
+        return toestand
+
+    def __setstate__(self, toestand):
+        self.__dict__.update(toestand)
+        self._lock = threading.Lock()
+
+    def lees(self, nummers: Sequence[int]) -> List[Pagina]:
+        """Geeft de gevraagde pagina's en leest de nog ontbrekende in een keer uit."""
+        with self._lock:
+            ontbrekend = [nummer for nummer in nummers if nummer not in self._uitgelezen]
+            if ontbrekend:
+                if self.pdf is None:
+                    raise ValueError(f"Pagina's {ontbrekend} van {self.bron} zijn niet beschikbaar")
+                with meet("pdf_opmaak"):
+                    for pagina in _lees_paginas_verdeeld(self.pdf, ontbrekend, self.workers):
+                        self._uitgelezen[pagina.nummer] = pagina
+                tel("pdf_paginas_uitgelezen", len(ontbrekend))
+            return [self._uitgelezen[nummer] for nummer in nummers]
+
+    def stroom(self, nummers: Sequence[int]) -> Iterator[Pagina]:
+        """
+        Levert pagina's een voor een; pagina's die nog niet waren uitgelezen worden niet bewaard.
+
+        Er zijn nooit meer dan enkele pagina's tegelijk in het geheugen (per workerproces
+        hooguit KD_PDF_STROOM_DEEL), hoe groot het document ook is.
+        """
+        with self._lock:
+            bekend = {nummer: self._uitgelezen[nummer] for nummer in nummers if nummer in self._uitgelezen}
+        ontbrekend = [nummer for nummer in nummers if nummer not in bekend]
+        if ontbrekend and self.pdf is None:
+            raise ValueError(f"Pagina's {ontbrekend} van {self.bron} zijn niet beschikbaar")
+
+        if not ontbrekend:
+            for nummer in nummers:
+                yield bekend[nummer]
+            return
+
+        gestroomd = _stroom_paginas_verdeeld(self.pdf, ontbrekend, self.workers)
+        try:
+            for nummer in nummers:
+                if nummer in bekend:
+                    yield bekend[nummer]
+                else:
+                    tel("pdf_paginas_gestroomd")
+                    yield next(gestroomd)
+        finally:
+            gestroomd.close()
+
+    def pagina(self, nummer: int) -> Pagina:
+        """Geeft een enkele pagina (vanaf 1) en leest hem zo nodig uit."""
+        return self.lees([nummer])[0]
+
+    @property
+    def paginas(self) -> List[Pagina]:
+        """Alle pagina's; leest de nog ontbrekende uit."""
+        return self.lees(range(1, self.aantal_paginas + 1))
+
+    def laad_alle_paginas(self):
+        """Leest alle nog ontbrekende pagina's direct uit, verdeeld over de workers."""
+        self.lees(range(1, self.aantal_paginas + 1))
+
+    @property
+    def uitgelezen_paginas(self) -> int:
+        """Aantal pagina's dat tot nu toe door pdfplumber is gehaald (of bij het aanmaken is gegeven)."""
+        return len(self._uitgelezen)
+
+    def selectie(self, afnemer: str) -> PaginaSelectie:
+        """
+        Geeft de pagina's die een afnemer nodig heeft, op basis van de pagina-index.
+
+        Args:
+            afnemer: metadata, kerntaken of werkprocessen (zie de moduledocumentatie)
+        """
+        if afnemer not in AFNEMERS:
+            raise ValueError(f"Onbekende afnemer {afnemer!r}; kies uit {', '.join(AFNEMERS)}")
+        if afnemer not in self._selecties:
+            self._selecties[afnemer] = PaginaSelectie(
+                self, self._selectie_nummers(afnemer), zonder_inhoudsopgave=afnemer == "werkprocessen"
+            )
+        return self._selecties[afnemer]
+
+    def _selectie_nummers(self, afnemer: str) -> List[int]:
+        alle = list(range(1, self.aantal_paginas + 1))
+        if self.index is None:
+            return alle
+
+        if afnemer == "werkprocessen":
+            # Een blok loopt door tot het volgende blok, dus ook pagina's zonder code ertussen tellen mee;
+            # het laatste blok loopt door tot het einde van de tekst, zoals in extract_werkprocesblokken
+            blokpaginas = self.index.paginas_met("werkprocesblok")
+            if not blokpaginas:
+                return alle
+            return list(range(blokpaginas[0], self.aantal_paginas + 1))
+
+        if afnemer == "metadata":
+            return self.index.paginas_met("metadata") or alle
+
+        nummers = set()
+        for nummer, kenmerken in enumerate(self.index.kenmerken, start=1):
+            if kenmerken:
+                nummers.add(nummer)
+            if kenmerken & DOORLOPENDE_KENMERKEN:
+                nummers.update(range(nummer + 1, min(nummer + VERVOLGPAGINAS, self.aantal_paginas) + 1))
+        return sorted(nummers) or alle
+
+    def leesbare_tekens(self, nummers: Sequence[int]) -> int:
+        """
+        Schat de tekstlengte van pagina's zonder ze uit te lezen, bijv. voor de controle op leesbare tekst.
+
+        Al uitgelezen pagina's tellen met hun tekst, de overige met de lengte uit de pagina-index;
+        inhoudsopgave-pagina's tellen niet mee.
+        """
+        tekens = self.index.tekens if self.index is not None else []
+        totaal = 0
+        for nummer in nummers:
+            pagina = self._uitgelezen.get(nummer)
+            if pagina is not None:
+                lengte = 0 if pagina.inhoudsopgave else len(pagina.tekst.strip())
+            else:
+                lengte = tekens[nummer - 1] if nummer <= len(tekens) else 0
+            # Plus de newline waarmee de pagina's worden samengevoegd
+            totaal += lengte + 1 if lengte else 0
+        return totaal
+
+    @cached_property
+    def volledige_tekst(self) -> str:
+        """Tekst van alle pagina's."""
+        return "\n".join(p.tekst for p in self.paginas)
+
+    @cached_property
+    def gefilterde_tekst(self) -> str:
+        """Tekst van alle pagina's zonder inhoudsopgave-pagina's."""
+        return "\n".join(p.tekst for p in self.paginas if not p.inhoudsopgave)
+
+
+def _lees_paginas_stroom(pdf_bron: Union[str, bytes, BinaryIO], nummers: Sequence[int]) -> Iterator[Pagina]:
+    """Leest de gegeven pagina's (vanaf 1) een voor een uit en geeft de opmaak van iedere pagina direct vrij."""
+    if not nummers:
+        return
+    if isinstance(pdf_bron, bytes):
+        pdf_bron = io.BytesIO(pdf_bron)
+    # Alleen voor de gevraagde pagina's een pdfplumber-pagina aanmaken
+    with pdfplumber.open(pdf_bron, pages=sorted(set(nummers))) as pdf:
+        per_nummer = {pagina.page_number: pagina for pagina in pdf.pages}
+        for nummer in nummers:
+            pagina = per_nummer[nummer]
+            try:
+                tekst = pagina.extract_text() or ""
+            finally:
+                # Tekens, layoutobjecten en tekstkaart van de pagina loslaten voor de volgende;
+                # Page.close bestaat pas in nieuwere pdfplumber-versies, daarvoor is er flush_cache
+                sluit = getattr(pagina, "close", None) or getattr(pagina, "flush_cache", None)
+                if sluit is not None:
+                    sluit()
+            yield Pagina(nummer, tekst, is_inhoudsopgave(tekst))
+
+
+def _lees_paginas(pdf_bron: Union[str, bytes, BinaryIO], nummers: Sequence[int]) -> List[Pagina]:
+    """Leest de gegeven pagina's (vanaf 1) uit; wordt ook in workerprocessen gebruikt."""
+    return list(_lees_paginas_stroom(pdf_bron, nummers))
+
+
+def _haal_pool(workers: int) -> ProcessPoolExecutor:
+    """Geeft een gedeelde procespool; processen worden gespawnd zodat ze geen torch-threads erven."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _lees_paginas_verdeeld(pdf_bron: Union[str, bytes], nummers: Sequence[int], workers: int) -> List[Pagina]:
+    """
+    Leest pagina's uit, bij veel pagina's verdeeld over een procespool.
+
+    Iedere worker opent de PDF zelf en krijgt een aaneengesloten deel van de nummers.
+    """
+    if workers <= 1 or len(nummers) < MIN_PAGINAS_PARALLEL:
+        return _lees_paginas(pdf_bron, nummers)
+
+    workers = min(workers, len(nummers))
+    grootte = -(-len(nummers) // workers)
+    pool = _haal_pool(workers)
+    futures = [pool.submit(_lees_paginas, pdf_bron, nummers[start:start + grootte])
+               for start in range(0, len(nummers), grootte)]
+
+    # Resultaten in volgorde van de delen samenvoegen houdt de paginavolgorde intact
+    paginas = []
+    for future in futures:
+        paginas.extend(future.result())
+    return paginas
+
+
+def _stroom_paginas_verdeeld(pdf_bron: Union[str, bytes], nummers: Sequence[int], workers: int) -> Iterator[Pagina]:
+    """
+    Als _lees_paginas_verdeeld, maar levert de pagina's een voor een in volgorde.
+
+    De workers krijgen delen van KD_PDF_STROOM_DEEL pagina's, met hooguit een deel per worker
+    tegelijk onderweg; zo blijft het aantal uitgelezen pagina's in het geheugen begrensd.
+    """
+    if workers <= 1 or len(nummers) < MIN_PAGINAS_PARALLEL:
+        yield from _lees_paginas_stroom(pdf_bron, nummers)
+        return
+
+    pool = _haal_pool(workers)
+    delen = deque(nummers[start:start + STROOM_DEEL] for start in range(0, len(nummers), STROOM_DEEL))
+    onderweg = deque()
+    try:
+        while delen or onderweg:
+            while delen and len(onderweg) < workers:
+                onderweg.append(pool.submit(_lees_paginas, pdf_bron, delen.popleft()))
+            yield from onderweg.popleft().result()
+    finally:
+        # Een afgebroken stroom laat geen werk achter in de pool
+        for future in onderweg:
+            future.cancel()
+
+
+def indexeer_paginas(pdf_bron: Union[str, bytes]) -> PaginaIndex:
+    """
+    Eerste doorloop: bepaalt per pagina welke kenmerken erop staan, zonder opmaak.
+
+    pypdfium2 levert de ruwe tekst van een pagina in een fractie van de tijd die pdfplumber
+    nodig heeft; regelvolgorde en witruimte maken voor de ruime kenmerkpatronen niet uit.
+    """
+    with _pdfium_lock:
+        document = pypdfium2.PdfDocument(pdf_bron)
+        try:
+            kenmerken, tekens = [], []
+            for index in range(len(document)):
+                pagina = document[index]
+                tekstpagina = pagina.get_textpage()
+                try:
+                    tekst = tekstpagina.get_text_bounded().replace("\r\n", "\n")
+                finally:
+                    tekstpagina.close()
+                    pagina.close()
+                kenmerken.append(frozenset(
+                    kenmerk for kenmerk, patroon in KENMERK_PATRONEN.items() if patroon.search(tekst)
+                ))
+                tekens.append(0 if is_inhoudsopgave(tekst) else len(tekst.strip()))
+        finally:
+            document.close()
+    return PaginaIndex(kenmerken, tekens)
+
+
+@meet("pdf_extractie")
+def parse_dossier(pdf_bron: Union[str, BinaryIO], workers: Optional[int] = None,
+                  lui: bool = LUI_UITLEZEN) -> GeparseerdDossier:
+    """
+    Opent een PDF voor uitlezen.
+
+    Standaard wordt alleen de pagina-index gemaakt; pagina's worden uitgelezen zodra een afnemer
+    ze opvraagt (zie GeparseerdDossier.selectie). Met lui=False, of als pypdfium2 de PDF niet kan
+    openen, worden direct alle pagina's uitgelezen.
+
+    Args:
+        pdf_bron: Pad naar de PDF of een geopend binair bestandsobject (bijv. een Streamlit-upload)
+        workers: Aantal processen voor het uitlezen; standaard KD_PDF_WORKERS of het aantal CPU-kernen
+
+    Returns:
+        GeparseerdDossier dat de PDF-bron bewaart om pagina's uit te lezen
+    """
+    naam = getattr(pdf_bron, "name", str(pdf_bron))
+
+    if not isinstance(pdf_bron, str):
+        # Workers moeten de PDF zelf openen, dus bewaar de bytes in plaats van het bestandsobject
+        pdf_bron.seek(0)
+        pdf_bron = pdf_bron.read()
+
+    index = None
+    if lui and pypdfium2 is not None:
+        try:
+            index = indexeer_paginas(pdf_bron)
+        except pypdfium2.PdfiumError:
+            # Bijv. een beveiligde of afwijkende PDF; pdfplumber kan hem misschien wel lezen
+            index = None
+
+    if index is not None:
+        tel("pdf_paginas", index.aantal)
+        return GeparseerdDossier(bron=naam, pdf=pdf_bron, index=index, workers=workers)
+
+    with pdfplumber.open(io.BytesIO(pdf_bron) if isinstance(pdf_bron, bytes) else pdf_bron) as pdf:
+        aantal_paginas = len(pdf.pages)
+    dossier = GeparseerdDossier(bron=naam, pdf=pdf_bron, aantal_paginas=aantal_paginas, workers=workers)
+    # Zonder pagina-index vraagt iedere afnemer alle pagina's; lees ze nu in een keer uit, zodat een
+    # onleesbare PDF hier al faalt en de opmaaktijd onder pdf_extractie valt in plaats van bij de eerste afnemer
+    dossier.laad_alle_paginas()
+    tel("pdf_paginas", aantal_paginas)
+    return dossier
+
+
+def dossier_uit_tekst(tekst: str, bron: str = "tekst") -> GeparseerdDossier:
+    """
+    Maakt een dossier van al uitgelezen tekst, bijv. van een aanroeper die zelf extraheert.
+
+    Pagina's worden gescheiden door een form feed (\\f); zonder form feeds is de tekst een pagina.
+    """
+    paginas = [Pagina(nummer, pagina, is_inhoudsopgave(pagina))
+               for nummer, pagina in enumerate(tekst.split("\f"), start=1)]
+    return GeparseerdDossier(bron=bron, paginas=paginas)
+
+
+def als_dossier(bron: Union[str, BinaryIO, GeparseerdDossier]) -> GeparseerdDossier:
+    """Geeft een GeparseerdDossier terug en parseert de bron alleen als dat nog niet is gebeurd."""
+    if isinstance(bron, GeparseerdDossier):
+        return bron
+    return parse_dossier(bron)
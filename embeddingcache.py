@@ -0,0 +1,259 @@
+"""
+Module voor een persistente, inhoud-geadresseerde cache van tekst-embeddings.
+
+Vectoren worden per model in een vast aantal slots van een memory-mapped
+numpy-bestand bewaard. De sleutel is een SHA-256 van modelnaam en genormaliseerde
+tekst; bij een volle cache wordt het minst recent gebruikte item overschreven.
+Naast iedere vector staat de sleutel zelf, zodat meerdere processen (bijv. de
+batchworkers) dezelfde cache kunnen delen zonder elkaars vectoren verkeerd te lezen.
+
+De index wordt bij iedere toevoeging weggeschreven. De LRU-volgorde van hits alleen hooguit
+eens per KD_EMBEDDING_CACHE_BEWAAR_S seconden (standaard 60): een hit is geen reden om de hele
+index te herschrijven, en een verloren stukje volgorde kost hooguit een vroege verwijdering.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows heeft geen fcntl
+    fcntl = None
+
+STANDAARD_MAP = os.environ.get(
+    "KD_EMBEDDING_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "kd-inhoudsanalyse", "embeddings")
+)
+STANDAARD_MAX_ITEMS = int(os.environ.get("KD_EMBEDDING_CACHE_MAX_ITEMS", "50000"))
+STANDAARD_DTYPE = os.environ.get("KD_EMBEDDING_CACHE_DTYPE", "float32")
+STANDAARD_BEWAAR_INTERVAL = float(os.environ.get("KD_EMBEDDING_CACHE_BEWAAR_S", "60"))
+
+SLEUTEL_BYTES = 32
+
+
+def normaliseer_tekst(tekst: str) -> str:
+    """Normaliseert witruimte zodat opmaakverschillen uit de PDF-extractie geen nieuwe sleutel opleveren."""
+    return " ".join(tekst.split())
+
+
+def cache_sleutel(model_naam: str, tekst: str) -> str:
+    """Geeft de inhoud-geadresseerde sleutel voor een tekst onder een bepaald model."""
+    inhoud = f"{model_naam}\0{normaliseer_tekst(tekst)}".encode("utf-8")
+    return hashlib.sha256(inhoud).hexdigest()
+
+
+class EmbeddingCache:
+    """Begrensde LRU-cache van embeddings op schijf, per model."""
+
+    def __init__(self, model_naam: str, map: str = STANDAARD_MAP,
+                 max_items: int = STANDAARD_MAX_ITEMS, dtype: str = STANDAARD_DTYPE,
+                 bewaar_interval: float = STANDAARD_BEWAAR_INTERVAL):
+        """
+        Initialiseert de cache; bestaande data wordt pas bij het eerste gebruik geladen.
+
+        Args:
+            model_naam: Naam van het model, onderdeel van iedere sleutel
+            map: Basismap van de cache; per model wordt een submap aangemaakt
+            max_items: Maximaal aantal vectoren voordat LRU-verwijdering optreedt
+            dtype: Opslagtype van de vectoren ("float32" of "float16")
+            bewaar_interval: Minimum aantal seconden tussen twee keer wegschrijven van alleen
+                de LRU-volgorde (zie bewaar)
+        """
+        self.model_naam = model_naam
+        self.map = os.path.join(map, re.sub(r"[^\w.-]+", "_", model_naam))
+        self.max_items = max_items
+        self.dtype = np.dtype(dtype)
+        self.bewaar_interval = bewaar_interval
+
+        self._lock = threading.Lock()
+        self._laatst_bewaard = time.monotonic()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # sleutel -> slot, oudste eerst
+        self._index_mtime: Optional[int] = None
+        self._vrije_slots: List[int] = []
+        self._aangeraakt: List[str] = []  # hits sinds de laatste keer bewaren, voor de LRU-volgorde
+        self._vectoren: Optional[np.memmap] = None
+        self._sleutels: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.verwijderd = 0
+
+    @property
+    def _index_pad(self) -> str:
+        return os.path.join(self.map, "index.json")
+
+    @property
+    def _vectoren_pad(self) -> str:
+        return os.path.join(self.map, "vectoren.npy")
+
+    @property
+    def _sleutels_pad(self) -> str:
+        return os.path.join(self.map, "sleutels.npy")
+
+    @contextmanager
+    def _bestandslock(self):
+        """Exclusieve lock over processen heen voor het wijzigen van de cache."""
+        os.makedirs(self.map, exist_ok=True)
+        with open(os.path.join(self.map, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _laad(self):
+        """
+        Laadt index en memory-mapped bestanden van schijf als die bij deze instellingen passen.
+
+        Goedkoop als de index niet is gewijzigd: dan blijft het bij een stat van het bestand.
+        """
+        try:
+            index_mtime = os.stat(self._index_pad).st_mtime_ns
+            if index_mtime == self._index_mtime and self._vectoren is not None:
+                return
+            with open(self._index_pad, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["max_items"] != self.max_items or meta["dtype"] != self.dtype.name:
+                return
+            if self._vectoren is None:
+                self._vectoren = np.load(self._vectoren_pad, mmap_mode="r+")
+                self._sleutels = np.load(self._sleutels_pad, mmap_mode="r+")
+        except (OSError, ValueError, KeyError):
+            # Ontbrekende of beschadigde cache: opnieuw beginnen is goedkoper dan herstellen
+            return
+
+        self._index_mtime = index_mtime
+        self._index = OrderedDict((sleutel, slot) for sleutel, slot in meta["sleutels"])
+        for sleutel in self._aangeraakt:
+            if sleutel in self._index:
+                self._index.move_to_end(sleutel)
+        gebruikt = set(self._index.values())
+        self._vrije_slots = [s for s in range(self.max_items - 1, -1, -1) if s not in gebruikt]
+
+    def _init_opslag(self, dim: int):
+        """Maakt nieuwe, lege bestanden aan voor vectoren van lengte dim."""
+        self._vectoren = np.lib.format.open_memmap(
+            self._vectoren_pad, mode="w+", dtype=self.dtype, shape=(self.max_items, dim)
+        )
+        self._sleutels = np.lib.format.open_memmap(
+            self._sleutels_pad, mode="w+", dtype=np.uint8, shape=(self.max_items, SLEUTEL_BYTES)
+        )
+        self._index = OrderedDict()
+        self._vrije_slots = list(range(self.max_items - 1, -1, -1))
+
+    def _schrijf_index(self):
+        """Schrijft de index atomair weg; alleen aanroepen met de bestandslock."""
+        self._vectoren.flush()
+        self._sleutels.flush()
+        meta = {
+            "model": self.model_naam,
+            "max_items": self.max_items,
+            "dtype": self.dtype.name,
+            "sleutels": list(self._index.items())
+        }
+        tijdelijk_pad = f"{self._index_pad}.{os.getpid()}.tmp"
+        with open(tijdelijk_pad, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tijdelijk_pad, self._index_pad)
+        self._index_mtime = os.stat(self._index_pad).st_mtime_ns
+        self._aangeraakt = []
+        self._laatst_bewaard = time.monotonic()
+
+    def zoek(self, teksten: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Zoekt embeddings op voor een reeks teksten.
+
+        Returns:
+            Lijst met per tekst een float32-vector, of None bij een cache-miss
+        """
+        with self._lock:
+            # Herladen als een ander proces intussen vectoren heeft toegevoegd
+            self._laad()
+
+            resultaat = []
+            for tekst in teksten:
+                sleutel = cache_sleutel(self.model_naam, tekst)
+                slot = self._index.get(sleutel)
+                vector = None
+                if slot is not None:
+                    # Een ander proces kan het slot intussen hebben hergebruikt; de opgeslagen
+                    # sleutel voor en na het lezen bevestigt dat de vector bij deze tekst hoort
+                    digest = bytes.fromhex(sleutel)
+                    if self._sleutels[slot].tobytes() == digest:
+                        vector = np.array(self._vectoren[slot], dtype=np.float32)
+                        if self._sleutels[slot].tobytes() != digest:
+                            vector = None
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._index.move_to_end(sleutel)
+                    self._aangeraakt.append(sleutel)
+                resultaat.append(vector)
+            return resultaat
+
+    def sla_op(self, teksten: Sequence[str], vectoren: np.ndarray):
+        """Slaat embeddings op; bij een volle cache worden de minst recent gebruikte items overschreven."""
+        if len(teksten) == 0:
+            return
+        with self._lock, self._bestandslock():
+            # Herlaad onder de lock, zodat slots die andere processen net hebben uitgedeeld meetellen
+            self._laad()
+            if self._vectoren is None or self._vectoren.shape[1] != vectoren.shape[1]:
+                self._init_opslag(vectoren.shape[1])
+
+            for tekst, vector in zip(teksten, vectoren):
+                sleutel = cache_sleutel(self.model_naam, tekst)
+                slot = self._index.get(sleutel)
+                if slot is None:
+                    if self._vrije_slots:
+                        slot = self._vrije_slots.pop()
+                    else:
+                        _, slot = self._index.popitem(last=False)
+                        self.verwijderd += 1
+                # Sleutel eerst ongeldig maken, zodat een gelijktijdige lezer geen halve vector accepteert
+                self._sleutels[slot] = 0
+                self._vectoren[slot] = vector
+                self._sleutels[slot] = np.frombuffer(bytes.fromhex(sleutel), dtype=np.uint8)
+                self._index[sleutel] = slot
+                self._index.move_to_end(sleutel)
+            self._schrijf_index()
+
+    def bewaar(self, forceer: bool = False):
+        """
+        Legt de LRU-volgorde van recente hits vast op schijf.
+
+        Args:
+            forceer: Ook wegschrijven als het bewaarinterval nog niet voorbij is
+        """
+        with self._lock:
+            if not self._aangeraakt or self._vectoren is None:
+                return
+            if not forceer and time.monotonic() - self._laatst_bewaard < self.bewaar_interval:
+                return
+            with self._bestandslock():
+                self._laad()
+                self._schrijf_index()
+
+    def statistieken(self) -> Dict:
+        """Geeft hit/miss-statistieken en de vulling van de cache."""
+        with self._lock:
+            opvragingen = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / opvragingen, 3) if opvragingen else 0.0,
+                "verwijderd": self.verwijderd,
+                "items": len(self._index),
+                "max_items": self.max_items
+            }
@@ -0,0 +1,185 @@
+"""
+Module voor het bundelen van embeddingverzoeken uit gelijktijdige sessies tot één modelaanroep.
+
+Zonder planner roept iedere sessie (of ieder verzoek aan de dienst) het gedeelde model zelf aan.
+Bij gelijktijdig gebruik levert dat veel kleine forward passes op die om dezelfde torch-threads
+concurreren. De planner heeft één workerthread: aanroepers leveren hun teksten in en krijgen een
+Future terug; de worker wacht na het eerste verzoek een paar milliseconden op meer verzoeken
+(tot een maximum aantal teksten), ontdubbelt de teksten over alle verzoeken, encodeert ze in één
+aanroep van encodering.encodeer en verdeelt de vectoren weer over de aanroepers.
+
+Iedere gebundelde aanroep wordt als eigen analyse (embedding_batch) gemeten en gelogd, met het
+aantal verzoeken, teksten en ontdubbelde teksten als tellers. Dat rapport gaat met de vectoren
+mee terug naar iedere aanroeper; encodeer neemt het op in de analyse van de aanroeper, zodat de
+modeltellers en -tijden ook daar zichtbaar zijn. Een bundel die met andere sessies is gedeeld
+telt bij ieder van die sessies volledig mee.
+
+Omgevingsvariabelen:
+    KD_ENCODE_PLANNER: 0 laat iedere aanroeper het model weer zelf aanroepen (standaard 1)
+    KD_ENCODE_PLANNER_WACHT_MS: milliseconden dat de worker op meer verzoeken wacht (standaard 5)
+    KD_ENCODE_PLANNER_MAX_TEKSTEN: aantal teksten waarna niet langer wordt gewacht (standaard 512)
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from encodering import encodeer
+from instrumentatie import Rapport, meting, neem_over, tel
+from modelbeheer import laad_model
+
+INGESCHAKELD = os.environ.get("KD_ENCODE_PLANNER", "1") != "0"
+WACHT_MS = float(os.environ.get("KD_ENCODE_PLANNER_WACHT_MS", "5"))
+MAX_TEKSTEN = int(os.environ.get("KD_ENCODE_PLANNER_MAX_TEKSTEN", "512"))
+
+
+def _encodeer_met_model(teksten: Sequence[str]) -> np.ndarray:
+    return encodeer(laad_model(), teksten)
+
+
+@dataclass
+class BundelResultaat:
+    """
+    Uitkomst van een verzoek aan de planner.
+
+    Attributes:
+        vectoren: Een vector per ingeleverde tekst, in volgorde
+        rapport: Metingen van de gebundelde aanroep waarin de teksten zijn ge-encodeerd, of
+            None als de instrumentatie is uitgeschakeld
+    """
+    vectoren: np.ndarray
+    rapport: Optional[Rapport] = None
+
+
+@dataclass
+class _Verzoek:
+    teksten: Sequence[str]
+    future: Future
+
+
+class EmbeddingPlanner:
+    """Eén workerthread die embeddingverzoeken bundelt, ontdubbelt en in één aanroep encodeert."""
+
+    def __init__(self, encodeer_functie: Callable[[Sequence[str]], np.ndarray] = _encodeer_met_model,
+                 wacht_ms: float = WACHT_MS, max_teksten: int = MAX_TEKSTEN):
+        """
+        Initialiseert de planner; de workerthread start bij het eerste verzoek.
+
+        Args:
+            encodeer_functie: Functie die een lijst teksten omzet naar een vector per tekst
+            wacht_ms: Milliseconden dat na het eerste verzoek op meer verzoeken wordt gewacht
+            max_teksten: Aantal teksten in een bundel waarna niet langer wordt gewacht
+        """
+        self.encodeer_functie = encodeer_functie
+        self.wacht_s = wacht_ms / 1000
+        self.max_teksten = max_teksten
+        self._wachtrij: "queue.Queue[Optional[_Verzoek]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.bundels = 0
+        self.verzoeken = 0
+        self.teksten = 0
+        self.ontdubbeld = 0
+
+    def dien_in(self, teksten: Sequence[str]) -> Future:
+        """
+        Levert teksten in voor de volgende bundel.
+
+        Returns:
+            Future met een BundelResultaat
+        """
+        future = Future()
+        if not teksten:
+            future.set_result(BundelResultaat(np.zeros((0, 0), dtype=np.float32)))
+            return future
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._werk, name="embedding-planner", daemon=True)
+                self._worker.start()
+        self._wachtrij.put(_Verzoek(list(teksten), future))
+        return future
+
+    def encodeer(self, teksten: Sequence[str]) -> np.ndarray:
+        """Levert teksten in, wacht op hun vectoren en neemt de metingen van de bundel op in de actieve analyse."""
+        resultaat = self.dien_in(teksten).result()
+        neem_over(resultaat.rapport)
+        return resultaat.vectoren
+
+    def stop(self):
+        """Stopt de worker nadat de verzoeken die al in de wachtrij staan zijn afgehandeld."""
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._wachtrij.put(None)
+            worker.join()
+
+    def _werk(self):
+        stoppen = False
+        while not stoppen:
+            eerste = self._wachtrij.get()
+            if eerste is None:
+                return
+            bundel, aantal = [eerste], len(eerste.teksten)
+            deadline = time.monotonic() + self.wacht_s
+            while aantal < self.max_teksten:
+                resterend = deadline - time.monotonic()
+                if resterend <= 0:
+                    break
+                try:
+                    verzoek = self._wachtrij.get(timeout=resterend)
+                except queue.Empty:
+                    break
+                if verzoek is None:
+                    # Eerst de verzamelde verzoeken afhandelen, daarna stoppen
+                    stoppen = True
+                    break
+                bundel.append(verzoek)
+                aantal += len(verzoek.teksten)
+            self._verwerk(bundel)
+
+    def _verwerk(self, bundel: List[_Verzoek]):
+        # Verzoeken waarvan de aanroeper intussen heeft geannuleerd vallen af
+        bundel = [verzoek for verzoek in bundel if verzoek.future.set_running_or_notify_cancel()]
+        if not bundel:
+            return
+
+        uniek: Dict[str, int] = {}
+        indices = [[uniek.setdefault(tekst, len(uniek)) for tekst in verzoek.teksten] for verzoek in bundel]
+        totaal = sum(len(verzoek.teksten) for verzoek in bundel)
+        try:
+            with meting("embedding_batch") as rapport:
+                tel("embedding_batch_verzoeken", len(bundel))
+                tel("embedding_batch_teksten", len(uniek))
+                tel("embedding_batch_ontdubbeld", totaal - len(uniek))
+                vectoren = np.asarray(self.encodeer_functie(list(uniek)), dtype=np.float32)
+        except BaseException as e:
+            for verzoek in bundel:
+                verzoek.future.set_exception(e)
+            return
+
+        self.bundels += 1
+        self.verzoeken += len(bundel)
+        self.teksten += len(uniek)
+        self.ontdubbeld += totaal - len(uniek)
+        for verzoek, rijen in zip(bundel, indices):
+            verzoek.future.set_result(BundelResultaat(vectoren[rijen], rapport))
+
+    def statistieken(self) -> Dict:
+        """Aantal bundels, verzoeken en teksten sinds de start, en de gemiddelde bundelgrootte."""
+        return {
+            "bundels": self.bundels,
+            "verzoeken": self.verzoeken,
+            "teksten": self.teksten,
+            "ontdubbeld": self.ontdubbeld,
+            "verzoeken_per_bundel": round(self.verzoeken / self.bundels, 2) if self.bundels else 0.0
+        }
+
+
+# Gedeelde planner voor alle sessies en verzoeken in dit proces
+embedding_planner = EmbeddingPlanner()
@@ -0,0 +1,198 @@
+"""
+Module voor het encoderen van werkprocesteksten van ongelijke lengte.
+
+Het model kapt alles boven zijn maximale sequentielengte (128 tokens voor MiniLM) stilletjes af,
+waardoor een wijziging aan het eind van een lang werkproces onzichtbaar blijft. Daarom:
+
+1. Teksten die langer zijn dan het model aankan worden op zinsgrenzen opgedeeld in stukken die
+   wel passen; een zin die op zichzelf te lang is wordt op woordgrenzen verdeeld.
+2. Alle stukken van alle teksten in de aanroep worden ontdubbeld en op tokenlengte gesorteerd,
+   zodat een batch stukken van vrijwel gelijke lengte bevat en er weinig opvulling nodig is.
+3. De batchgrootte volgt uit een tokenbudget: korte stukken gaan in grote batches, lange in kleine.
+4. De vectoren van de stukken worden per tekst teruggebracht tot een vector, gewogen naar het
+   aantal tokens per stuk. Voor MiniLM (mean pooling) benadert dat het gemiddelde over alle tokens.
+
+Een tekst die in een keer past blijft een stuk en krijgt dezelfde vector als voorheen.
+
+Omgevingsvariabelen:
+    KD_ENCODE_OPDELEN: 0 schakelt het opdelen uit; lange teksten worden dan weer afgekapt (standaard 1)
+    KD_ENCODE_STUK_TOKENS: maximaal aantal tokens per stuk; 0 gebruikt de maximale lengte van het model
+    KD_ENCODE_BATCH_TOKENS: tokenbudget per batch, inclusief opvulling (standaard 8192)
+    KD_ENCODE_MAX_BATCH: maximaal aantal stukken per batch (standaard 256)
+"""
+import os
+import re
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from instrumentatie import meet, tel
+from modelbeheer import OPDELEN
+
+STUK_TOKENS = int(os.environ.get("KD_ENCODE_STUK_TOKENS", "0"))
+BATCH_TOKENS = int(os.environ.get("KD_ENCODE_BATCH_TOKENS", "8192"))
+MAX_BATCH = int(os.environ.get("KD_ENCODE_MAX_BATCH", "256"))
+
+# Zinsgrenzen, en regels die met een opsommingsteken beginnen
+ZINSGRENS = re.compile(r"(?<=[.!?;])\s+|\n(?=\s*[•·▪\-–*])")
+
+
+def splits_zinnen(tekst: str) -> List[str]:
+    """Deelt een tekst op in zinnen en opsommingsregels, zonder lege delen."""
+    return [zin.strip() for zin in ZINSGRENS.split(tekst) if zin.strip()]
+
+
+def _tokenlengtes(model, teksten: Sequence[str]) -> List[int]:
+    """Aantal tokens per tekst zonder speciale tokens; zonder tokenizer een schatting per woord."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None or not teksten:
+        return [len(tekst.split()) for tekst in teksten]
+    invoer = tokenizer(list(teksten), add_special_tokens=False, return_attention_mask=False,
+                       return_token_type_ids=False, verbose=False)["input_ids"]
+    return [len(ids) for ids in invoer]
+
+
+def _extra_tokens(model) -> int:
+    """Aantal speciale tokens dat het model aan iedere invoer toevoegt (bij BERT [CLS] en [SEP])."""
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None or not hasattr(tokenizer, "num_special_tokens_to_add"):
+        return 0
+    return tokenizer.num_special_tokens_to_add()
+
+
+def stuk_budget(model) -> int:
+    """Maximaal aantal tokens per stuk, of 0 als het model geen bekende maximale lengte heeft."""
+    if STUK_TOKENS:
+        return STUK_TOKENS
+    max_lengte = getattr(model, "max_seq_length", None)
+    if not max_lengte or getattr(model, "tokenizer", None) is None:
+        return 0
+    return max(max_lengte - _extra_tokens(model), 1)
+
+
+def _pak(delen: Sequence[str], lengtes: Sequence[int], budget: int) -> List[Tuple[str, int]]:
+    """Voegt opeenvolgende delen samen tot stukken van hooguit budget tokens (een te lang deel blijft los)."""
+    stukken = []
+    huidig, huidige_lengte = [], 0
+    for deel, lengte in zip(delen, lengtes):
+        if huidig and huidige_lengte + lengte > budget:
+            stukken.append((" ".join(huidig), huidige_lengte))
+            huidig, huidige_lengte = [], 0
+        huidig.append(deel)
+        huidige_lengte += lengte
+    if huidig:
+        stukken.append((" ".join(huidig), huidige_lengte))
+    return stukken
+
+
+def deel_op(model, teksten: Sequence[str], budget: int) -> Tuple[List[List[str]], List[List[int]]]:
+    """
+    Deelt iedere tekst op in stukken die binnen het tokenbudget passen.
+
+    Args:
+        model: Model met (optioneel) een Hugging Face-tokenizer als attribuut tokenizer
+        teksten: De teksten
+        budget: Maximaal aantal tokens per stuk; 0 deelt niets op
+
+    Returns:
+        Per tekst de stukken en per stuk het (geschatte) aantal tokens
+    """
+    lengtes = _tokenlengtes(model, teksten)
+    stukken = [[tekst] for tekst in teksten]
+    stuklengtes = [[lengte] for lengte in lengtes]
+    te_lang = [i for i, lengte in enumerate(lengtes) if budget and lengte > budget]
+    if not te_lang:
+        return stukken, stuklengtes
+
+    tel("encode_opgedeelde_teksten", len(te_lang))
+    zinnen = {i: splits_zinnen(teksten[i]) for i in te_lang}
+    zinlengtes = iter(_tokenlengtes(model, [zin for i in te_lang for zin in zinnen[i]]))
+    for i in te_lang:
+        delen, deellengtes = [], []
+        for zin in zinnen[i]:
+            lengte = next(zinlengtes)
+            if lengte <= budget:
+                delen.append(zin)
+                deellengtes.append(lengte)
+                continue
+            # Een zin die op zichzelf te lang is wordt op woordgrenzen verdeeld
+            woorden = zin.split()
+            for stuk, stuklengte in _pak(woorden, _tokenlengtes(model, woorden), budget):
+                delen.append(stuk)
+                deellengtes.append(stuklengte)
+        gepakt = _pak(delen, deellengtes, budget)
+        stukken[i] = [stuk for stuk, _ in gepakt]
+        stuklengtes[i] = [lengte for _, lengte in gepakt]
+    return stukken, stuklengtes
+
+
+def _batches(lengtes: Sequence[int], extra: int) -> List[np.ndarray]:
+    """Verdeelt stukken op volgorde van lengte over batches binnen BATCH_TOKENS en MAX_BATCH."""
+    volgorde = np.argsort(np.asarray(lengtes, dtype=np.int64), kind="stable")
+    batches, huidig = [], []
+    for index in volgorde.tolist():
+        # Gesorteerd oplopend, dus het laatste stuk bepaalt de opgevulde lengte van de batch
+        opgevuld = (len(huidig) + 1) * (lengtes[index] + extra)
+        if huidig and (opgevuld > BATCH_TOKENS or len(huidig) >= MAX_BATCH):
+            batches.append(np.asarray(huidig))
+            huidig = []
+        huidig.append(index)
+    if huidig:
+        batches.append(np.asarray(huidig))
+    return batches
+
+
+def encodeer(model, teksten: Sequence[str]) -> np.ndarray:
+    """
+    Encodeert teksten via opdelen, sorteren op lengte en batchgewijs encoderen.
+
+    Args:
+        model: SentenceTransformer-model (of een object met dezelfde encode-methode)
+        teksten: Niet-lege teksten
+
+    Returns:
+        Een (niet-genormaliseerde) vector per tekst, in de volgorde van teksten
+    """
+    if not teksten:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    with meet("opdelen"):
+        budget = stuk_budget(model) if OPDELEN else 0
+        stukken_per_tekst, lengtes_per_tekst = deel_op(model, teksten, budget)
+        # Gelijke stukken (bijv. een standaardzin in meerdere werkprocessen) maar een keer encoderen
+        uniek = {}
+        for stukken in stukken_per_tekst:
+            for stuk in stukken:
+                uniek.setdefault(stuk, len(uniek))
+        lengtes = [0] * len(uniek)
+        for stukken, stuklengtes in zip(stukken_per_tekst, lengtes_per_tekst):
+            for stuk, lengte in zip(stukken, stuklengtes):
+                lengtes[uniek[stuk]] = lengte
+        unieke_stukken = list(uniek)
+        extra = _extra_tokens(model)
+        batches = _batches(lengtes, extra)
+
+    tel("encode_stukken", len(unieke_stukken))
+    vectoren = None
+    for batch in batches:
+        with meet("batch"):
+            batch_lengtes = [lengtes[i] for i in batch.tolist()]
+            tel("model_encode_aanroepen")
+            tel("model_encode_teksten", len(batch))
+            tel("model_encode_opvulling", max(batch_lengtes) * len(batch) - sum(batch_lengtes))
+            uitvoer = np.asarray(model.encode(
+                [unieke_stukken[i] for i in batch.tolist()], batch_size=len(batch), convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+            if vectoren is None:
+                vectoren = np.empty((len(unieke_stukken), uitvoer.shape[1]), dtype=np.float32)
+            vectoren[batch] = uitvoer
+
+    resultaat = np.empty((len(teksten), vectoren.shape[1]), dtype=np.float32)
+    for i, (stukken, stuklengtes) in enumerate(zip(stukken_per_tekst, lengtes_per_tekst)):
+        if len(stukken) == 1:
+            resultaat[i] = vectoren[uniek[stukken[0]]]
+            continue
+        gewichten = np.asarray(stuklengtes, dtype=np.float32)
+        resultaat[i] = gewichten @ vectoren[[uniek[stuk] for stuk in stukken]] / gewichten.sum()
+    return resultaat
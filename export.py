@@ -0,0 +1,62 @@
+"""
+Module voor het exporteren van vergelijkingsresultaten naar bytes in het geheugen.
+
+Excel wordt met een write-only werkboek rij voor rij weggeschreven, zodat ook grote
+rapporten met volledige werkprocesteksten niet als compleet werkboek in het geheugen
+staan. Daarnaast zijn CSV en Parquet beschikbaar. Er worden geen bestanden in /tmp
+achtergelaten; de bytes kunnen direct naar een downloadknop of een eigen bestand.
+"""
+import io
+from typing import Any, Dict
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+
+def _celwaarde(waarde: Any) -> Any:
+    """Zet een DataFrame-waarde om naar iets wat openpyxl kan schrijven."""
+    if isinstance(waarde, str):
+        # Stuurtekens uit de PDF-extractie zijn niet toegestaan in xlsx
+        return ILLEGAL_CHARACTERS_RE.sub("", waarde)
+    if waarde is None or (not isinstance(waarde, (list, tuple, dict)) and pd.isna(waarde)):
+        return None
+    return waarde
+
+
+def naar_excel(bladen: Dict[str, pd.DataFrame]) -> bytes:
+    """
+    Schrijft een of meer DataFrames als tabbladen naar een xlsx-bestand in het geheugen.
+
+    Args:
+        bladen: Tabbladnaam -> DataFrame, in de gewenste volgorde
+
+    Returns:
+        De bytes van het xlsx-bestand
+    """
+    werkboek = Workbook(write_only=True)
+    for naam, df in bladen.items():
+        blad = werkboek.create_sheet(title=naam)
+        blad.append([str(kolom) for kolom in df.columns])
+        for rij in df.itertuples(index=False, name=None):
+            blad.append([_celwaarde(waarde) for waarde in rij])
+
+    buffer = io.BytesIO()
+    werkboek.save(buffer)
+    return buffer.getvalue()
+
+
+def naar_csv(df: pd.DataFrame) -> bytes:
+    """Schrijft een DataFrame als CSV; met BOM zodat Excel de tekens goed leest."""
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def naar_parquet(df: pd.DataFrame) -> bytes:
+    """Schrijft een DataFrame als Parquet-bestand in het geheugen."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
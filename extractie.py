@@ -1,68 +1,76 @@
-import pdfplumber
-import re
-from typing import Dict, List
+from typing import Dict, List, Optional, Sequence, Union
 
+from blokken import CodeTabel
+from dossier import GeparseerdDossier, als_dossier
+from tokenizer import Token, eerste, opsomming_patroon, sectie_patroon, tokeniseer, van_soort
 
-def extracteer_data(pdf_path: str) -> Dict:
-    with pdfplumber.open(pdf_path) as pdf:
-        text = "\n".join([page.extract_text() or "" for page in pdf.pages])
+METADATA_SOORTEN = ["crebonr_dossier", "crebonr_kwalificatie", "naam_kwalificatie", "versie", "geldig_vanaf"]
+
+
+def extracteer_data(pdf_path: Union[str, GeparseerdDossier]) -> Dict:
+    # Alleen pagina's met metadata, codes of sectiekoppen (en hun vervolgpagina's) worden uitgelezen
+    text = als_dossier(pdf_path).selectie("kerntaken").tekst
+
+    # Een enkele doorloop van de tekst levert alle koppen, codes en metadatavelden
+    tokens = tokeniseer(text)
 
     data = {
-        "metadata": extracteer_metadata(text),
-        "kerntaken": extracteer_kerntaken(text),
-        "werkprocessen": extracteer_werkprocessen(text),
-        "context": extracteer_sectie(text, "Context"),
-        "beroepshouding": extracteer_sectie(text, "Typerende beroepshouding"),
-        "resultaat": extracteer_sectie(text, "Resultaat van de beroepsgroep"),
-        "vakkennis_vaardigheden": extracteer_opsomming(text, "Vakkennis en vaardigheden")
+        "metadata": _metadata_uit_tokens(tokens),
+        "kerntaken": _codes_uit_tokens(tokens, "kerntaak"),
+        "werkprocessen": _codes_uit_tokens(tokens, "werkproces"),
+        "context": _sectie_uit_token(eerste(tokens, "context")),
+        "beroepshouding": _sectie_uit_token(eerste(tokens, "beroepshouding")),
+        "resultaat": _sectie_uit_token(eerste(tokens, "resultaat")),
+        "vakkennis_vaardigheden": _opsomming_uit_token(eerste(tokens, "vakkennis_vaardigheden"))
     }
 
     return data
 
 
+def _metadata_uit_tokens(tokens: Sequence[Token]) -> Dict:
+    waarden = {}
+    for soort in METADATA_SOORTEN:
+        token = eerste(tokens, soort)
+        waarden[soort] = token.waarden[0].strip() if token else "-"
+    return waarden
+
+
+def _codes_uit_tokens(tokens: Sequence[Token], soort: str) -> CodeTabel:
+    gevonden = van_soort(tokens, soort)
+    return CodeTabel([t.waarden[0].strip() for t in gevonden], [t.waarden[1].strip() for t in gevonden])
+
+
+def _sectie_uit_token(token: Optional[Token]) -> str:
+    return token.waarden[0].strip() if token else "-"
+
+
+def _opsomming_uit_token(token: Optional[Token]) -> List[str]:
+    if not token:
+        return []
+    inhoud = token.waarden[0]
+    regels = [r.strip("•- ") for r in inhoud.split("\n") if r.strip()]
+    return regels
+
+
 def extracteer_metadata(text: str) -> Dict:
-    crebo_dossier = re.search(r"Crebonummer kwalificatiedossier\s*:?\s*(\d+)", text)
-    crebo_kwalificatie = re.search(r"Crebonummer kwalificatie\s*:?\s*(\d+)", text)
-    naam = re.search(r"Naam kwalificatie\s*:?\s*(.+)", text)
-    versie = re.search(r"Versie\s*:?\s*([\w\-/]+)", text)
-    geldig = re.search(r"Geldig vanaf\s*:?\s*([\w\-/]+)", text)
-
-    return {
-        "crebonr_dossier": crebo_dossier.group(1) if crebo_dossier else "-",
-        "crebonr_kwalificatie": crebo_kwalificatie.group(1) if crebo_kwalificatie else "-",
-        "naam_kwalificatie": naam.group(1).strip() if naam else "-",
-        "versie": versie.group(1) if versie else "-",
-        "geldig_vanaf": geldig.group(1) if geldig else "-"
-    }
+    return _metadata_uit_tokens(tokeniseer(text, METADATA_SOORTEN))
 
 
-def extracteer_kerntaken(text: str) -> List[Dict]:
-    pattern = r"(B\d+-K\d+)\s+([^\n]+)"
-    matches = re.findall(pattern, text)
-    kerntaken = []
-    for code, naam in matches:
-        kerntaken.append({"code": code.strip(), "naam": naam.strip()})
-    return kerntaken
+def extracteer_kerntaken(text: str) -> CodeTabel:
+    return _codes_uit_tokens(tokeniseer(text, ["kerntaak"]), "kerntaak")
 
 
-def extracteer_werkprocessen(text: str) -> List[Dict]:
-    pattern = r"(B\d+-K\d+-W\d+)\s+([^\n]+)"
-    matches = re.findall(pattern, text)
-    werkprocessen = []
-    for code, naam in matches:
-        werkprocessen.append({"code": code.strip(), "naam": naam.strip()})
-    return werkprocessen
+def extracteer_werkprocessen(text: str) -> CodeTabel:
+    return _codes_uit_tokens(tokeniseer(text, ["werkproces"]), "werkproces")
 
 
 def extracteer_sectie(text: str, titel: str) -> str:
-    pattern = rf"{titel}\n+(.+?)(?:\n\n|\Z)"
-    match = re.search(pattern, text, re.DOTALL)
+    match = sectie_patroon(titel).search(text)
     return match.group(1).strip() if match else "-"
 
 
 def extracteer_opsomming(text: str, kop: str) -> List[str]:
-    pattern = rf"{kop}\n+(.*?)\n\n"
-    match = re.search(pattern, text, re.DOTALL)
+    match = opsomming_patroon(kop).search(text)
     if not match:
         return []
     inhoud = match.group(1)
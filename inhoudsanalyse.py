@@ -1,56 +1,454 @@
-import pdfplumber
+import hashlib
+import os
 import re
 import pandas as pd
-import uuid
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer, util
-
-model = SentenceTransformer("paraphrase-MiniLM-L6-v2")
-
-def extract_full_text(pdf_path: str) -> str:
-    with pdfplumber.open(pdf_path) as pdf:
-        tekst = []
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            # Sla inhoudsopgave-achtige pagina's over
-            if page_text.count("...") > 5 or re.search(r'\.{3,} *\d+', page_text):
-                continue
-            tekst.append(page_text)
-        return "\n".join(tekst)
-
-def bepaal_deel(code: str) -> str:
-    if code.startswith("B"):
-        return "Basisdeel"
-    elif code.startswith("P"):
-        return "Profieldeel"
-    else:
-        return "Algemeen"
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Dict, Tuple, Optional, Union
+from blokken import BlokTabel, bepaal_deel
+from dossier import GeparseerdDossier, als_dossier
+from export import naar_excel
+from tokenizer import tokeniseer
+from embeddingcache import EmbeddingCache, normaliseer_tekst
+from encodering import encodeer
+from embeddingplanner import INGESCHAKELD as PLANNER_INGESCHAKELD, embedding_planner
+from modelbeheer import MODEL_VARIANT, laad_model
+from instrumentatie import meet, tel
+
+embedding_cache = EmbeddingCache(MODEL_VARIANT)
+
+# Een werkproceskop aan het eind van de tekst waarvan de naam nog op de volgende pagina kan staan
+_OPEN_KOP = re.compile(r"B\d+-K\d+-W\d+:\s*\Z")
+
+# KD_WERKPROCES_VOORKOPPELEN=0 stuurt alle werkprocessen weer door de semantische koppeling
+VOORKOPPELEN = os.environ.get("KD_WERKPROCES_VOORKOPPELEN", "1") != "0"
+
+# Waarden van de kolom Koppeling: welke stap van koppel_trapsgewijs het paar heeft bepaald
+KOPPELING_TEKST = "Identieke tekst"
+KOPPELING_NAAM = "Zelfde naam"
+KOPPELING_SEMANTISCH = "Semantisch"
+
+def __getattr__(naam: str):
+    # Oude aanroepers gebruikten inhoudsanalyse.model; laad het pas als het echt wordt opgevraagd
+    if naam == "model":
+        return laad_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {naam!r}")
+
+def extract_full_text(pdf_path: Union[str, GeparseerdDossier]) -> str:
+    # Alleen het paginabereik met werkprocesblokken; inhoudsopgave-achtige pagina's worden overgeslagen
+    return als_dossier(pdf_path).selectie("werkprocessen").tekst
+
+def extract_werkprocesblokken(text: str) -> BlokTabel:
+    """
+    Zoekt de werkprocesblokken in de tekst van een dossier.
+
+    De blokteksten worden niet gekopieerd: de tabel verwijst met offsets naar de tekst zelf.
+    """
+    matches = tokeniseer(text, ["werkprocesblok"])
+
+    codes, namen, starts, einden = [], [], [], []
+    for i, match in enumerate(matches):
+        start = match.eind
+        end = matches[i + 1].start if i + 1 < len(matches) else len(text)
+        # Dezelfde grenzen als text[start:end].strip()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        codes.append(match.waarden[0].strip())
+        namen.append(match.waarden[1].strip())
+        starts.append(start)
+        einden.append(end)
+    return BlokTabel(text, codes, namen, starts, einden)
+
+def stroom_werkprocesblokken(paginateksten: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Zoekt de werkprocesblokken in een stroom van paginateksten, zoals extract_werkprocesblokken
+    dat doet in de met newlines samengevoegde tekst.
+
+    Een blok wordt geleverd zodra de kop van het volgende blok vaststaat; daarna wordt de tekst
+    ervoor losgelaten. In het geheugen staat dus hooguit het lopende blok plus een pagina.
+
+    Yields:
+        (code, naam, tekst) per blok, in documentvolgorde
+    """
+    def blok(buffer: str, match, eind: int) -> Tuple[str, str, str]:
+        return match.waarden[0].strip(), match.waarden[1].strip(), buffer[match.eind:eind].strip()
+
+    buffer = ""
+    for k, tekst in enumerate(paginateksten):
+        if k:
+            buffer += "\n"
+        # Een kop die voor deze pagina eindigt verandert niet meer: zijn naam stopt bij de newline
+        vast = len(buffer)
+        buffer += tekst
+        matches = tokeniseer(buffer, ["werkprocesblok"])
+        stabiel = 0
+        while stabiel < len(matches) and matches[stabiel].eind <= vast:
+            stabiel += 1
+        for i in range(stabiel - 1):
+            yield blok(buffer, matches[i], matches[i + 1].start)
 
-def extract_werkprocesblokken(text: str) -> List[Dict]:
-    pattern = r"(B\d+-K\d+-W\d+):\s*([^\n]+)"
-    matches = list(re.finditer(pattern, text))
+        if stabiel:
+            buffer = buffer[matches[stabiel - 1].start:]
+        elif matches:
+            buffer = buffer[matches[0].start:]
+        else:
+            # Tekst voor de eerste kop hoort bij geen blok
+            open_kop = _OPEN_KOP.search(buffer)
+            buffer = buffer[open_kop.start():] if open_kop else ""
 
-    blokken = []
+    matches = tokeniseer(buffer, ["werkprocesblok"])
     for i, match in enumerate(matches):
-        code = match.group(1).strip()
-        naam = match.group(2).strip()
-        start = match.end()
-        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-        tekst = text[start:end].strip()
-        deel = bepaal_deel(code)
-        blokken.append({
-            "code": code,
-            "kerntaak": "-".join(code.split("-")[:2]),
-            "naam": naam,
-            "tekst": tekst,
-            "deel": deel
-        })
-    return blokken
+        yield blok(buffer, match, matches[i + 1].start if i + 1 < len(matches) else len(buffer))
+
+def lees_werkprocesblokken(pdf_path: Union[str, GeparseerdDossier]) -> Tuple[BlokTabel, int]:
+    """
+    Leest de werkprocesblokken van een dossier pagina voor pagina, zonder de volledige tekst op te bouwen.
+
+    Grote dossiers worden gestroomd (zie PaginaSelectie.stroom); het resultaat is gelijk aan
+    extract_werkprocesblokken(extract_full_text(pdf_path)), maar met een eigen, compacte tekstbuffer.
+
+    Returns:
+        Tuple van (blokken, lengte van de dossiertekst zonder witruimte aan begin en eind); de
+        pagina's voor het eerste werkprocesblok tellen mee met hun lengte uit de pagina-index
+    """
+    dossier = als_dossier(pdf_path)
+    selectie = dossier.selectie("werkprocessen")
+    omvang = {"positie": 0, "eerste": None, "laatste": 0}
+
+    def teksten() -> Iterator[str]:
+        for pagina in selectie.stroom():
+            tekst = pagina.tekst
+            if tekst.strip():
+                if omvang["eerste"] is None:
+                    omvang["eerste"] = omvang["positie"] + len(tekst) - len(tekst.lstrip())
+                omvang["laatste"] = omvang["positie"] + len(tekst.rstrip())
+            omvang["positie"] += len(tekst) + 1
+            yield tekst
+
+    codes, namen, blokteksten = [], [], []
+    for code, naam, tekst in stroom_werkprocesblokken(teksten()):
+        codes.append(code)
+        namen.append(naam)
+        blokteksten.append(tekst)
+    lengte = omvang["laatste"] - omvang["eerste"] if omvang["eerste"] is not None else 0
+    geselecteerd = set(selectie.nummers)
+    lengte += dossier.leesbare_tekens([n for n in range(1, dossier.aantal_paginas + 1) if n not in geselecteerd])
+    return BlokTabel.van_teksten(codes, namen, blokteksten), lengte
 
 def vergelijk_inhoud(tekst1: str, tekst2: str) -> float:
-    emb1 = model.encode(tekst1, convert_to_tensor=True)
-    emb2 = model.encode(tekst2, convert_to_tensor=True)
-    return float(util.cos_sim(emb1, emb2))
+    emb1, emb2 = encodeer_teksten([tekst1, tekst2])
+    norm1, norm2 = np.linalg.norm(emb1), np.linalg.norm(emb2)
+    # Een nulvector (bijv. van een lege tekst) lijkt nergens op; voorkomt een deling door nul
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return float(emb1 @ emb2 / (norm1 * norm2))
+
+def encodeer_teksten(teksten: List[str]) -> np.ndarray:
+    """
+    Geeft de embeddings van een reeks teksten, waar mogelijk uit de embeddingcache.
+
+    Alleen teksten die nog niet in de cache staan gaan (ontdubbeld) door het model; lange teksten
+    worden daarbij opgedeeld en per lengte gebatcht, zie encodering.encodeer. Via de
+    embeddingplanner worden ze gebundeld met gelijktijdige aanroepen uit andere sessies; de
+    tellers van het model staan dan in de logregel van die bundel (embedding_batch).
+    """
+    vectoren = embedding_cache.zoek(teksten)
+    ontbrekend = {}
+    for i, vector in enumerate(vectoren):
+        if vector is None:
+            ontbrekend.setdefault(normaliseer_tekst(teksten[i]), []).append(i)
+    tel("embedding_cache_hits", len(teksten) - sum(len(indices) for indices in ontbrekend.values()))
+
+    if ontbrekend:
+        unieke_teksten = [teksten[indices[0]] for indices in ontbrekend.values()]
+        with meet("model_encode"):
+            if PLANNER_INGESCHAKELD:
+                tel("embedding_planner_teksten", len(unieke_teksten))
+                nieuwe_vectoren = embedding_planner.encodeer(unieke_teksten)
+            else:
+                nieuwe_vectoren = encodeer(laad_model(), unieke_teksten)
+        embedding_cache.sla_op(unieke_teksten, nieuwe_vectoren)
+        for indices, vector in zip(ontbrekend.values(), nieuwe_vectoren):
+            for i in indices:
+                vectoren[i] = vector
+    embedding_cache.bewaar()
+
+    return np.vstack(vectoren).astype(np.float32)
+
+def bereken_similariteitsmatrix(oud_teksten: List[str], nieuw_teksten: List[str]) -> np.ndarray:
+    """
+    Berekent de volledige oud x nieuw cosinus-similariteitsmatrix.
+
+    Alle niet-lege teksten van beide dossiers worden in een aanroep ge-encodeerd, zodat ze
+    samen op lengte worden gebatcht.
+    Paren waarvan een van beide teksten leeg is krijgen NaN, zodat ze bij het
+    koppelen worden overgeslagen.
+    """
+    matrix = np.full((len(oud_teksten), len(nieuw_teksten)), np.nan, dtype=np.float32)
+    oud_idx = [i for i, t in enumerate(oud_teksten) if t.strip()]
+    nieuw_idx = [j for j, t in enumerate(nieuw_teksten) if t.strip()]
+    if not oud_idx or not nieuw_idx:
+        return matrix
+
+    vectoren = _normaliseer(encodeer_teksten(
+        [oud_teksten[i] for i in oud_idx] + [nieuw_teksten[j] for j in nieuw_idx]
+    ))
+    oud_emb, nieuw_emb = vectoren[:len(oud_idx)], vectoren[len(oud_idx):]
+
+    matrix[np.ix_(oud_idx, nieuw_idx)] = _cosinus(oud_emb, nieuw_emb)
+    return matrix
+
+def _normaliseer(vectoren: np.ndarray) -> np.ndarray:
+    return vectoren / np.linalg.norm(vectoren, axis=1, keepdims=True)
+
+def _cosinus(oud_emb: np.ndarray, nieuw_emb: np.ndarray) -> np.ndarray:
+    # In float64 berekend en pas daarna afgerond: zo hangt een cel niet af van de vorm van de
+    # matrixvermenigvuldiging, en geeft een deelberekening dezelfde waarden als een volledige
+    return (oud_emb.astype(np.float64) @ nieuw_emb.astype(np.float64).T).astype(np.float32)
+
+def vingerafdrukken(blokken: BlokTabel) -> List[str]:
+    """Vingerafdrukken van alle blokken in een tabel, in volgorde."""
+    return [f"{code}:{hashlib.sha256(tekst.encode('utf-8')).hexdigest()}"
+            for code, tekst in zip(blokken.codes, blokken.teksten)]
+
+@dataclass
+class WerkprocesToestand:
+    """
+    Vectoren van een eerdere werkprocesanalyse, voor een incrementele herberekening.
+
+    Attributes:
+        model: Modelvariant waarmee de vectoren zijn berekend
+        oud: Vingerafdrukken van de oude blokken, in volgorde
+        nieuw: Vingerafdrukken van de nieuwe blokken, in volgorde
+        vectoren: Genormaliseerde embedding per vingerafdruk, voor de blokken die tot nu toe
+            nodig waren; blokken die op tekst zijn gekoppeld worden niet ge-encodeerd
+        statistieken: Hoeveel blokken bij deze run zijn ge-encodeerd en hoeveel vectoren zijn hergebruikt
+        blokken: De oude en nieuwe blokken van deze run, zodat bijv. de corpusindex de dossiers
+            niet opnieuw hoeft uit te lezen
+    """
+    model: str
+    oud: List[str]
+    nieuw: List[str]
+    vectoren: Dict[str, Optional[np.ndarray]] = field(repr=False)
+    statistieken: Dict[str, int] = field(default_factory=dict)
+    blokken: Optional[Tuple[BlokTabel, BlokTabel]] = field(default=None, repr=False)
+
+def incrementele_vectoren(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel,
+                          vorige: Optional[WerkprocesToestand] = None
+                          ) -> Tuple[Callable[[List[int], List[int]], np.ndarray], WerkprocesToestand]:
+    """
+    Geeft een vectorbron voor koppel_trapsgewijs die de vectoren van een eerdere run hergebruikt.
+
+    Vectoren worden op vingerafdruk (code plus teksthash) opgezocht; alleen blokken die de
+    koppeling nodig heeft en die in de vorige run niet waren ge-encodeerd gaan door het model.
+
+    Args:
+        oud_blokken: Blokken van het oude dossier
+        nieuw_blokken: Blokken van het nieuwe dossier
+        vorige: Toestand van de vorige run; None (of een ander model) begint zonder vectoren
+
+    Returns:
+        Tuple van (vectorbron, nieuwe toestand); de toestand wordt bijgewerkt terwijl de bron wordt gebruikt
+    """
+    if vorige is not None and vorige.model != MODEL_VARIANT:
+        vorige = None
+    oud_fp = vingerafdrukken(oud_blokken)
+    nieuw_fp = vingerafdrukken(nieuw_blokken)
+    bekend = vorige.vectoren if vorige is not None else {}
+    # Alleen vectoren van blokken die nu nog voorkomen, zodat de toestand niet blijft groeien
+    vectoren = {fp: bekend[fp] for fp in oud_fp + nieuw_fp if bekend.get(fp) is not None}
+    toestand = WerkprocesToestand(
+        model=MODEL_VARIANT, oud=oud_fp, nieuw=nieuw_fp, vectoren=vectoren,
+        statistieken={"ge-encodeerde_blokken": 0, "hergebruikte_vectoren": 0},
+        blokken=(oud_blokken, nieuw_blokken)
+    )
+
+    def vectoren_van(oud_idx: List[int], nieuw_idx: List[int]) -> np.ndarray:
+        fps = [oud_fp[i] for i in oud_idx] + [nieuw_fp[j] for j in nieuw_idx]
+        teksten = [oud_blokken.teksten[i] for i in oud_idx] + [nieuw_blokken.teksten[j] for j in nieuw_idx]
+        ontbrekend = {fp: tekst for fp, tekst in zip(fps, teksten) if fp not in vectoren}
+        if ontbrekend:
+            for fp, vector in zip(ontbrekend, _normaliseer(encodeer_teksten(list(ontbrekend.values())))):
+                vectoren[fp] = vector
+        toestand.statistieken["ge-encodeerde_blokken"] += len(ontbrekend)
+        toestand.statistieken["hergebruikte_vectoren"] += len(set(fps)) - len(ontbrekend)
+        tel("vectoren_hergebruikt", len(set(fps)) - len(ontbrekend))
+        return np.vstack([vectoren[fp] for fp in fps])
+
+    return vectoren_van, toestand
+
+def koppel_werkprocessen(matrix: np.ndarray, drempel: float = 0.6) -> List[Tuple[int, Optional[int], float]]:
+    """
+    Koppelt ieder oud werkproces gretig aan het best scorende nog vrije nieuwe werkproces.
+
+    Returns:
+        Lijst van (oude index, nieuwe index of None, score) in de volgorde van de oude werkprocessen
+    """
+    beschikbaar = np.ones(matrix.shape[1], dtype=bool)
+    koppelingen = []
+    for i in range(matrix.shape[0]):
+        rij = np.where(beschikbaar, matrix[i], np.nan)
+        if np.isnan(rij).all():
+            koppelingen.append((i, None, float("nan")))
+            continue
+        # nanargmax geeft bij gelijke scores de eerste index, net als de oorspronkelijke lus
+        j = int(np.nanargmax(rij))
+        score = float(rij[j])
+        if score > drempel:
+            koppelingen.append((i, j, score))
+            beschikbaar[j] = False
+        else:
+            koppelingen.append((i, None, score))
+    return koppelingen
+
+def _code_afstand(oud_code: str, nieuw_code: str) -> Tuple[int, int]:
+    # Zelfde code eerst, dan een verschoven nummer binnen dezelfde kerntaak (B1-K1-W5 -> B1-K1-W6)
+    if oud_code == nieuw_code:
+        return 0, 0
+    oud_match = re.match(r"(.+)-W(\d+)$", oud_code)
+    nieuw_match = re.match(r"(.+)-W(\d+)$", nieuw_code)
+    if oud_match and nieuw_match and oud_match.group(1) == nieuw_match.group(1):
+        return 1, abs(int(oud_match.group(2)) - int(nieuw_match.group(2)))
+    return 2, 0
+
+def _koppel_op_sleutel(oud_sleutels: List[Optional[str]], nieuw_sleutels: List[Optional[str]],
+                       oud_codes: List[str], nieuw_codes: List[str],
+                       vrij_oud: set, vrij_nieuw: set) -> List[Tuple[int, int]]:
+    """Koppelt vrije blokken met gelijke sleutel; bij meerdere kandidaten wint de kleinste codeafstand."""
+    per_sleutel = {}
+    for j in sorted(vrij_nieuw):
+        if nieuw_sleutels[j] is not None:
+            per_sleutel.setdefault(nieuw_sleutels[j], []).append(j)
+    kandidaten = sorted(
+        (_code_afstand(oud_codes[i], nieuw_codes[j]), i, j)
+        for i in sorted(vrij_oud) if oud_sleutels[i] is not None
+        for j in per_sleutel.get(oud_sleutels[i], ())
+    )
+    paren = []
+    for _, i, j in kandidaten:
+        if i in vrij_oud and j in vrij_nieuw:
+            paren.append((i, j))
+            vrij_oud.discard(i)
+            vrij_nieuw.discard(j)
+    return paren
+
+def _encodeer_blokken(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel,
+                      oud_idx: List[int], nieuw_idx: List[int]) -> np.ndarray:
+    return _normaliseer(encodeer_teksten(
+        [oud_blokken.teksten[i] for i in oud_idx] + [nieuw_blokken.teksten[j] for j in nieuw_idx]
+    ))
+
+def _scores(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel, paren: List[Tuple[int, int]],
+            rijen: List[int], kolommen: List[int],
+            vectoren_van: Optional[Callable[[List[int], List[int]], np.ndarray]] = None
+            ) -> Tuple[List[float], np.ndarray]:
+    """
+    Haalt in een aanroep de vectoren op die nodig zijn voor de similariteit van losse paren
+    en voor de rijen x kolommen van de semantische koppeling.
+
+    Args:
+        vectoren_van: Functie die bij oude en nieuwe blokindices de genormaliseerde vectoren
+            geeft (eerst de oude, dan de nieuwe); standaard worden de teksten ge-encodeerd
+
+    Returns:
+        Tuple van (score per paar, similariteitsmatrix rijen x kolommen met NaN voor lege teksten)
+    """
+    oud_nodig = [i for i in dict.fromkeys([i for i, _ in paren] + rijen) if oud_blokken.teksten[i].strip()]
+    nieuw_nodig = [j for j in dict.fromkeys([j for _, j in paren] + kolommen) if nieuw_blokken.teksten[j].strip()]
+    oud_pos = {i: k for k, i in enumerate(oud_nodig)}
+    nieuw_pos = {j: k for k, j in enumerate(nieuw_nodig)}
+    vectoren = np.zeros((0, 0), dtype=np.float32)
+    if oud_nodig or nieuw_nodig:
+        if vectoren_van is None:
+            vectoren = _encodeer_blokken(oud_blokken, nieuw_blokken, oud_nodig, nieuw_nodig)
+        else:
+            vectoren = vectoren_van(oud_nodig, nieuw_nodig)
+    oud_emb, nieuw_emb = vectoren[:len(oud_nodig)], vectoren[len(oud_nodig):]
+
+    scores = [
+        float(_cosinus(oud_emb[oud_pos[i]][None], nieuw_emb[nieuw_pos[j]][None])[0, 0])
+        if i in oud_pos and j in nieuw_pos else float("nan")
+        for i, j in paren
+    ]
+    matrix = np.full((len(rijen), len(kolommen)), np.nan, dtype=np.float32)
+    rij_idx = [r for r, i in enumerate(rijen) if i in oud_pos]
+    kolom_idx = [k for k, j in enumerate(kolommen) if j in nieuw_pos]
+    if rij_idx and kolom_idx:
+        matrix[np.ix_(rij_idx, kolom_idx)] = _cosinus(
+            oud_emb[[oud_pos[rijen[r]] for r in rij_idx]], nieuw_emb[[nieuw_pos[kolommen[k]] for k in kolom_idx]]
+        )
+    return scores, matrix
+
+def koppel_trapsgewijs(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel, drempel: float = 0.6,
+                       matrix: Optional[np.ndarray] = None,
+                       voorkoppelen: bool = VOORKOPPELEN,
+                       vectoren_van: Optional[Callable[[List[int], List[int]], np.ndarray]] = None
+                       ) -> List[Tuple[int, Optional[int], float, str]]:
+    """
+    Koppelt werkprocessen in stappen, zodat alleen gewijzigde blokken door het model gaan.
+
+    1. Identieke tekst: blokken met dezelfde genormaliseerde tekst (op hash), score 1.
+    2. Zelfde naam: van de overige blokken die met dezelfde naam en een niet-lege tekst. Zo'n
+       paar blijft gekoppeld ook als de inhoudsovereenkomst onder de drempel ligt: de naam
+       bepaalt dat het om hetzelfde werkproces gaat, de overeenkomst alleen de impact (een
+       herschreven tekst wordt dan Hoge impact). Een blok met lege tekst heeft geen score en
+       gaat door naar stap 3, waar het niet wordt gekoppeld (Verwijderd/Toegevoegd).
+    3. Semantisch: de dan nog vrije blokken worden gretig gekoppeld op embedding-similariteit,
+       zoals koppel_werkprocessen.
+
+    Bij meerdere kandidaten in stap 1 en 2 gaat dezelfde code voor een verschoven nummer binnen
+    dezelfde kerntaak, net als in DossierComparator._compare_werkprocessen_improved.
+
+    Args:
+        oud_blokken: Blokken van het oude dossier
+        nieuw_blokken: Blokken van het nieuwe dossier
+        drempel: Minimale similariteit voor een semantische koppeling
+        matrix: Een al berekende oud x nieuw similariteitsmatrix; dan wordt niets ge-encodeerd
+        voorkoppelen: False slaat stap 1 en 2 over
+        vectoren_van: Bron van genormaliseerde vectoren bij oude en nieuwe blokindices, bijv.
+            uit incrementele_vectoren; alleen nodig voor de blokken van stap 2 en 3
+
+    Returns:
+        Lijst van (oude index, nieuwe index of None, score, koppelstap) in de volgorde van de
+        oude werkprocessen; de koppelstap is leeg als er geen koppeling is
+    """
+    vrij_oud, vrij_nieuw = set(range(len(oud_blokken))), set(range(len(nieuw_blokken)))
+    tekst_paren, naam_paren = [], []
+    if voorkoppelen:
+        def tekst_sleutels(teksten: List[str]) -> List[Optional[str]]:
+            return [hashlib.sha256(normaliseer_tekst(t).encode("utf-8")).hexdigest() if t.strip() else None
+                    for t in teksten]
+
+        def naam_sleutels(tabel: BlokTabel) -> List[Optional[str]]:
+            # Zonder tekst is er geen inhoudsovereenkomst (NaN), dus ook geen koppeling op naam
+            return [normaliseer_tekst(naam) or None if tekst.strip() else None
+                    for naam, tekst in zip(tabel.namen, tabel.teksten)]
+
+        tekst_paren = _koppel_op_sleutel(tekst_sleutels(oud_blokken.teksten), tekst_sleutels(nieuw_blokken.teksten),
+                                         oud_blokken.codes, nieuw_blokken.codes, vrij_oud, vrij_nieuw)
+        naam_paren = _koppel_op_sleutel(naam_sleutels(oud_blokken), naam_sleutels(nieuw_blokken),
+                                        oud_blokken.codes, nieuw_blokken.codes, vrij_oud, vrij_nieuw)
+
+    rijen, kolommen = sorted(vrij_oud), sorted(vrij_nieuw)
+    if matrix is not None:
+        naam_scores = [float(matrix[i, j]) for i, j in naam_paren]
+        rest = matrix[np.ix_(rijen, kolommen)]
+    else:
+        naam_scores, rest = _scores(oud_blokken, nieuw_blokken, naam_paren, rijen, kolommen, vectoren_van)
+
+    per_oud = {i: (j, 1.0, KOPPELING_TEKST) for i, j in tekst_paren}
+    per_oud.update({i: (j, score, KOPPELING_NAAM) for (i, j), score in zip(naam_paren, naam_scores)})
+    for r, k, score in koppel_werkprocessen(rest, drempel):
+        per_oud[rijen[r]] = (kolommen[k] if k is not None else None, score,
+                             KOPPELING_SEMANTISCH if k is not None else "")
+
+    tel("gekoppeld_op_tekst", len(tekst_paren))
+    tel("gekoppeld_op_naam", len(naam_paren))
+    tel("semantisch_oud", len(rijen))
+    tel("semantisch_nieuw", len(kolommen))
+    return [(i, *per_oud[i]) for i in range(len(oud_blokken))]
 
 def bepaal_impactscore(sim: float) -> Tuple[str, str]:
     if sim > 0.95:
@@ -62,107 +460,149 @@ def bepaal_impactscore(sim: float) -> Tuple[str, str]:
     else:
         return "Gewijzigd", "Hoge impact"
 
-def vergelijk_werkprocessen(oud_pdf: str, nieuw_pdf: str) -> Tuple[pd.DataFrame, pd.DataFrame, str]:
-    oud_text = extract_full_text(oud_pdf)
-    nieuw_text = extract_full_text(nieuw_pdf)
+def _lees_blokken(oud_pdf: Union[str, GeparseerdDossier],
+                  nieuw_pdf: Union[str, GeparseerdDossier]) -> Tuple[BlokTabel, BlokTabel]:
+    # Uitlezen en blokken zoeken gebeuren samen, pagina voor pagina
+    with meet("werkprocesblokken"):
+        oud_blokken, oud_lengte = lees_werkprocesblokken(oud_pdf)
+        nieuw_blokken, nieuw_lengte = lees_werkprocesblokken(nieuw_pdf)
 
-    if len(oud_text.strip()) < 1000:
+    if oud_lengte < 1000:
         raise ValueError("Oude dossier bevat onvoldoende leesbare tekst.")
-    if len(nieuw_text.strip()) < 1000:
+    if nieuw_lengte < 1000:
         raise ValueError("Nieuwe dossier bevat onvoldoende leesbare tekst.")
 
-    oud_blokken = extract_werkprocesblokken(oud_text)
-    nieuw_blokken = extract_werkprocesblokken(nieuw_text)
-
-    if not oud_blokken:
+    if not len(oud_blokken):
         raise ValueError("Geen werkprocessen gevonden in het oude dossier.")
-    if not nieuw_blokken:
+    if not len(nieuw_blokken):
         raise ValueError("Geen werkprocessen gevonden in het nieuwe dossier.")
+    return oud_blokken, nieuw_blokken
+
+@meet("vergelijk_werkprocessen")
+def vergelijk_werkprocessen(oud_pdf: Union[str, GeparseerdDossier],
+                            nieuw_pdf: Union[str, GeparseerdDossier],
+                            drempel: float = 0.6) -> Tuple[pd.DataFrame, pd.DataFrame, bytes]:
+    """
+    Vergelijkt de werkprocesblokken van twee dossiers.
+
+    Ongewijzigde en alleen hernummerde blokken worden op tekst of naam gekoppeld; alleen de
+    overige gaan door het model, zie koppel_trapsgewijs.
+
+    Returns:
+        Tuple van (detail-DataFrame, samenvatting, Excel-bytes)
+    """
+    oud_blokken, nieuw_blokken = _lees_blokken(oud_pdf, nieuw_pdf)
+
+    with meet("koppelen"):
+        koppelingen = koppel_trapsgewijs(oud_blokken, nieuw_blokken, drempel)
+    return _bouw_rapport(oud_blokken, nieuw_blokken, koppelingen)
 
+@meet("vergelijk_werkprocessen")
+def vergelijk_werkprocessen_incrementeel(
+        oud_pdf: Union[str, GeparseerdDossier],
+        nieuw_pdf: Union[str, GeparseerdDossier],
+        vorige: Optional[WerkprocesToestand] = None,
+        drempel: float = 0.6) -> Tuple[pd.DataFrame, pd.DataFrame, bytes, WerkprocesToestand]:
+    """
+    Als vergelijk_werkprocessen, maar hergebruikt de vectoren van een vorige run.
+
+    Bedoeld voor het vergelijken van een oud dossier met opeenvolgende concepten van het nieuwe.
+    De koppeling is die van koppel_trapsgewijs: blokken met identieke tekst worden niet
+    ge-encodeerd, en van de overige alleen die waarvan nog geen vector bekend is (zie
+    incrementele_vectoren). Het rapport is gelijk aan dat van een volledige run.
+
+    Returns:
+        Tuple van (detail-DataFrame, samenvatting, Excel-bytes, toestand voor de volgende run)
+    """
+    oud_blokken, nieuw_blokken = _lees_blokken(oud_pdf, nieuw_pdf)
+
+    vectoren_van, toestand = incrementele_vectoren(oud_blokken, nieuw_blokken, vorige)
+    with meet("koppelen"):
+        koppelingen = koppel_trapsgewijs(oud_blokken, nieuw_blokken, drempel, vectoren_van=vectoren_van)
+    return (*_bouw_rapport(oud_blokken, nieuw_blokken, koppelingen), toestand)
+
+def _bouw_rapport(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel,
+                  koppelingen: List[Tuple[int, Optional[int], float, str]]) -> Tuple[pd.DataFrame, pd.DataFrame, bytes]:
+    df, samenvatting = _rapport_tabellen(oud_blokken, nieuw_blokken, koppelingen)
+
+    with meet("excel_export"):
+        excel_data = naar_excel({"Werkprocessen": df, "Samenvatting": samenvatting})
+
+    return df, samenvatting, excel_data
+
+def _rapport_tabellen(oud_blokken: BlokTabel, nieuw_blokken: BlokTabel,
+                      koppelingen: List[Tuple[int, Optional[int], float, str]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
     resultaten = []
     gebruikte_nieuwe = set()
 
-    for oud in oud_blokken:
-        beste_match = None
-        hoogste_score = -1
-
-        for i, nieuw in enumerate(nieuw_blokken):
-            if i in gebruikte_nieuwe:
-                continue
-            if not oud["tekst"].strip() or not nieuw["tekst"].strip():
-                continue
-            score = vergelijk_inhoud(oud["tekst"], nieuw["tekst"])
-            if score > hoogste_score:
-                hoogste_score = score
-                beste_match = nieuw
-                beste_index = i
-
-        if beste_match and hoogste_score > 0.6:
+    for i, beste_index, hoogste_score, stap in koppelingen:
+        oud = oud_blokken[i]
+        if beste_index is not None:
+            beste_match = nieuw_blokken[beste_index]
             impact, impactscore = bepaal_impactscore(hoogste_score)
             resultaten.append({
-                "Kerntaak": oud["kerntaak"],
-                "Deel": oud["deel"],
-                "Oude code": oud["code"],
-                "Nieuwe code": beste_match["code"],
-                "Naam": oud["naam"],
-                "Oude tekst": oud["tekst"],
-                "Nieuwe tekst": beste_match["tekst"],
+                "Kerntaak": oud.kerntaak,
+                "Deel": oud.deel,
+                "Oude code": oud.code,
+                "Nieuwe code": beste_match.code,
+                "Naam": oud.naam,
+                "Oude tekst": oud.tekst,
+                "Nieuwe tekst": beste_match.tekst,
                 "Impact": impact,
                 "Impactscore": impactscore,
+                "Koppeling": stap,
                 "Analyse": f"Gemiddelde inhoudsovereenkomst: {hoogste_score:.2f}"
             })
             gebruikte_nieuwe.add(beste_index)
         else:
             resultaten.append({
-                "Kerntaak": oud["kerntaak"],
-                "Deel": oud["deel"],
-                "Oude code": oud["code"],
+                "Kerntaak": oud.kerntaak,
+                "Deel": oud.deel,
+                "Oude code": oud.code,
                 "Nieuwe code": "",
-                "Naam": oud["naam"],
-                "Oude tekst": oud["tekst"],
+                "Naam": oud.naam,
+                "Oude tekst": oud.tekst,
                 "Nieuwe tekst": "",
                 "Impact": "Verwijderd",
                 "Impactscore": "Hoge impact",
+                "Koppeling": "",
                 "Analyse": "Niet meer aanwezig in nieuwe dossier"
             })
 
     for i, nieuw in enumerate(nieuw_blokken):
         if i not in gebruikte_nieuwe:
             resultaten.append({
-                "Kerntaak": nieuw["kerntaak"],
-                "Deel": nieuw["deel"],
+                "Kerntaak": nieuw.kerntaak,
+                "Deel": nieuw.deel,
                 "Oude code": "",
-                "Nieuwe code": nieuw["code"],
-                "Naam": nieuw["naam"],
+                "Nieuwe code": nieuw.code,
+                "Naam": nieuw.naam,
                 "Oude tekst": "",
-                "Nieuwe tekst": nieuw["tekst"],
+                "Nieuwe tekst": nieuw.tekst,
                 "Impact": "Toegevoegd",
                 "Impactscore": "Impact",
+                "Koppeling": "",
                 "Analyse": "Nieuw werkproces in het nieuwe dossier"
             })
 
-    df = pd.DataFrame(resultaten)
-
-    samenvatting = (
-        df.groupby(["Kerntaak", "Deel"])
-        .agg(
-            Totaal=("Naam", "count"),
-            Gewijzigd=("Impact", lambda x: (x == "Gewijzigd").sum()),
-            Toegevoegd=("Impact", lambda x: (x == "Toegevoegd").sum()),
-            Verwijderd=("Impact", lambda x: (x == "Verwijderd").sum()),
-            Gem_Impactscore=("Impactscore", lambda x: x.map({
-                "Geen impact": 0,
-                "Weinig impact": 1,
-                "Impact": 2,
-                "Hoge impact": 3
-            }).mean().round(2))
-        )
-        .reset_index()
-    )
+    with meet("samenvatting"):
+        df = pd.DataFrame(resultaten)
 
-    excel_path = f"/tmp/vergelijking_resultaat_{uuid.uuid4().hex}.xlsx"
-    with pd.ExcelWriter(excel_path, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Werkprocessen")
-        samenvatting.to_excel(writer, index=False, sheet_name="Samenvatting")
+        samenvatting = (
+            df.groupby(["Kerntaak", "Deel"])
+            .agg(
+                Totaal=("Naam", "count"),
+                Gewijzigd=("Impact", lambda x: (x == "Gewijzigd").sum()),
+                Toegevoegd=("Impact", lambda x: (x == "Toegevoegd").sum()),
+                Verwijderd=("Impact", lambda x: (x == "Verwijderd").sum()),
+                Gem_Impactscore=("Impactscore", lambda x: x.map({
+                    "Geen impact": 0,
+                    "Weinig impact": 1,
+                    "Impact": 2,
+                    "Hoge impact": 3
+                }).mean().round(2))
+            )
+            .reset_index()
+        )
 
-    return df, samenvatting, excel_path
+    return df, samenvatting
@@ -0,0 +1,248 @@
+"""
+Module voor lichte instrumentatie van de analysestappen: duur, aantallen aanroepen en geheugen.
+
+Stappen worden gemarkeerd met `meet("naam")`; tellers (zoals het aantal model.encode-aanroepen)
+met `tel("naam")`. Alle metingen binnen een analyse komen in een Rapport terecht. Dat rapport
+wordt aan het eind als JSON-regels gelogd en kan met `meting()` ook direct worden opgevraagd,
+bijvoorbeeld voor een overzicht in de app.
+
+De kosten per stap zijn twee klokaanroepen en twee keer het lezen van /proc/self/statm;
+daarmee kan het standaard aan blijven. Geheugen wordt standaard gemeten als de groei van de
+huidige RSS van het proces tussen begin en eind van de stap (kolom rss_groei_mb). Een piek
+binnen de stap die voor het eind weer is vrijgegeven valt daar buiten. Met
+KD_INSTRUMENTATIE_GEHEUGEN=tracemalloc wordt de echte piek aan Python-allocaties per stap
+gemeten (kolom piek_geheugen_mb); dat is nauwkeuriger maar maakt de analyse merkbaar trager.
+Zonder /proc (bijv. macOS) staat de geheugenmeting standaard uit.
+
+Omgevingsvariabelen:
+    KD_INSTRUMENTATIE: 0 schakelt alle metingen uit (standaard 1)
+    KD_INSTRUMENTATIE_GEHEUGEN: rss (standaard), tracemalloc of uit
+    KD_INSTRUMENTATIE_LOG: stderr (standaard), uit, of een pad naar een logbestand
+"""
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+_STATM_PAD = "/proc/self/statm"
+
+INGESCHAKELD = os.environ.get("KD_INSTRUMENTATIE", "1") != "0"
+GEHEUGENMODUS = os.environ.get("KD_INSTRUMENTATIE_GEHEUGEN", "rss")
+if GEHEUGENMODUS == "rss" and not os.path.exists(_STATM_PAD):
+    GEHEUGENMODUS = "uit"
+# Naam van de geheugenkolom per modus, naar wat er werkelijk wordt gemeten
+GEHEUGEN_KOLOMMEN = {"rss": "rss_groei_mb", "tracemalloc": "piek_geheugen_mb", "uit": "geheugen_mb"}
+
+logger = logging.getLogger("kd.instrumentatie")
+
+_actief_rapport: ContextVar[Optional["Rapport"]] = ContextVar("kd_instrumentatie_rapport", default=None)
+
+
+def _configureer_logger():
+    """Logt alleen het bericht zelf, zodat iedere regel een los JSON-object is."""
+    bestemming = os.environ.get("KD_INSTRUMENTATIE_LOG", "stderr")
+    if bestemming == "uit" or logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if bestemming == "stderr" else logging.FileHandler(bestemming)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_configureer_logger()
+
+
+def _huidige_rss_bytes() -> int:
+    # Tweede veld van statm: resident pagina's, nu (ru_maxrss kan alleen maar stijgen)
+    with open(_STATM_PAD, "rb") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclass
+class StapMeting:
+    """
+    Opgetelde metingen van een stap; een stap kan meerdere keren per analyse voorkomen.
+
+    Attributes:
+        geheugen_mb: Grootste meting over de aanroepen: RSS-groei of tracemalloc-piek, naar de geheugenmodus
+    """
+    pad: str
+    aanroepen: int = 0
+    duur_s: float = 0.0
+    geheugen_mb: float = 0.0
+
+
+@dataclass
+class Rapport:
+    """Alle metingen van een analyse, met stappen in de volgorde waarin ze begonnen."""
+    naam: str
+    geheugenmodus: str = GEHEUGENMODUS
+    stappen: Dict[str, StapMeting] = field(default_factory=dict)
+    tellers: Dict[str, int] = field(default_factory=dict)
+    duur_s: float = 0.0
+    # Wordt bij het begin van iedere stap met het pad aangeroepen, bijv. voor voortgang of annuleren
+    bij_stap: Optional[Callable[[str], None]] = field(default=None, repr=False)
+    # Open stappen: [pad, starttijd, geheugen bij start, hoogste piek van afgeronde substappen]
+    _stapel: List[list] = field(default_factory=list, repr=False)
+
+    def _begin(self, naam: str):
+        pad = f"{self._stapel[-1][0]}/{naam}" if self._stapel else naam
+        if self.bij_stap is not None:
+            self.bij_stap(pad)
+        self.stappen.setdefault(pad, StapMeting(pad))
+        geheugen = 0
+        if self.geheugenmodus == "rss":
+            geheugen = _huidige_rss_bytes()
+        elif self.geheugenmodus == "tracemalloc":
+            geheugen, piek = tracemalloc.get_traced_memory()
+            if self._stapel:
+                self._stapel[-1][3] = max(self._stapel[-1][3], piek)
+            tracemalloc.reset_peak()
+        self._stapel.append([pad, time.perf_counter(), geheugen, 0])
+
+    def _eind(self):
+        pad, start, geheugen_start, piek_substappen = self._stapel.pop()
+        meting = self.stappen[pad]
+        meting.aanroepen += 1
+        meting.duur_s += time.perf_counter() - start
+        groei = 0
+        if self.geheugenmodus == "rss":
+            groei = _huidige_rss_bytes() - geheugen_start
+        elif self.geheugenmodus == "tracemalloc":
+            piek = max(tracemalloc.get_traced_memory()[1], piek_substappen)
+            groei = piek - geheugen_start
+            if self._stapel:
+                self._stapel[-1][3] = max(self._stapel[-1][3], piek)
+            tracemalloc.reset_peak()
+        meting.geheugen_mb = max(meting.geheugen_mb, groei / 2 ** 20)
+
+    @property
+    def geheugenkolom(self) -> str:
+        return GEHEUGEN_KOLOMMEN.get(self.geheugenmodus, "geheugen_mb")
+
+    def als_dict(self) -> Dict:
+        return {
+            "analyse": self.naam,
+            "duur_s": round(self.duur_s, 4),
+            "geheugenmodus": self.geheugenmodus,
+            "stappen": [
+                {"stap": m.pad, "aanroepen": m.aanroepen, "duur_s": round(m.duur_s, 4),
+                 self.geheugenkolom: round(m.geheugen_mb, 2)}
+                for m in self.stappen.values()
+            ],
+            "tellers": dict(self.tellers)
+        }
+
+    def als_dataframe(self) -> pd.DataFrame:
+        """Stappen als tabel, met het aandeel van iedere stap in de totale duur."""
+        df = pd.DataFrame(self.als_dict()["stappen"], columns=["stap", "aanroepen", "duur_s", self.geheugenkolom])
+        df["aandeel"] = (df["duur_s"] / self.duur_s).round(3) if self.duur_s else 0.0
+        return df
+
+    def log(self):
+        """Schrijft een JSON-regel per stap en een samenvattende regel voor de hele analyse."""
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        gegevens = self.als_dict()
+        for stap in gegevens["stappen"]:
+            logger.info(json.dumps({"gebeurtenis": "stap", "analyse": self.naam, **stap}))
+        logger.info(json.dumps({
+            "gebeurtenis": "analyse", "analyse": self.naam, "duur_s": gegevens["duur_s"],
+            "geheugenmodus": self.geheugenmodus, "tellers": gegevens["tellers"]
+        }))
+
+
+@contextmanager
+def meting(naam: str, bij_stap: Optional[Callable[[str], None]] = None) -> Iterator[Optional[Rapport]]:
+    """
+    Verzamelt alle stappen en tellers binnen het blok in een nieuw Rapport en logt dat aan het eind.
+
+    Args:
+        naam: Naam van de analyse in het rapport en de logregels
+        bij_stap: Optionele functie die bij het begin van iedere stap het pad krijgt; een
+            uitzondering daaruit breekt de analyse op die plek af
+
+    Yields:
+        Het Rapport, of None als de instrumentatie is uitgeschakeld
+    """
+    if not INGESCHAKELD:
+        yield None
+        return
+
+    rapport = Rapport(naam, bij_stap=bij_stap)
+    token = _actief_rapport.set(rapport)
+    zelf_gestart = rapport.geheugenmodus == "tracemalloc" and not tracemalloc.is_tracing()
+    if zelf_gestart:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield rapport
+    finally:
+        rapport.duur_s = time.perf_counter() - start
+        if zelf_gestart:
+            tracemalloc.stop()
+        _actief_rapport.reset(token)
+        rapport.log()
+
+
+@contextmanager
+def meet(naam: str) -> Iterator[None]:
+    """
+    Meet een stap binnen het actieve rapport.
+
+    Zonder actief rapport wordt de stap zelf de analyse: er wordt dan een rapport met deze naam
+    geopend en na afloop gelogd. Zo leveren ook aanroepen buiten de app (batch) logregels op.
+    """
+    if not INGESCHAKELD:
+        yield
+        return
+
+    rapport = _actief_rapport.get()
+    if rapport is None:
+        with meting(naam):
+            yield
+        return
+
+    rapport._begin(naam)
+    try:
+        yield
+    finally:
+        rapport._eind()
+
+
+def neem_over(ander: Optional[Rapport]):
+    """
+    Neemt de stappen en tellers van een elders gemeten rapport op in het actieve rapport.
+
+    Bedoeld voor werk dat voor deze analyse op een andere thread is gedaan, zoals een gebundelde
+    modelaanroep van de embeddingplanner. De stappen komen onder de open stap van het actieve
+    rapport; zonder actief rapport gebeurt er niets.
+    """
+    rapport = _actief_rapport.get()
+    if rapport is None or ander is None:
+        return
+    basis = rapport._stapel[-1][0] if rapport._stapel else ""
+    for stap in ander.stappen.values():
+        pad = f"{basis}/{stap.pad}" if basis else stap.pad
+        meting = rapport.stappen.setdefault(pad, StapMeting(pad))
+        meting.aanroepen += stap.aanroepen
+        meting.duur_s += stap.duur_s
+        meting.geheugen_mb = max(meting.geheugen_mb, stap.geheugen_mb)
+    for naam, aantal in ander.tellers.items():
+        rapport.tellers[naam] = rapport.tellers.get(naam, 0) + aantal
+
+
+def tel(naam: str, aantal: int = 1):
+    """Verhoogt een teller in het actieve rapport; zonder actief rapport gebeurt er niets."""
+    rapport = _actief_rapport.get()
+    if rapport is not None:
+        rapport.tellers[naam] = rapport.tellers.get(naam, 0) + aantal
@@ -0,0 +1,188 @@
+"""
+Module voor het lui laden en delen van het embeddingmodel binnen het proces.
+
+Het model (en daarmee torch) wordt pas bij het eerste gebruik geladen en daarna
+door alle sessies in hetzelfde proces gedeeld.
+
+De inferentiebackend is instelbaar, zodat het model op servers zonder GPU goedkoper draait:
+    torch: het oorspronkelijke fp32-model (standaard)
+    int8:  hetzelfde model met dynamische int8-kwantisatie van de lineaire lagen
+    onnx:  een geëxporteerde ONNX-graaf via onnxruntime (pip install "optimum[onnxruntime]")
+
+Omgevingsvariabelen:
+    KD_EMBEDDING_BACKEND: torch, int8 of onnx
+    KD_MODEL_PAD: lokale map met het model (zie `python modelbeheer.py bewaar`); zonder
+        netwerk is dit verplicht
+    KD_MODEL_THREADS: aantal intra-op threads; 0 laat de standaard van de runtime staan
+    KD_ONNX_BESTAND: ONNX-bestand binnen de modelmap, bijv. onnx/model_quint8_avx2.onnx
+    KD_ENCODE_OPDELEN: 0 kapt lange teksten af in plaats van ze op te delen (zie encodering.py)
+
+Controleer met `python pariteit.py` dat een andere backend dezelfde impactscores oplevert.
+"""
+import argparse
+import os
+import sys
+import threading
+from typing import Optional
+
+MODEL_NAAM = "paraphrase-MiniLM-L6-v2"
+BACKENDS = ("torch", "int8", "onnx")
+
+BACKEND = os.environ.get("KD_EMBEDDING_BACKEND", "torch")
+MODEL_BRON = os.environ.get("KD_MODEL_PAD") or MODEL_NAAM
+MODEL_THREADS = int(os.environ.get("KD_MODEL_THREADS", "0"))
+ONNX_BESTAND = os.environ.get("KD_ONNX_BESTAND") or None
+OPDELEN = os.environ.get("KD_ENCODE_OPDELEN", "1") != "0"
+
+if BACKEND not in BACKENDS:
+    raise ValueError(f"Onbekende KD_EMBEDDING_BACKEND {BACKEND!r}; kies uit {', '.join(BACKENDS)}")
+
+
+def model_variant(backend: str = BACKEND, onnx_bestand: Optional[str] = ONNX_BESTAND,
+                  opdelen: bool = OPDELEN) -> str:
+    """
+    Naam van de combinatie model + backend + encodering, voor cachesleutels.
+
+    Gekwantiseerde vectoren wijken licht af van fp32-vectoren en mogen dus niet in dezelfde cache.
+    Zo ook de vectoren van lange teksten: opgedeeld en samengevoegd zijn ze anders dan afgekapt.
+    """
+    if backend == "torch":
+        variant = MODEL_NAAM
+    elif backend == "onnx" and onnx_bestand:
+        variant = f"{MODEL_NAAM}-onnx-{os.path.splitext(os.path.basename(onnx_bestand))[0]}"
+    else:
+        variant = f"{MODEL_NAAM}-{backend}"
+    return f"{variant}-stukken" if opdelen else variant
+
+
+MODEL_VARIANT = model_variant()
+
+_model = None
+_lock = threading.Lock()
+_voorverwarm_thread: Optional[threading.Thread] = None
+
+
+def maak_model(backend: str = BACKEND, bron: str = MODEL_BRON, threads: int = MODEL_THREADS,
+               onnx_bestand: Optional[str] = ONNX_BESTAND):
+    """
+    Laadt een nieuw, niet-gedeeld exemplaar van het model met de gegeven backend.
+
+    Args:
+        backend: torch, int8 of onnx
+        bron: Modelnaam op de Hugging Face Hub of een lokale map
+        threads: Aantal intra-op threads; 0 laat de standaard van de runtime staan
+        onnx_bestand: Optioneel ONNX-bestand binnen de modelmap (alleen voor onnx)
+
+    Returns:
+        Een SentenceTransformer-model
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Onbekende backend {backend!r}; kies uit {', '.join(BACKENDS)}")
+    # Een lokale map mag nooit stilletjes naar de Hub uitwijken
+    lokaal = os.path.isdir(bron)
+    if threads:
+        torch.set_num_threads(threads)
+
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if onnx_bestand:
+            model_kwargs["file_name"] = onnx_bestand
+        if threads:
+            import onnxruntime
+            sessie_opties = onnxruntime.SessionOptions()
+            sessie_opties.intra_op_num_threads = threads
+            model_kwargs["session_options"] = sessie_opties
+        return SentenceTransformer(bron, backend="onnx", device="cpu", local_files_only=lokaal,
+                                   model_kwargs=model_kwargs)
+
+    if backend == "int8":
+        model = SentenceTransformer(bron, device="cpu", local_files_only=lokaal)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    return SentenceTransformer(bron, local_files_only=lokaal)
+
+
+def laad_model(threads: Optional[int] = None):
+    """
+    Geeft het gedeelde model en laadt het bij de eerste aanroep met de ingestelde backend.
+
+    Args:
+        threads: Aantal intra-op threads als KD_MODEL_THREADS niet is gezet; alleen de
+            eerste aanroep in een proces bepaalt dit
+
+    Returns:
+        Het geladen SentenceTransformer-model
+    """
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                _model = maak_model(threads=MODEL_THREADS or threads or 0)
+    return _model
+
+
+def model_geladen() -> bool:
+    """Geeft aan of het model al in dit proces is geladen."""
+    return _model is not None
+
+
+def voorverwarm_model() -> threading.Thread:
+    """
+    Laadt het model op de achtergrond, zodat de eerste analyse er niet op hoeft te wachten.
+
+    Meerdere aanroepen starten maximaal een laadthread.
+
+    Returns:
+        De (eventueel al eerder gestarte) laadthread
+    """
+    global _voorverwarm_thread
+    with _lock:
+        if _voorverwarm_thread is None:
+            _voorverwarm_thread = threading.Thread(
+                target=laad_model, name="model-voorverwarmen", daemon=True
+            )
+            _voorverwarm_thread.start()
+    return _voorverwarm_thread
+
+
+def bewaar_model(map: str, onnx: bool = False, onnx_int8: Optional[str] = None):
+    """
+    Slaat het model op in een lokale map, voor hosts zonder netwerk.
+
+    Args:
+        map: Doelmap; gebruik deze daarna als KD_MODEL_PAD
+        onnx: Ook de ONNX-export opslaan (onnx/model.onnx)
+        onnx_int8: Ook een dynamisch gekwantiseerde ONNX-variant opslaan voor deze
+            CPU-configuratie (arm64, avx2, avx512 of avx512_vnni)
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    maak_model("torch", MODEL_NAAM, threads=0).save(map)
+    if onnx or onnx_int8:
+        onnx_model = maak_model("onnx", map, threads=0, onnx_bestand=None)
+        onnx_model.save(map)
+        if onnx_int8:
+            export_dynamic_quantized_onnx_model(onnx_model, onnx_int8, map)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Beheer van het embeddingmodel.")
+    subparsers = parser.add_subparsers(dest="opdracht", required=True)
+    bewaar = subparsers.add_parser("bewaar", help="Download het model naar een lokale map (KD_MODEL_PAD)")
+    bewaar.add_argument("map")
+    bewaar.add_argument("--onnx", action="store_true", help="Ook de ONNX-export opslaan")
+    bewaar.add_argument("--onnx-int8", choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+                        help="Ook een int8-gekwantiseerde ONNX-variant voor deze CPU opslaan")
+    args = parser.parse_args(argv)
+
+    if args.opdracht == "bewaar":
+        bewaar_model(args.map, onnx=args.onnx, onnx_int8=args.onnx_int8)
+        print(f"Model opgeslagen in {args.map}; zet KD_MODEL_PAD={os.path.abspath(args.map)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
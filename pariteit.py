@@ -0,0 +1,166 @@
+"""
+Pariteitscontrole tussen de fp32-basis en een andere inferentiebackend van het embeddingmodel.
+
+Gebruik:
+    python pariteit.py oud.pdf nieuw.pdf [meer.pdf ...] --backend int8 [--tolerantie 0.02]
+
+De werkprocesblokken van alle opgegeven dossiers worden met beide backends ge-encodeerd, via
+dezelfde pijplijn als in productie (encodering.encodeer: lange teksten opgedeeld en samengevoegd).
+Vergeleken worden de cosinus-similariteiten van alle paren en hun impactscore-klasse volgens
+bepaal_impactscore. Voor de eerste twee dossiers (oud en nieuw) wordt met beide backends het
+werkprocesrapport opgebouwd zoals vergelijk_werkprocessen dat doet (koppel_trapsgewijs en
+_rapport_tabellen), en wordt gecontroleerd of de koppelingen (inclusief de koppelstap) en de
+impact per oud werkproces gelijk blijven.
+De exitcode is 1 als de tolerantie wordt overschreden of als het rapport zou veranderen.
+Verschoven klassen van niet-gekoppelde paren vlak bij een klassegrens worden wel gemeld,
+maar laten de controle niet falen: ze komen niet in het rapport.
+"""
+import argparse
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blokken import BlokTabel
+from encodering import encodeer
+from inhoudsanalyse import (_cosinus, _normaliseer, _rapport_tabellen, bepaal_impactscore, koppel_trapsgewijs,
+                            lees_werkprocesblokken)
+from modelbeheer import BACKENDS, MODEL_BRON, MODEL_THREADS, ONNX_BESTAND, maak_model
+
+STANDAARD_TOLERANTIE = 0.02
+WERKPROCES_DREMPEL = 0.6
+RAPPORT_KOLOMMEN = ["Nieuwe code", "Koppeling", "Impact", "Impactscore"]
+
+
+def _klasse(score: float, drempel: float) -> str:
+    """De uitkomst van een paar zoals die in het rapport zou komen."""
+    if score <= drempel:
+        return "Geen match"
+    return bepaal_impactscore(score)[1]
+
+
+def _vectoren_per_tekst(model, teksten: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Genormaliseerde vectoren van de unieke niet-lege teksten, via dezelfde encodering als in productie."""
+    uniek = list(dict.fromkeys(tekst for tekst in teksten if tekst.strip()))
+    if not uniek:
+        return {}
+    return dict(zip(uniek, _normaliseer(np.asarray(encodeer(model, uniek), dtype=np.float32))))
+
+
+def _rapport(oud: BlokTabel, nieuw: BlokTabel, vectoren: Dict[str, np.ndarray], drempel: float):
+    """Koppelingen en detailrapport zoals vergelijk_werkprocessen ze met deze vectoren zou maken."""
+    # NaN voor lege teksten, zoals bereken_similariteitsmatrix
+    matrix = np.full((len(oud), len(nieuw)), np.nan, dtype=np.float32)
+    oud_idx = [i for i, tekst in enumerate(oud.teksten) if tekst in vectoren]
+    nieuw_idx = [j for j, tekst in enumerate(nieuw.teksten) if tekst in vectoren]
+    if oud_idx and nieuw_idx:
+        matrix[np.ix_(oud_idx, nieuw_idx)] = _cosinus(
+            np.vstack([vectoren[oud.teksten[i]] for i in oud_idx]),
+            np.vstack([vectoren[nieuw.teksten[j]] for j in nieuw_idx])
+        )
+    koppelingen = koppel_trapsgewijs(oud, nieuw, drempel, matrix=matrix)
+    df, _ = _rapport_tabellen(oud, nieuw, koppelingen)
+    return koppelingen, df
+
+
+def controleer_pariteit(teksten: List[str], backend: str,
+                        oud_nieuw: Optional[Tuple[BlokTabel, BlokTabel]] = None,
+                        tolerantie: float = STANDAARD_TOLERANTIE, drempel: float = WERKPROCES_DREMPEL,
+                        bron: str = MODEL_BRON, threads: int = MODEL_THREADS,
+                        onnx_bestand: Optional[str] = ONNX_BESTAND) -> Dict:
+    """
+    Vergelijkt de similariteiten en het werkprocesrapport van een backend met die van het fp32-model.
+
+    Args:
+        teksten: Werkproces-teksten; alle onderlinge paren worden vergeleken
+        backend: De te controleren backend (int8 of onnx)
+        oud_nieuw: Als gezet de blokken van het oude en het nieuwe dossier; dan wordt ook het
+            rapport met beide backends opgebouwd en vergeleken
+        tolerantie: Maximaal toegestane absolute afwijking van een similariteit
+        drempel: Matchdrempel van de werkprocesanalyse
+
+    Returns:
+        Dictionary met de afwijkingen, het aantal verschoven klassen en koppelingen en of de controle slaagt
+    """
+    alle_teksten = list(teksten)
+    if oud_nieuw is not None:
+        alle_teksten += oud_nieuw[0].teksten + oud_nieuw[1].teksten
+    basis_vectoren = _vectoren_per_tekst(maak_model("torch", bron, threads), alle_teksten)
+    kandidaat_vectoren = _vectoren_per_tekst(maak_model(backend, bron, threads, onnx_bestand), alle_teksten)
+
+    uniek = [tekst for tekst in dict.fromkeys(teksten) if tekst in basis_vectoren]
+
+    def onderling(vectoren: Dict[str, np.ndarray]) -> np.ndarray:
+        if not uniek:
+            return np.zeros((0, 0), dtype=np.float32)
+        matrix = np.vstack([vectoren[tekst] for tekst in uniek])
+        return _cosinus(matrix, matrix)
+
+    basis, kandidaat = onderling(basis_vectoren), onderling(kandidaat_vectoren)
+
+    # Alleen paren boven de diagonaal: de diagonaal is altijd 1 en de matrix is symmetrisch
+    rijen, kolommen = np.triu_indices(len(uniek), k=1)
+    afwijking = np.abs(basis[rijen, kolommen] - kandidaat[rijen, kolommen])
+    verschoven_klassen = sum(
+        _klasse(float(basis[i, j]), drempel) != _klasse(float(kandidaat[i, j]), drempel)
+        for i, j in zip(rijen, kolommen)
+    )
+
+    resultaat = {
+        "backend": backend,
+        "teksten": len(uniek),
+        "paren": int(len(afwijking)),
+        "max_afwijking": float(afwijking.max()) if len(afwijking) else 0.0,
+        "gem_afwijking": float(afwijking.mean()) if len(afwijking) else 0.0,
+        "verschoven_klassen": int(verschoven_klassen),
+        "verschoven_koppelingen": 0,
+        "verschoven_rapportklassen": 0
+    }
+    if oud_nieuw is not None:
+        oud, nieuw = oud_nieuw
+        koppeling_basis, rapport_basis = _rapport(oud, nieuw, basis_vectoren, drempel)
+        koppeling_kandidaat, rapport_kandidaat = _rapport(oud, nieuw, kandidaat_vectoren, drempel)
+        # (nieuwe index, koppelstap) per oud werkproces
+        resultaat["verschoven_koppelingen"] = sum(
+            (a[1], a[3]) != (b[1], b[3]) for a, b in zip(koppeling_basis, koppeling_kandidaat)
+        )
+        # De eerste rijen van het rapport volgen de oude werkprocessen; alleen paren die gelijk gekoppeld blijven
+        basis_rijen = rapport_basis[RAPPORT_KOLOMMEN].head(len(oud)).itertuples(index=False)
+        kandidaat_rijen = rapport_kandidaat[RAPPORT_KOLOMMEN].head(len(oud)).itertuples(index=False)
+        resultaat["verschoven_rapportklassen"] = sum(
+            tuple(a) != tuple(b)
+            for a, b, ka, kb in zip(basis_rijen, kandidaat_rijen, koppeling_basis, koppeling_kandidaat)
+            if (ka[1], ka[3]) == (kb[1], kb[3])
+        )
+
+    resultaat["geslaagd"] = (
+        resultaat["max_afwijking"] <= tolerantie
+        and resultaat["verschoven_koppelingen"] == 0
+        and resultaat["verschoven_rapportklassen"] == 0
+    )
+    return resultaat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Controleer of een backend dezelfde similariteiten geeft als fp32.")
+    parser.add_argument("pdf", nargs="+", help="Dossiers; de eerste twee worden ook als oud/nieuw gekoppeld")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], required=True)
+    parser.add_argument("--tolerantie", type=float, default=STANDAARD_TOLERANTIE,
+                        help="Maximale absolute afwijking per similariteit")
+    args = parser.parse_args(argv)
+
+    tabellen = [lees_werkprocesblokken(pad)[0] for pad in args.pdf]
+    teksten = [tekst for tabel in tabellen for tekst in tabel.niet_leeg().teksten]
+    if len(teksten) < 2:
+        print("Te weinig werkprocesteksten gevonden om te vergelijken", file=sys.stderr)
+        return 2
+    oud_nieuw = (tabellen[0], tabellen[1]) if len(tabellen) >= 2 else None
+
+    resultaat = controleer_pariteit(teksten, args.backend, oud_nieuw, args.tolerantie)
+    for sleutel, waarde in resultaat.items():
+        print(f"{sleutel}: {waarde}")
+    return 0 if resultaat["geslaagd"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
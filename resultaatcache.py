@@ -0,0 +1,139 @@
+"""
+Module voor het memoïseren van parse- en vergelijkingsresultaten op basis van inhoud.
+
+Sleutels zijn SHA-256-hashes van de geüploade bytes plus de analyseparameters, zodat
+een Streamlit-rerun zonder wijzigingen direct het vorige resultaat terugkrijgt.
+De cache heeft een begrensde laag in het geheugen en optioneel een begrensde laag op schijf.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+STANDAARD_MAX_ITEMS = int(os.environ.get("KD_RESULTAAT_CACHE_ITEMS", "32"))
+STANDAARD_MAP = os.environ.get("KD_RESULTAAT_CACHE") or None
+STANDAARD_MAX_SCHIJF_ITEMS = int(os.environ.get("KD_RESULTAAT_CACHE_SCHIJF_ITEMS", "256"))
+
+
+def hash_inhoud(data: bytes) -> str:
+    """Geeft de SHA-256 van een reeks bytes, bijvoorbeeld een geüploade PDF."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def maak_sleutel(soort: str, *delen: Any, **parameters: Any) -> str:
+    """
+    Maakt een cachesleutel uit een soort resultaat, inhoudshashes en analyseparameters.
+
+    Args:
+        soort: Soort resultaat, bijv. "dossier" of "werkprocessen"
+        delen: Inhoudshashes van de invoer
+        parameters: Analyseparameters die het resultaat beïnvloeden
+    """
+    inhoud = json.dumps([soort, list(delen), parameters], sort_keys=True, default=str)
+    return hashlib.sha256(inhoud.encode("utf-8")).hexdigest()
+
+
+class ResultaatCache:
+    """Tweelaagse LRU-cache: in het geheugen en optioneel als pickle-bestanden op schijf."""
+
+    def __init__(self, max_items: int = STANDAARD_MAX_ITEMS, map: Optional[str] = STANDAARD_MAP,
+                 max_schijf_items: int = STANDAARD_MAX_SCHIJF_ITEMS):
+        """
+        Initialiseert de cache.
+
+        Args:
+            max_items: Maximaal aantal resultaten in het geheugen
+            map: Map voor de schijflaag; None schakelt de schijflaag uit
+            max_schijf_items: Maximaal aantal resultaten op schijf
+        """
+        self.max_items = max_items
+        self.map = map
+        self.max_schijf_items = max_schijf_items
+        self._items: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.map:
+            os.makedirs(self.map, exist_ok=True)
+
+    def _schijf_pad(self, sleutel: str) -> str:
+        return os.path.join(self.map, f"{sleutel}.pkl")
+
+    def _bewaar_in_geheugen(self, sleutel: str, waarde: Any):
+        with self._lock:
+            self._items[sleutel] = waarde
+            self._items.move_to_end(sleutel)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def haal(self, sleutel: str, standaard: Any = None) -> Any:
+        """Geeft het resultaat voor een sleutel, of de standaardwaarde als het er niet is."""
+        with self._lock:
+            if sleutel in self._items:
+                self._items.move_to_end(sleutel)
+                return self._items[sleutel]
+
+        if not self.map:
+            return standaard
+        pad = self._schijf_pad(sleutel)
+        try:
+            with open(pad, "rb") as f:
+                waarde = pickle.load(f)
+            # Bijwerken van de wijzigingstijd houdt de LRU-volgorde op schijf bij
+            os.utime(pad)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return standaard
+        self._bewaar_in_geheugen(sleutel, waarde)
+        return waarde
+
+    def zet(self, sleutel: str, waarde: Any):
+        """Slaat een resultaat op in beide lagen."""
+        self._bewaar_in_geheugen(sleutel, waarde)
+        if not self.map:
+            return
+
+        tijdelijk_pad = f"{self._schijf_pad(sleutel)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tijdelijk_pad, "wb") as f:
+            pickle.dump(waarde, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tijdelijk_pad, self._schijf_pad(sleutel))
+        self._ruim_schijf_op()
+
+    def _ruim_schijf_op(self):
+        """Verwijdert de minst recent gebruikte bestanden als de schijflaag te groot wordt."""
+        bestanden = []
+        for naam in os.listdir(self.map):
+            if not naam.endswith(".pkl"):
+                continue
+            pad = os.path.join(self.map, naam)
+            try:
+                bestanden.append((os.path.getmtime(pad), pad))
+            except OSError:
+                continue
+        if len(bestanden) <= self.max_schijf_items:
+            return
+        bestanden.sort()
+        for _, pad in bestanden[:len(bestanden) - self.max_schijf_items]:
+            try:
+                os.remove(pad)
+            except OSError:
+                pass
+
+    def bereken(self, sleutel: str, functie: Callable[[], Any]) -> Any:
+        """
+        Geeft het gecachte resultaat, of berekent en bewaart het als het er nog niet is.
+
+        Args:
+            sleutel: Cachesleutel, zie maak_sleutel
+            functie: Functie zonder argumenten die het resultaat berekent
+        """
+        ontbreekt = object()
+        waarde = self.haal(sleutel, ontbreekt)
+        if waarde is ontbreekt:
+            waarde = functie()
+            self.zet(sleutel, waarde)
+        return waarde
+
+
+# Gedeelde cache voor alle sessies in dit proces
+resultaat_cache = ResultaatCache()
@@ -0,0 +1,57 @@
+"""
+Module voor het in een keer berekenen van Levenshtein-similariteitsmatrices.
+
+Iedere string wordt een keer genormaliseerd; de volledige matrix wordt daarna in
+een gebatchte, multi-threaded aanroep van rapidfuzz berekend.
+"""
+from typing import List, Sequence
+
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+
+from instrumentatie import tel
+
+
+def normaliseer(teksten: Sequence[str]) -> List[str]:
+    """Normaliseert strings voor vergelijking (kleine letters), een keer per string."""
+    return [tekst.lower() for tekst in teksten]
+
+
+def ratio_matrix(oud: Sequence[str], nieuw: Sequence[str], workers: int = -1) -> np.ndarray:
+    """
+    Berekent de Levenshtein-ratio voor ieder paar oud x nieuw.
+
+    De genormaliseerde Indel-similariteit is dezelfde maat als Levenshtein.ratio,
+    dus drempels uit de bestaande vergelijkingen blijven geldig.
+
+    Args:
+        oud: Strings uit het oude dossier (rijen)
+        nieuw: Strings uit het nieuwe dossier (kolommen)
+        workers: Aantal threads; -1 gebruikt alle CPU-kernen
+
+    Returns:
+        Matrix van vorm (len(oud), len(nieuw)) met scores tussen 0 en 1
+    """
+    if not oud or not nieuw:
+        return np.zeros((len(oud), len(nieuw)), dtype=np.float64)
+    tel("levenshtein_matrices")
+    tel("levenshtein_paren", len(oud) * len(nieuw))
+    return process.cdist(
+        normaliseer(oud), normaliseer(nieuw),
+        scorer=Indel.normalized_similarity, dtype=np.float64, workers=workers
+    )
+
+
+def rij_maxima(matrix: np.ndarray) -> np.ndarray:
+    """Hoogste score per rij; 0 als er geen kolommen zijn."""
+    if matrix.shape[1] == 0:
+        return np.zeros(matrix.shape[0])
+    return matrix.max(axis=1)
+
+
+def kolom_maxima(matrix: np.ndarray) -> np.ndarray:
+    """Hoogste score per kolom; 0 als er geen rijen zijn."""
+    if matrix.shape[0] == 0:
+        return np.zeros(matrix.shape[1])
+    return matrix.max(axis=0)
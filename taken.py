@@ -0,0 +1,205 @@
+"""
+Module voor het op de achtergrond uitvoeren van analyses, gedeeld door alle sessies in het proces.
+
+Een analyse wordt als taak ingediend onder een sleutel (de resultaatsleutel van de uploads).
+Taken draaien in een begrensde threadpool, zodat de Streamlit-scriptthread vrij blijft en een
+widgetklik de berekening niet herstart. Een tweede sessie die dezelfde sleutel indient krijgt de
+lopende taak in plaats van een nieuwe. Het resultaat komt in de resultaatcache en blijft een
+tijd bij de taak staan, zodat een latere rerun het kan ophalen.
+
+Voortgang en annuleren lopen via de stappen van instrumentatie.meet: bij iedere stapovergang
+wordt de voortgang bijgewerkt en gecontroleerd of de taak is geannuleerd. Met
+KD_INSTRUMENTATIE=0 kan een taak daarom alleen worden geannuleerd zolang hij nog wacht.
+
+Omgevingsvariabelen:
+    KD_TAAK_WORKERS: aantal gelijktijdig draaiende analyses (standaard 2)
+    KD_TAAK_BEWAAR: aantal afgeronde taken dat bewaard blijft (standaard 64)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence, Set
+
+from instrumentatie import Rapport, meting
+from resultaatcache import ResultaatCache, resultaat_cache
+
+STANDAARD_WORKERS = int(os.environ.get("KD_TAAK_WORKERS", "2"))
+STANDAARD_BEWAAR = int(os.environ.get("KD_TAAK_BEWAAR", "64"))
+
+WACHTEND = "wachtend"
+BEZIG = "bezig"
+KLAAR = "klaar"
+FOUT = "fout"
+GEANNULEERD = "geannuleerd"
+
+
+class TaakGeannuleerd(Exception):
+    """Wordt binnen een taak opgegooid bij de eerstvolgende stap nadat de taak is geannuleerd."""
+
+
+@dataclass
+class Taak:
+    """Een ingediende analyse met zijn status, voortgang en (uiteindelijk) resultaat."""
+    sleutel: str
+    naam: str
+    stappen: Sequence[str] = ()
+    status: str = WACHTEND
+    huidige_stap: str = ""
+    stap_index: int = 0
+    resultaat: Any = None
+    fout: Optional[BaseException] = None
+    rapport: Optional[Rapport] = None
+    ingediend: float = field(default_factory=time.time)
+    afgerond: Optional[float] = None
+    sessies: Set[str] = field(default_factory=set)
+    _geannuleerd: threading.Event = field(default_factory=threading.Event, repr=False)
+    _klaar: threading.Event = field(default_factory=threading.Event, repr=False)
+    _future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def actief(self) -> bool:
+        return self.status in (WACHTEND, BEZIG)
+
+    @property
+    def voortgang(self) -> float:
+        """Geschatte voortgang tussen 0 en 1 op basis van de verwachte stappen."""
+        if self.status == KLAAR:
+            return 1.0
+        if not self.stappen:
+            return 0.0
+        return min(self.stap_index / len(self.stappen), 0.99)
+
+    def wacht(self, timeout: Optional[float] = None) -> bool:
+        """Wacht tot de taak is afgerond (klaar, fout of geannuleerd); False bij een timeout."""
+        return self._klaar.wait(timeout)
+
+    def _rond_af(self, status: str):
+        self.status, self.afgerond = status, time.time()
+        self._klaar.set()
+
+    def _bij_stap(self, pad: str):
+        if self._geannuleerd.is_set():
+            raise TaakGeannuleerd(self.naam)
+        self.huidige_stap = pad
+        # Alleen vooruit: substappen van een eerdere fase mogen de voortgang niet terugzetten
+        for index, stap in enumerate(self.stappen):
+            if pad == stap or pad.startswith(stap + "/"):
+                self.stap_index = max(self.stap_index, index + 1)
+
+
+class TaakBeheer:
+    """Begrensde pool voor analyses met deduplicatie op sleutel."""
+
+    def __init__(self, max_workers: int = STANDAARD_WORKERS, bewaar: int = STANDAARD_BEWAAR,
+                 cache: ResultaatCache = resultaat_cache):
+        """
+        Initialiseert het taakbeheer.
+
+        Args:
+            max_workers: Aantal analyses dat tegelijk mag draaien; de rest wacht in de wachtrij
+            bewaar: Aantal afgeronde taken dat wordt bewaard om later op te halen
+            cache: Resultaatcache waarin afgeronde resultaten worden opgeslagen
+        """
+        self.bewaar = bewaar
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analyse")
+        self._taken: "OrderedDict[str, Taak]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dien_in(self, sleutel: str, functie: Callable[[], Any], naam: str, sessie: str,
+                stappen: Sequence[str] = ()) -> Taak:
+        """
+        Geeft de taak voor een sleutel en start hem als hij nog niet loopt of klaar is.
+
+        Een resultaat dat al in de cache staat levert direct een afgeronde taak op.
+        Een eerder mislukte of geannuleerde taak wordt opnieuw gestart.
+
+        Args:
+            sleutel: Resultaatsleutel, zie resultaatcache.maak_sleutel
+            functie: Functie zonder argumenten die het resultaat berekent
+            naam: Naam van de analyse, voor rapport en logregels
+            sessie: Id van de indienende sessie
+            stappen: Verwachte stappen (paden uit instrumentatie) in volgorde, voor de voortgang
+        """
+        with self._lock:
+            taak = self._taken.get(sleutel)
+            if taak is not None and taak.status not in (FOUT, GEANNULEERD) and not taak._geannuleerd.is_set():
+                taak.sessies.add(sessie)
+                self._taken.move_to_end(sleutel)
+                return taak
+
+            taak = Taak(sleutel=sleutel, naam=naam, stappen=tuple(stappen), sessies={sessie})
+            ontbreekt = object()
+            waarde = self.cache.haal(sleutel, ontbreekt)
+            if waarde is not ontbreekt:
+                taak.resultaat = waarde
+                taak._rond_af(KLAAR)
+            else:
+                taak._future = self._pool.submit(self._voer_uit, taak, functie)
+            self._taken[sleutel] = taak
+            self._ruim_op()
+            return taak
+
+    def _voer_uit(self, taak: Taak, functie: Callable[[], Any]):
+        if taak._geannuleerd.is_set():
+            taak._rond_af(GEANNULEERD)
+            return
+        taak.status = BEZIG
+        status = FOUT
+        try:
+            with meting(taak.naam, bij_stap=taak._bij_stap) as rapport:
+                taak.rapport = rapport
+                resultaat = functie()
+            self.cache.zet(taak.sleutel, resultaat)
+            taak.resultaat, status = resultaat, KLAAR
+        except TaakGeannuleerd:
+            status = GEANNULEERD
+        except Exception as e:
+            taak.fout = e
+        finally:
+            taak._rond_af(status)
+
+    def haal(self, sleutel: str) -> Optional[Taak]:
+        """Geeft de taak voor een sleutel, of None als die er (niet meer) is."""
+        with self._lock:
+            return self._taken.get(sleutel)
+
+    def annuleer(self, sleutel: str, sessie: str) -> bool:
+        """
+        Meldt een sessie af bij een taak en annuleert de taak als geen andere sessie erop wacht.
+
+        Een wachtende taak wordt direct uit de wachtrij gehaald; een lopende taak stopt bij de
+        eerstvolgende stapovergang.
+
+        Returns:
+            True als de taak daadwerkelijk wordt geannuleerd
+        """
+        with self._lock:
+            taak = self._taken.get(sleutel)
+            if taak is None or not taak.actief:
+                return False
+            taak.sessies.discard(sessie)
+            if taak.sessies:
+                return False
+            taak._geannuleerd.set()
+            if taak._future is not None and taak._future.cancel():
+                taak._rond_af(GEANNULEERD)
+            return True
+
+    def aantal_actief(self) -> int:
+        """Aantal taken dat draait of in de wachtrij staat."""
+        with self._lock:
+            return sum(taak.actief for taak in self._taken.values())
+
+    def _ruim_op(self):
+        """Vergeet de oudste afgeronde taken boven de bewaargrens; lopende taken blijven altijd staan."""
+        afgerond = [sleutel for sleutel, taak in self._taken.items() if not taak.actief]
+        for sleutel in afgerond[:max(0, len(afgerond) - self.bewaar)]:
+            del self._taken[sleutel]
+
+
+# Gedeeld taakbeheer voor alle sessies in dit proces
+taak_beheer = TaakBeheer()
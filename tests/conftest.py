@@ -0,0 +1,15 @@
+"""
+Gemeenschappelijke instellingen voor de tests: de modules staan plat in de hoofdmap van de
+repository, en gedeelde caches en logregels mogen de omgeving van de ontwikkelaar niet raken.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TIJDELIJK = tempfile.mkdtemp(prefix="kd-tests-")
+os.environ.setdefault("KD_INSTRUMENTATIE_LOG", "uit")
+os.environ.setdefault("KD_EMBEDDING_CACHE", os.path.join(_TIJDELIJK, "embeddings"))
+os.environ.setdefault("KD_ARTEFACTEN", os.path.join(_TIJDELIJK, "artefacten"))
+os.environ.setdefault("KD_WERKPROCES_INDEX", os.path.join(_TIJDELIJK, "index"))
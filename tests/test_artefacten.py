@@ -0,0 +1,76 @@
+"""Verwijzingen, TTL en maximale omvang van de artefactopslag."""
+import os
+import time
+
+import pytest
+
+from artefacten import ArtefactOpslag
+
+
+@pytest.fixture
+def opslag(tmp_path):
+    return ArtefactOpslag(map=str(tmp_path), max_bytes=1024, ttl=0.05)
+
+
+def test_gedeeld_artefact_blijft_zolang_een_sessie_verwijst(opslag):
+    opslag.bewaar("a", "abc.pdf", b"x")
+    opslag.bewaar("b", "abc.pdf", b"x")
+    assert opslag.statistieken()["artefacten"] == 1
+
+    opslag.laat_los("a")
+    time.sleep(0.1)
+    opslag.raak_aan("b")
+    opslag.ruim_op()
+    assert opslag.haal("abc.pdf") == b"x"
+
+    opslag.laat_los("b")
+    time.sleep(0.1)
+    opslag.ruim_op()
+    assert opslag.haal("abc.pdf") is None
+    assert not os.path.exists(os.path.join(opslag.map, "abc.pdf"))
+
+
+def test_inactieve_sessie_laat_haar_verwijzingen_los(opslag):
+    opslag.bewaar("a", "abc.pdf", b"x")
+    time.sleep(0.1)
+    opslag.ruim_op()
+    # Eerst vervalt de sessie, daarna is het artefact zonder verwijzing ook verlopen
+    assert opslag.haal("abc.pdf") is None
+
+
+def test_artefact_zonder_eigenaar_verloopt(opslag):
+    opslag.bewaar(None, "abc.xlsx", b"x")
+    assert opslag.haal("abc.xlsx") == b"x"
+    time.sleep(0.1)
+    opslag.ruim_op()
+    assert opslag.haal("abc.xlsx") is None
+
+
+def test_boven_de_omvang_eerst_zonder_verwijzing(tmp_path):
+    opslag = ArtefactOpslag(map=str(tmp_path), max_bytes=1000, ttl=3600)
+    opslag.bewaar("a", "met.pdf", b"x" * 600)
+    opslag.bewaar(None, "zonder.xlsx", b"x" * 300)
+    opslag.bewaar("a", "nieuw.pdf", b"x" * 300)
+    assert opslag.haal("zonder.xlsx") is None
+    assert opslag.haal("met.pdf") is not None
+    assert opslag.haal("nieuw.pdf") is not None
+
+
+def test_bereken_maakt_alleen_bij_ontbreken(opslag):
+    aanroepen = []
+    for _ in range(2):
+        opslag.bereken("a", "rapport.xlsx", lambda: aanroepen.append(1) or b"data")
+    assert len(aanroepen) == 1
+
+
+def test_ongeldige_sleutel(opslag):
+    with pytest.raises(ValueError):
+        opslag.bewaar("a", "../buiten.pdf", b"x")
+
+
+def test_nieuw_proces_ruimt_restanten_op(tmp_path):
+    (tmp_path / "half.pdf.123.tmp").write_bytes(b"x")
+    (tmp_path / "abc.pdf").write_bytes(b"x")
+    opslag = ArtefactOpslag(map=str(tmp_path), ttl=3600)
+    assert opslag.haal("abc.pdf") == b"x"
+    assert not (tmp_path / "half.pdf.123.tmp").exists()
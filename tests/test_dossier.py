@@ -0,0 +1,42 @@
+"""Paginaselectie en het gestroomd uitlezen van werkprocesblokken."""
+from benchmarks.synthetisch import SynthetischeConfig, genereer_paar
+from dossier import (KENMERK_PATRONEN, STROOM_VANAF, GeparseerdDossier, Pagina, PaginaIndex, dossier_uit_tekst,
+                     is_inhoudsopgave)
+from inhoudsanalyse import extract_full_text, extract_werkprocesblokken, lees_werkprocesblokken
+
+
+def kolommen(blokken):
+    return blokken.codes, blokken.namen, blokken.teksten
+
+
+def test_stroom_met_alle_paginas_al_uitgelezen():
+    paginas, _ = genereer_paar(SynthetischeConfig(seed=7))
+    while len(paginas) < STROOM_VANAF + 10:
+        paginas = paginas + paginas
+    dossier = dossier_uit_tekst("\f".join(paginas))
+
+    blokken, lengte = lees_werkprocesblokken(dossier)
+
+    tekst = extract_full_text(dossier)
+    assert kolommen(blokken) == kolommen(extract_werkprocesblokken(tekst))
+    assert lengte == len(tekst.strip())
+
+
+def test_laatste_blok_loopt_door_tot_het_einde():
+    paginas, _ = genereer_paar(SynthetischeConfig(seed=3, extra_paginas=4))
+    index = PaginaIndex(
+        [frozenset(k for k, patroon in KENMERK_PATRONEN.items() if patroon.search(t)) for t in paginas],
+        [0 if is_inhoudsopgave(t) else len(t.strip()) for t in paginas]
+    )
+    eerste = index.paginas_met("werkprocesblok")[0]
+    # Alleen de pagina's vanaf het eerste blok zijn beschikbaar; de rest mag niet worden uitgelezen
+    dossier = GeparseerdDossier(
+        bron="synthetisch", index=index,
+        paginas=[Pagina(n, t, is_inhoudsopgave(t)) for n, t in enumerate(paginas, start=1) if n >= eerste]
+    )
+
+    blokken, lengte = lees_werkprocesblokken(dossier)
+
+    tekst = "\n".join(t for t in paginas if not is_inhoudsopgave(t))
+    assert kolommen(blokken) == kolommen(extract_werkprocesblokken(tekst))
+    assert lengte == len(tekst.strip())
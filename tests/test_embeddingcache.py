@@ -0,0 +1,53 @@
+"""Hits, misses en LRU-verwijdering van de embeddingcache op schijf."""
+import numpy as np
+import pytest
+
+from embeddingcache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache("testmodel", map=str(tmp_path), max_items=2)
+
+
+def vector(waarde):
+    return np.full((1, 4), waarde, dtype=np.float32)
+
+
+def test_miss_daarna_hit(cache):
+    assert cache.zoek(["a"]) == [None]
+    cache.sla_op(["a"], vector(1))
+    gevonden = cache.zoek(["a"])[0]
+    np.testing.assert_array_equal(gevonden, vector(1)[0])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_witruimte_geeft_dezelfde_sleutel(cache):
+    cache.sla_op(["een  tekst\n"], vector(1))
+    assert cache.zoek(["een tekst"])[0] is not None
+
+
+def test_minst_recent_gebruikte_wordt_verwijderd(cache):
+    cache.sla_op(["a", "b"], np.vstack([vector(1), vector(2)]))
+    cache.zoek(["a"])
+    cache.sla_op(["c"], vector(3))
+
+    a, b, c = cache.zoek(["a", "b", "c"])
+    assert b is None
+    np.testing.assert_array_equal(a, vector(1)[0])
+    np.testing.assert_array_equal(c, vector(3)[0])
+    assert cache.verwijderd == 1
+    assert cache.statistieken()["items"] == 2
+
+
+def test_andere_instantie_ziet_nieuwe_vectoren(tmp_path):
+    lezer = EmbeddingCache("testmodel", map=str(tmp_path), max_items=4)
+    schrijver = EmbeddingCache("testmodel", map=str(tmp_path), max_items=4)
+    assert lezer.zoek(["a"]) == [None]
+    schrijver.sla_op(["a"], vector(1))
+    assert lezer.zoek(["a"])[0] is not None
+
+
+def test_ander_model_deelt_niets(tmp_path):
+    EmbeddingCache("model-a", map=str(tmp_path)).sla_op(["a"], vector(1))
+    assert EmbeddingCache("model-b", map=str(tmp_path)).zoek(["a"]) == [None]
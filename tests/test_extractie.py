@@ -0,0 +1,71 @@
+"""Extractie via de tokenizer en de kolomtabellen tegenover de oorspronkelijke regex-extractie."""
+import pickle
+import re
+
+import pytest
+
+from benchmarks.synthetisch import SynthetischeConfig, genereer_paar
+from extractie import extracteer_kerntaken, extracteer_werkprocessen
+from inhoudsanalyse import extract_werkprocesblokken
+
+# De patronen van voor de tokenizer
+OUD_BLOKPATROON = r"(B\d+-K\d+-W\d+):\s*([^\n]+)"
+OUDE_CODEPATRONEN = {
+    "kerntaak": r"(B\d+-K\d+)\s+([^\n]+)",
+    "werkproces": r"(B\d+-K\d+-W\d+)\s+([^\n]+)"
+}
+
+
+def oude_werkprocesblokken(tekst):
+    matches = list(re.finditer(OUD_BLOKPATROON, tekst))
+    blokken = []
+    for i, match in enumerate(matches):
+        code = match.group(1).strip()
+        eind = matches[i + 1].start() if i + 1 < len(matches) else len(tekst)
+        blokken.append({
+            "code": code,
+            "kerntaak": "-".join(code.split("-")[:2]),
+            "naam": match.group(2).strip(),
+            "tekst": tekst[match.end():eind].strip(),
+            "deel": "Basisdeel" if code.startswith("B") else "Profieldeel" if code.startswith("P") else "Algemeen"
+        })
+    return blokken
+
+
+def oude_codes(tekst, soort):
+    return [{"code": code.strip(), "naam": naam.strip()} for code, naam in re.findall(OUDE_CODEPATRONEN[soort], tekst)]
+
+
+def dossierteksten():
+    for seed in range(6):
+        for paginas in genereer_paar(SynthetischeConfig(seed=seed)):
+            yield "\n".join(paginas)
+
+
+@pytest.mark.parametrize("tekst", list(dossierteksten()))
+def test_werkprocesblokken_gelijk_aan_regex(tekst):
+    blokken = extract_werkprocesblokken(tekst)
+    assert len(blokken) > 0
+    assert [blok.als_dict() for blok in blokken] == oude_werkprocesblokken(tekst)
+
+
+@pytest.mark.parametrize("tekst", list(dossierteksten()))
+def test_codes_gelijk_aan_regex(tekst):
+    assert [regel.als_dict() for regel in extracteer_kerntaken(tekst)] == oude_codes(tekst, "kerntaak")
+    assert [regel.als_dict() for regel in extracteer_werkprocessen(tekst)] == oude_codes(tekst, "werkproces")
+
+
+def test_bloktabel_pickle_bewaart_rijen():
+    tekst = next(dossierteksten())
+    blokken = extract_werkprocesblokken(tekst)
+    kopie = pickle.loads(pickle.dumps(blokken))
+    assert [blok.als_dict() for blok in kopie] == [blok.als_dict() for blok in blokken]
+    # Alleen de blokteksten gaan mee, niet de hele dossiertekst
+    assert len(kopie.tekst) < len(tekst)
+
+
+def test_bloktekst_loopt_tot_de_volgende_kop():
+    tekst = "B1-K1-W1: Plant werkzaamheden\nDe beveiliger plant.\nB1-K1-W2: Voert uit\nHij voert uit."
+    blokken = extract_werkprocesblokken(tekst)
+    assert blokken.codes == ["B1-K1-W1", "B1-K1-W2"]
+    assert blokken.teksten == ["De beveiliger plant.", "Hij voert uit."]
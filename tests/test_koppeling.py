@@ -0,0 +1,75 @@
+"""Volgorde en uitkomst van de stappen van koppel_trapsgewijs, met een vaste similariteitsmatrix."""
+import numpy as np
+
+import inhoudsanalyse
+from blokken import BlokTabel
+from inhoudsanalyse import (KOPPELING_NAAM, KOPPELING_SEMANTISCH, KOPPELING_TEKST, _rapport_tabellen,
+                            koppel_trapsgewijs)
+
+
+def tabel(*rijen):
+    codes, namen, teksten = zip(*rijen)
+    return BlokTabel.van_teksten(codes, namen, teksten)
+
+
+def test_identieke_tekst_gaat_voor_naam_en_semantiek():
+    oud = tabel(("B1-K1-W1", "Plant", "Plant de dienst."), ("B1-K1-W2", "Voert uit", "Voert de dienst uit."))
+    # W1 is hernoemd en hernummerd, W2 heeft de naam van het oude W1 gekregen
+    nieuw = tabel(("B1-K1-W2", "Plant", "Voert de dienst  uit."), ("B1-K1-W3", "Maakt planning", "Plant de dienst."))
+    # De matrix zou semantisch juist de verkeerde paren kiezen
+    matrix = np.array([[0.99, 0.1], [0.1, 0.99]], dtype=np.float32)
+
+    koppelingen = koppel_trapsgewijs(oud, nieuw, matrix=matrix)
+
+    assert [(i, j, stap) for i, j, _, stap in koppelingen] == [(0, 1, KOPPELING_TEKST), (1, 0, KOPPELING_TEKST)]
+    assert all(score == 1.0 for _, _, score, _ in koppelingen)
+
+
+def test_naam_gaat_voor_semantiek():
+    oud = tabel(("B1-K1-W1", "Plant", "Plant de dienst."), ("B1-K1-W2", "Voert uit", "Voert de dienst uit."))
+    nieuw = tabel(("B1-K1-W1", "Voert uit", "Voert het werk uit."), ("B1-K1-W2", "Plant", "Plant het werk."))
+    matrix = np.array([[0.9, 0.7], [0.8, 0.95]], dtype=np.float32)
+
+    koppelingen = koppel_trapsgewijs(oud, nieuw, matrix=matrix)
+
+    assert koppelingen == [(0, 1, float(matrix[0, 1]), KOPPELING_NAAM), (1, 0, float(matrix[1, 0]), KOPPELING_NAAM)]
+
+
+def test_semantisch_alleen_voor_de_rest():
+    oud = tabel(("B1-K1-W1", "Plant", "Plant de dienst."), ("B1-K1-W2", "Voert uit", "Voert de dienst uit."))
+    nieuw = tabel(("B1-K1-W1", "Plant", "Plant het werk."), ("B1-K1-W5", "Werkt uit", "Werkt de dienst uit."))
+    matrix = np.array([[0.9, 0.2], [0.3, 0.8]], dtype=np.float32)
+
+    koppelingen = koppel_trapsgewijs(oud, nieuw, matrix=matrix)
+
+    assert koppelingen[0][1:] == (0, float(matrix[0, 0]), KOPPELING_NAAM)
+    assert koppelingen[1][1:] == (1, float(matrix[1, 1]), KOPPELING_SEMANTISCH)
+
+
+def test_zonder_voorkoppelen_alles_semantisch():
+    oud = tabel(("B1-K1-W1", "Plant", "Plant de dienst."))
+    nieuw = tabel(("B1-K1-W1", "Plant", "Plant de dienst."))
+    koppelingen = koppel_trapsgewijs(oud, nieuw, matrix=np.array([[0.97]], dtype=np.float32), voorkoppelen=False)
+    assert koppelingen[0][3] == KOPPELING_SEMANTISCH
+
+
+def test_naam_zonder_tekst_wordt_niet_gekoppeld():
+    oud = tabel(("B1-K1-W1", "Plant", "Plant de dienst."), ("B1-K1-W2", "Voert uit", "Voert de dienst uit."))
+    nieuw = tabel(("B1-K1-W1", "Plant", ""), ("B1-K1-W2", "Voert uit", "Voert het werk uit."))
+    # Lege teksten hebben geen vector en dus NaN, zoals in bereken_similariteitsmatrix
+    matrix = np.array([[np.nan, 0.3], [np.nan, 0.5]], dtype=np.float32)
+
+    koppelingen = koppel_trapsgewijs(oud, nieuw, matrix=matrix)
+
+    assert koppelingen[0][1] is None
+    # Onder de drempel, maar dezelfde naam: blijft gekoppeld, de score bepaalt de impact
+    assert koppelingen[1][1:] == (1, float(matrix[1, 1]), KOPPELING_NAAM)
+    df, _ = _rapport_tabellen(oud, nieuw, koppelingen)
+    assert not df["Analyse"].str.contains("nan").any()
+    assert sorted(df["Impact"]) == ["Gewijzigd", "Toegevoegd", "Verwijderd"]
+
+
+def test_vergelijk_inhoud_met_nulvector(monkeypatch):
+    monkeypatch.setattr(inhoudsanalyse, "encodeer_teksten",
+                        lambda teksten: np.array([[0.0, 0.0], [1.0, 0.0]], dtype=np.float32))
+    assert inhoudsanalyse.vergelijk_inhoud("", "tekst") == 0.0
@@ -0,0 +1,81 @@
+"""Deduplicatie en annuleren van achtergrondtaken."""
+import threading
+
+import pytest
+
+from instrumentatie import meet
+from resultaatcache import ResultaatCache
+from taken import GEANNULEERD, KLAAR, TaakBeheer
+
+
+@pytest.fixture
+def beheer():
+    return TaakBeheer(max_workers=1, cache=ResultaatCache(map=None))
+
+
+def geblokkeerde_taak(gestart, door):
+    def functie():
+        with meet("eerste"):
+            gestart.set()
+            door.wait(5)
+        with meet("tweede"):
+            return 42
+    return functie
+
+
+def test_zelfde_sleutel_geeft_dezelfde_taak(beheer):
+    gestart, door = threading.Event(), threading.Event()
+    taak = beheer.dien_in("k", geblokkeerde_taak(gestart, door), "analyse", "sessie-1")
+    assert beheer.dien_in("k", lambda: 0, "analyse", "sessie-2") is taak
+    assert taak.sessies == {"sessie-1", "sessie-2"}
+    door.set()
+    assert taak.wacht(5)
+    assert (taak.status, taak.resultaat) == (KLAAR, 42)
+
+
+def test_resultaat_komt_uit_de_cache(beheer):
+    beheer.dien_in("k", lambda: 7, "analyse", "sessie-1").wacht(5)
+    beheer._taken.clear()
+    taak = beheer.dien_in("k", lambda: pytest.fail("niet opnieuw berekenen"), "analyse", "sessie-2")
+    assert (taak.status, taak.resultaat) == (KLAAR, 7)
+
+
+def test_annuleren_pas_als_de_laatste_sessie_afhaakt(beheer):
+    gestart, door = threading.Event(), threading.Event()
+    taak = beheer.dien_in("k", geblokkeerde_taak(gestart, door), "analyse", "sessie-1")
+    beheer.dien_in("k", lambda: 0, "analyse", "sessie-2")
+    assert gestart.wait(5)
+
+    assert beheer.annuleer("k", "sessie-1") is False
+    assert taak.actief
+    assert beheer.annuleer("k", "sessie-2") is True
+
+    # Een lopende taak stopt bij de eerstvolgende stap
+    door.set()
+    assert taak.wacht(5)
+    assert taak.status == GEANNULEERD
+    assert taak.resultaat is None
+
+
+def test_wachtende_taak_wordt_direct_geannuleerd(beheer):
+    gestart, door = threading.Event(), threading.Event()
+    eerste = beheer.dien_in("k1", geblokkeerde_taak(gestart, door), "analyse", "sessie-1")
+    wachtend = beheer.dien_in("k2", lambda: 1, "analyse", "sessie-1")
+    assert beheer.annuleer("k2", "sessie-1") is True
+    assert wachtend.status == GEANNULEERD
+    door.set()
+    assert eerste.wacht(5)
+
+
+def test_geannuleerde_taak_start_opnieuw(beheer):
+    gestart, door = threading.Event(), threading.Event()
+    taak = beheer.dien_in("k", geblokkeerde_taak(gestart, door), "analyse", "sessie-1")
+    assert gestart.wait(5)
+    beheer.annuleer("k", "sessie-1")
+    door.set()
+    taak.wacht(5)
+
+    opnieuw = beheer.dien_in("k", lambda: 3, "analyse", "sessie-1")
+    assert opnieuw is not taak
+    assert opnieuw.wacht(5)
+    assert opnieuw.resultaat == 3
@@ -0,0 +1,32 @@
+"""Zoeken in een kleine werkprocesindex, exact en met geforceerd benaderd zoeken."""
+import numpy as np
+import pytest
+
+from blokken import BlokTabel
+from dossier import dossier_uit_tekst
+from inhoudsanalyse import vingerafdrukken
+from werkprocesindex import WerkprocesIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = WerkprocesIndex(model_naam="test", map=str(tmp_path))
+    codes = [f"B1-K1-W{i}" for i in range(1, 6)]
+    blokken = BlokTabel.van_teksten(codes, [f"Werkproces {i}" for i in range(1, 6)],
+                                    [f"Tekst van werkproces {i}." for i in range(1, 6)])
+    vectoren = dict(zip(vingerafdrukken(blokken), np.eye(5, 8, dtype=np.float32)))
+    index.voeg_toe(dossier_uit_tekst("Crebo 12345"), dossier_id="dossier", vectoren=vectoren, blokken=blokken)
+    return index
+
+
+@pytest.mark.parametrize("benaderd", [False, True])
+def test_beste_werkproces_bovenaan(index, benaderd):
+    vraag = np.eye(5, 8, dtype=np.float32)[2]
+    resultaat = index.zoek_vector(vraag, k=3, benaderd=benaderd)
+    assert resultaat["Code"].iloc[0] == "B1-K1-W3"
+    assert resultaat["Score"].iloc[0] == 1.0
+
+
+def test_benaderd_zonder_actieve_rijen(tmp_path):
+    index = WerkprocesIndex(model_naam="test", map=str(tmp_path))
+    assert index.zoek_vector(np.ones(8), benaderd=True).empty
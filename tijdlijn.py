@@ -0,0 +1,241 @@
+"""
+Module voor het vergelijken van een reeks opeenvolgende versies van een kwalificatiedossier.
+
+Wie een kwalificatie door vier of vijf versies volgt (2016, 2019, 2021, 2024) zou met losse
+paarsgewijze runs van vergelijk_werkprocessen de tussenliggende versies twee keer uitlezen en
+encoderen. De tijdlijn leest iedere versie een keer uit en encodeert alle werkprocesblokken in
+een aanroep; de similariteitsmatrices van opeenvolgende versies (en desgewenst van alle paren)
+worden daarna uit die vectoren berekend, zonder het model nog aan te roepen. Het aantal te
+encoderen blokken groeit zo lineair met het aantal versies.
+
+De stamboom volgt ieder werkproces via de koppelingen tussen opeenvolgende versies: een rij per
+werkproces, met zijn code in iedere versie en de impact van iedere overgang.
+
+Gebruik:
+    python tijdlijn.py 2016.pdf 2019.pdf 2021.pdf 2024.pdf [--namen 2016 2019 2021 2024]
+                       [--alle-paren] [--drempel 0.6] [--uitvoer tijdlijn.xlsx]
+"""
+import argparse
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from blokken import BlokTabel
+from dossier import GeparseerdDossier, als_dossier
+from export import naar_excel
+from inhoudsanalyse import (KOPPELING_SEMANTISCH, _cosinus, _normaliseer, _rapport_tabellen, bepaal_impactscore,
+                            encodeer_teksten, koppel_trapsgewijs, lees_werkprocesblokken)
+from instrumentatie import meet, tel
+
+Koppelingen = List[Tuple[int, Optional[int], float, str]]
+
+
+@dataclass
+class Tijdlijn:
+    """
+    Uitkomst van vergelijk_tijdlijn.
+
+    Attributes:
+        versies: Namen van de versies, in volgorde
+        blokken: Werkprocesblokken per versie
+        koppelingen: Koppelingen per vergeleken paar (index oud, index nieuw), zie koppel_trapsgewijs
+        rapporten: Detail-DataFrame en samenvatting per vergeleken paar, zoals bij vergelijk_werkprocessen
+        stamboom: Een rij per werkproces met zijn code per versie en de impact per overgang
+    """
+    versies: List[str]
+    blokken: List[BlokTabel] = field(repr=False)
+    koppelingen: Dict[Tuple[int, int], Koppelingen] = field(repr=False)
+    rapporten: Dict[Tuple[int, int], Tuple[pd.DataFrame, pd.DataFrame]] = field(repr=False)
+    stamboom: pd.DataFrame = field(repr=False)
+
+    def naar_excel(self) -> bytes:
+        """Schrijft de stamboom en het detailrapport per vergeleken paar als tabbladen."""
+        bladen = {"Stamboom": self.stamboom}
+        for (a, b), (df, _) in self.rapporten.items():
+            bladen[_bladnaam(f"{self.versies[a]} - {self.versies[b]}", bladen)] = df
+        return naar_excel(bladen)
+
+
+def _bladnaam(naam: str, bestaand: Dict) -> str:
+    # Excel staat geen []:*?/\ toe en maximaal 31 tekens; dubbele namen krijgen een volgnummer
+    naam = re.sub(r"[\[\]:*?/\\]", "_", naam)[:31]
+    kandidaat, volgnummer = naam, 2
+    while kandidaat in bestaand:
+        kandidaat = f"{naam[:27]} ({volgnummer})"
+        volgnummer += 1
+    return kandidaat
+
+
+def _versienaam(bron: Union[str, GeparseerdDossier], positie: int) -> str:
+    pad = bron.bron if isinstance(bron, GeparseerdDossier) else getattr(bron, "name", bron)
+    if isinstance(pad, str) and pad:
+        return os.path.splitext(os.path.basename(pad))[0]
+    return f"Versie {positie + 1}"
+
+
+def _vectoren_per_versie(blokken: List[BlokTabel]) -> List[Tuple[np.ndarray, List[int]]]:
+    """
+    Encodeert de niet-lege blokteksten van alle versies in een aanroep.
+
+    Returns:
+        Per versie de genormaliseerde vectoren en de indices van de blokken waar ze bij horen
+    """
+    indices = [[i for i, tekst in enumerate(tabel.teksten) if tekst.strip()] for tabel in blokken]
+    teksten = [tabel.teksten[i] for tabel, rijen in zip(blokken, indices) for i in rijen]
+    vectoren = _normaliseer(encodeer_teksten(teksten)) if teksten else np.zeros((0, 0), dtype=np.float32)
+
+    per_versie, begin = [], 0
+    for rijen in indices:
+        per_versie.append((vectoren[begin:begin + len(rijen)], rijen))
+        begin += len(rijen)
+    return per_versie
+
+
+def _matrix(oud: Tuple[np.ndarray, List[int]], nieuw: Tuple[np.ndarray, List[int]],
+            vorm: Tuple[int, int]) -> np.ndarray:
+    """Similariteitsmatrix uit al berekende vectoren; NaN voor lege teksten, zoals bereken_similariteitsmatrix."""
+    matrix = np.full(vorm, np.nan, dtype=np.float32)
+    (oud_emb, oud_idx), (nieuw_emb, nieuw_idx) = oud, nieuw
+    if oud_idx and nieuw_idx:
+        matrix[np.ix_(oud_idx, nieuw_idx)] = _cosinus(oud_emb, nieuw_emb)
+    return matrix
+
+
+def bouw_stamboom(versies: Sequence[str], blokken: Sequence[BlokTabel],
+                  koppelingen: Dict[Tuple[int, int], Koppelingen]) -> pd.DataFrame:
+    """
+    Volgt ieder werkproces via de koppelingen tussen opeenvolgende versies.
+
+    Een werkproces dat in een latere versie nieuw is begint een eigen rij; een werkproces dat
+    verdwijnt houdt lege codes in de versies daarna.
+
+    Returns:
+        DataFrame met Naam (uit de laatste versie waarin het werkproces voorkomt), een kolom
+        Code <versie> per versie, een kolom <versie> → <versie> per overgang met de impact,
+        en de eerste en laatste versie waarin het werkproces voorkomt
+    """
+    # Iedere lijn is een lijst met per versie de blokindex, of None
+    lijnen: List[List[Optional[int]]] = [[i] + [None] * (len(versies) - 1) for i in range(len(blokken[0]))]
+    overgangen: List[Dict[int, Tuple[float, str]]] = [{} for _ in lijnen]
+    for k in range(len(versies) - 1):
+        per_oud = {i: (j, score, stap) for i, j, score, stap in koppelingen[(k, k + 1)]}
+        bereikt = set()
+        for lijn, overgang in zip(lijnen, overgangen):
+            if lijn[k] is None:
+                continue
+            j, score, stap = per_oud[lijn[k]]
+            if j is not None:
+                lijn[k + 1] = j
+                overgang[k] = (score, stap)
+                bereikt.add(j)
+        for j in range(len(blokken[k + 1])):
+            if j not in bereikt:
+                lijnen.append([None] * (k + 1) + [j] + [None] * (len(versies) - k - 2))
+                overgangen.append({})
+
+    rijen = []
+    for lijn, overgang in zip(lijnen, overgangen):
+        aanwezig = [k for k, i in enumerate(lijn) if i is not None]
+        laatste = aanwezig[-1]
+        rij = {"Naam": blokken[laatste].namen[lijn[laatste]]}
+        for k, versie in enumerate(versies):
+            rij[f"Code {versie}"] = blokken[k].codes[lijn[k]] if lijn[k] is not None else ""
+        for k in range(len(versies) - 1):
+            if lijn[k] is not None and lijn[k + 1] is not None:
+                score, stap = overgang[k]
+                impact = bepaal_impactscore(score)[1]
+                if stap != KOPPELING_SEMANTISCH:
+                    impact = f"{impact} ({stap.lower()})"
+            elif lijn[k] is not None:
+                impact = "Verwijderd"
+            elif lijn[k + 1] is not None:
+                impact = "Toegevoegd"
+            else:
+                impact = ""
+            rij[f"{versies[k]} → {versies[k + 1]}"] = impact
+        rij["Eerste versie"] = versies[aanwezig[0]]
+        rij["Laatste versie"] = versies[laatste]
+        rijen.append(rij)
+    return pd.DataFrame(rijen)
+
+
+@meet("vergelijk_tijdlijn")
+def vergelijk_tijdlijn(dossiers: Sequence[Union[str, GeparseerdDossier]], namen: Optional[Sequence[str]] = None,
+                       drempel: float = 0.6, alle_paren: bool = False) -> Tijdlijn:
+    """
+    Vergelijkt een reeks versies van een dossier, iedere versie een keer uitgelezen en ge-encodeerd.
+
+    Args:
+        dossiers: PDF-paden of geparseerde dossiers, van oud naar nieuw
+        namen: Namen van de versies; standaard de bestandsnamen
+        drempel: Minimale similariteit voor een semantische koppeling
+        alle_paren: Ook alle niet-opeenvolgende paren vergelijken (alleen voor de rapporten)
+
+    Returns:
+        De Tijdlijn met koppelingen, rapporten en stamboom
+    """
+    if len(dossiers) < 2:
+        raise ValueError("Een tijdlijn heeft minstens twee versies nodig.")
+    versies = list(namen) if namen else [_versienaam(bron, k) for k, bron in enumerate(dossiers)]
+    if len(versies) != len(dossiers):
+        raise ValueError(f"{len(versies)} namen opgegeven voor {len(dossiers)} versies.")
+    tel("tijdlijn_versies", len(dossiers))
+
+    blokken = []
+    with meet("werkprocesblokken"):
+        for versie, bron in zip(versies, dossiers):
+            tabel, lengte = lees_werkprocesblokken(als_dossier(bron))
+            if lengte < 1000:
+                raise ValueError(f"Versie {versie} bevat onvoldoende leesbare tekst.")
+            if not len(tabel):
+                raise ValueError(f"Geen werkprocessen gevonden in versie {versie}.")
+            blokken.append(tabel)
+
+    with meet("similariteitsmatrix"):
+        vectoren = _vectoren_per_versie(blokken)
+
+    paren = [(a, b) for a in range(len(versies)) for b in range(a + 1, len(versies)) if alle_paren or b == a + 1]
+    koppelingen, rapporten = {}, {}
+    for a, b in paren:
+        with meet("koppelen"):
+            matrix = _matrix(vectoren[a], vectoren[b], (len(blokken[a]), len(blokken[b])))
+            koppelingen[(a, b)] = koppel_trapsgewijs(blokken[a], blokken[b], drempel, matrix=matrix)
+        rapporten[(a, b)] = _rapport_tabellen(blokken[a], blokken[b], koppelingen[(a, b)])
+
+    with meet("stamboom"):
+        stamboom = bouw_stamboom(versies, blokken, koppelingen)
+    return Tijdlijn(versies, blokken, koppelingen, rapporten, stamboom)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Volg de werkprocessen van een kwalificatie door opeenvolgende versies.")
+    parser.add_argument("pdf", nargs="+", help="PDF's van de versies, van oud naar nieuw")
+    parser.add_argument("--namen", nargs="+", help="Namen van de versies (standaard de bestandsnamen)")
+    parser.add_argument("--alle-paren", action="store_true", help="Ook niet-opeenvolgende versies vergelijken")
+    parser.add_argument("--drempel", type=float, default=0.6)
+    parser.add_argument("--uitvoer", default="tijdlijn.xlsx", help="Pad voor het Excel-rapport")
+    args = parser.parse_args(argv)
+
+    try:
+        tijdlijn = vergelijk_tijdlijn(args.pdf, args.namen, args.drempel, args.alle_paren)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    with open(args.uitvoer, "wb") as f:
+        f.write(tijdlijn.naar_excel())
+    print(tijdlijn.stamboom.to_string(index=False))
+    if args.alle_paren:
+        for (a, b), (_, samenvatting) in tijdlijn.rapporten.items():
+            print(f"\n{tijdlijn.versies[a]} → {tijdlijn.versies[b]}\n{samenvatting.to_string(index=False)}")
+    print(f"Rapport geschreven naar {args.uitvoer}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Module met een tokenizer die de tekst van een kwalificatiedossier in een keer doorloopt.
+
+Een voorgecompileerde ankerexpressie vindt alle plekken waar een metadataveld, kop of
+code kan beginnen. Alleen op die plekken wordt het bijbehorende patroon verankerd
+geprobeerd, zodat de tekst een keer wordt gescand in plaats van een keer per patroon.
+De tokens komen overeen met wat de losse re.search/re.findall-aanroepen opleverden.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+
+class Token(NamedTuple):
+    """Een gevonden kop, code of metadataveld met zijn positie in de tekst."""
+    soort: str
+    start: int
+    eind: int
+    waarden: Tuple[str, ...]
+
+
+@lru_cache(maxsize=None)
+def sectie_patroon(titel: str) -> Pattern:
+    """Patroon voor een tekstsectie onder een kop, tot de eerstvolgende witregel."""
+    return re.compile(rf"{titel}\n+(.+?)(?:\n\n|\Z)", re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def opsomming_patroon(kop: str) -> Pattern:
+    """Patroon voor een opsomming onder een kop, tot de eerstvolgende witregel."""
+    return re.compile(rf"{kop}\n+(.*?)\n\n", re.DOTALL)
+
+
+CODE_ANKER = r"B\d+-K\d+"
+
+SECTIES = {
+    "context": "Context",
+    "beroepshouding": "Typerende beroepshouding",
+    "resultaat": "Resultaat van de beroepsgroep"
+}
+OPSOMMINGEN = {
+    "vakkennis_vaardigheden": "Vakkennis en vaardigheden"
+}
+
+# soort -> (anker, patroon, herhalend). Niet-herhalende soorten leveren alleen hun eerste
+# voorkomen op (zoals re.search), herhalende soorten alle niet-overlappende (zoals re.findall).
+PATRONEN: Dict[str, Tuple[str, Pattern, bool]] = {
+    "crebonr_dossier": ("Crebonummer kwalificatie", re.compile(r"Crebonummer kwalificatiedossier\s*:?\s*(\d+)"), False),
+    "crebonr_kwalificatie": ("Crebonummer kwalificatie", re.compile(r"Crebonummer kwalificatie\s*:?\s*(\d+)"), False),
+    "naam_kwalificatie": ("Naam kwalificatie", re.compile(r"Naam kwalificatie\s*:?\s*(.+)"), False),
+    "versie": ("Versie", re.compile(r"Versie\s*:?\s*([\w\-/]+)"), False),
+    "geldig_vanaf": ("Geldig vanaf", re.compile(r"Geldig vanaf\s*:?\s*([\w\-/]+)"), False),
+    "kerntaak": (CODE_ANKER, re.compile(r"(B\d+-K\d+)\s+([^\n]+)"), True),
+    "werkproces": (CODE_ANKER, re.compile(r"(B\d+-K\d+-W\d+)\s+([^\n]+)"), True),
+    "werkprocesblok": (CODE_ANKER, re.compile(r"(B\d+-K\d+-W\d+):\s*([^\n]+)"), True),
+}
+for _soort, _titel in SECTIES.items():
+    PATRONEN[_soort] = (_titel, sectie_patroon(_titel), False)
+for _soort, _kop in OPSOMMINGEN.items():
+    PATRONEN[_soort] = (_kop, opsomming_patroon(_kop), False)
+
+ALLE_SOORTEN = frozenset(PATRONEN)
+
+
+@lru_cache(maxsize=None)
+def _ankerexpressie(soorten: FrozenSet[str]) -> Tuple[Pattern, Dict[str, Tuple[str, ...]]]:
+    """
+    Bouwt de gecombineerde ankerexpressie voor een verzameling soorten.
+
+    De expressie heeft bewust geen groepen: alleen dan kan re op de mogelijke eerste
+    tekens voorfilteren. Welke soorten bij een anker horen volgt uit de gevonden tekst.
+
+    Returns:
+        De gecompileerde expressie en per letterlijk anker (of CODE_ANKER) de bijbehorende soorten
+    """
+    ankers: Dict[str, List[str]] = {}
+    for soort in PATRONEN:
+        if soort in soorten:
+            ankers.setdefault(PATRONEN[soort][0], []).append(soort)
+    expressie = re.compile("|".join(ankers))
+    return expressie, {anker: tuple(groep) for anker, groep in ankers.items()}
+
+
+def tokeniseer(tekst: str, soorten: Optional[Iterable[str]] = None) -> List[Token]:
+    """
+    Doorloopt de tekst een keer en levert alle gevonden tokens in tekstvolgorde.
+
+    Zodra een niet-herhalende soort (metadata, sectiekop) is gevonden, verdwijnt zijn anker
+    uit de expressie; de rest van de tekst wordt dan alleen nog op codes gescand.
+
+    Args:
+        tekst: Volledige tekst van een dossier
+        soorten: Te zoeken soorten (sleutels van PATRONEN); standaard alle
+
+    Returns:
+        Lijst van tokens, gesorteerd op positie
+    """
+    open_soorten = ALLE_SOORTEN if soorten is None else frozenset(soorten)
+    tokens = []
+    laatste_eind = {soort: 0 for soort in open_soorten}
+    positie = 0
+
+    while open_soorten:
+        expressie, soorten_per_anker = _ankerexpressie(open_soorten)
+        opnieuw_bouwen = False
+        for anker in expressie.finditer(tekst, positie):
+            positie = anker.end()
+            gevonden_tekst = anker.group()
+            groep = soorten_per_anker.get(gevonden_tekst) or soorten_per_anker[CODE_ANKER]
+            for soort in groep:
+                _, patroon, herhalend = PATRONEN[soort]
+                if anker.start() < laatste_eind[soort]:
+                    continue
+                match = patroon.match(tekst, anker.start())
+                if not match:
+                    continue
+                tokens.append(Token(soort, match.start(), match.end(), match.groups()))
+                laatste_eind[soort] = match.end()
+                if not herhalend:
+                    open_soorten = open_soorten - {soort}
+                    opnieuw_bouwen = True
+            if opnieuw_bouwen:
+                break
+        else:
+            break
+    return tokens
+
+
+def eerste(tokens: Iterable[Token], soort: str) -> Optional[Token]:
+    """Geeft het eerste token van een soort, of None."""
+    return next((token for token in tokens if token.soort == soort), None)
+
+
+def van_soort(tokens: Iterable[Token], soort: str) -> List[Token]:
+    """Geeft alle tokens van een soort, in tekstvolgorde."""
+    return [token for token in tokens if token.soort == soort]
@@ -0,0 +1,447 @@
+"""
+Module voor een persistente vectorindex over de werkprocessen van alle geanalyseerde dossiers.
+
+Hiermee kan over het hele corpus worden gezocht welke werkprocessen op een gegeven tekst of
+werkproces lijken, zonder ieder dossier paarsgewijs te vergelijken. Per modelvariant staan de
+genormaliseerde embeddings in een memory-mapped matrix (vectoren.npy) en de gegevens per rij
+(dossier, crebo, code, kerntaak, naam) in metadata.json.
+
+Dossiers worden incrementeel toegevoegd. Een dossier dat opnieuw wordt toegevoegd met andere
+inhoud vervangt zijn eerdere rijen; die worden als inactief gemarkeerd en bij gelegenheid
+opgeruimd. Zoeken gebeurt tot KD_INDEX_BENADERD_VANAF rijen exact (een matrix-vectorproduct);
+daarboven via een inverted-file-index: de vectoren worden in clusters verdeeld en alleen de
+clusters het dichtst bij de zoekvraag worden doorzocht.
+
+Omgevingsvariabelen:
+    KD_WERKPROCES_INDEX: basismap van de index
+    KD_INDEX_BENADERD_VANAF: aantal rijen vanaf waar benaderd wordt gezocht (standaard 20000)
+    KD_INDEX_NPROBE: aantal te doorzoeken clusters; 0 kiest zelf op basis van het aantal clusters
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from blokken import BlokTabel
+from dossier import GeparseerdDossier, als_dossier
+from extractie import extracteer_metadata
+from inhoudsanalyse import _normaliseer, encodeer_teksten, lees_werkprocesblokken, vingerafdrukken
+from instrumentatie import meet, tel
+from modelbeheer import MODEL_VARIANT
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows heeft geen fcntl
+    fcntl = None
+
+STANDAARD_MAP = os.environ.get(
+    "KD_WERKPROCES_INDEX",
+    os.path.join(os.path.expanduser("~"), ".cache", "kd-inhoudsanalyse", "werkprocesindex")
+)
+BENADERD_VANAF = int(os.environ.get("KD_INDEX_BENADERD_VANAF", "20000"))
+STANDAARD_NPROBE = int(os.environ.get("KD_INDEX_NPROBE", "0"))
+
+START_CAPACITEIT = 1024
+FRAGMENT_LENGTE = 300
+RESULTAAT_KOLOMMEN = ["Score", "Dossier", "Crebo", "Kwalificatie", "Code", "Kerntaak", "Naam", "Fragment"]
+
+
+def _dossier_gegevens(dossier: GeparseerdDossier, dossier_id: Optional[str]) -> Dict:
+    """Bepaalt id en beschrijvende gegevens van een dossier uit zijn metadata."""
+    metadata = extracteer_metadata(dossier.selectie("metadata").tekst)
+    crebo = metadata["crebonr_kwalificatie"] if metadata["crebonr_kwalificatie"] != "-" else metadata["crebonr_dossier"]
+    if dossier_id is None:
+        # Zonder crebo is de bestandsnaam het enige houvast; een nieuwe versie krijgt een eigen id
+        dossier_id = f"{crebo}:{metadata['versie']}" if crebo != "-" else os.path.basename(dossier.bron)
+    return {
+        "id": dossier_id,
+        "bron": os.path.basename(dossier.bron),
+        "crebo": crebo,
+        "kwalificatie": metadata["naam_kwalificatie"],
+        "versie": metadata["versie"]
+    }
+
+
+class _InvertedFile:
+    """Clusterindeling van de vectoren voor benaderd zoeken (sferische k-means)."""
+
+    def __init__(self, vectoren: np.ndarray, rijen: np.ndarray, iteraties: int = 10, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        # Nooit meer clusters dan rijen, bijv. bij benaderd zoeken in een kleine index
+        aantal_clusters = min(int(np.clip(np.sqrt(len(rijen)), 16, 1024)), len(rijen))
+        # Trainen op een steekproef houdt het bouwen binnen enkele seconden, ook bij veel rijen
+        steekproef = vectoren[np.sort(rng.choice(rijen, size=min(len(rijen), 64 * aantal_clusters), replace=False))]
+        centroiden = steekproef[rng.choice(len(steekproef), size=aantal_clusters, replace=False)].copy()
+        for _ in range(iteraties):
+            toewijzing = np.argmax(steekproef @ centroiden.T, axis=1)
+            for c in range(aantal_clusters):
+                leden = steekproef[toewijzing == c]
+                centroiden[c] = leden.sum(axis=0) if len(leden) else steekproef[rng.integers(len(steekproef))]
+            centroiden = _normaliseer(centroiden).astype(np.float32)
+
+        self.centroiden = centroiden
+        self.getrainde_rijen = len(rijen)
+        self.lijsten: List[List[int]] = [[] for _ in range(aantal_clusters)]
+        self.voeg_toe(vectoren, rijen)
+
+    def voeg_toe(self, vectoren: np.ndarray, rijen: Sequence[int]):
+        """Wijst rijen toe aan het dichtstbijzijnde cluster, in blokken om het geheugen te begrenzen."""
+        rijen = np.asarray(rijen)
+        for start in range(0, len(rijen), 8192):
+            blok = rijen[start:start + 8192]
+            for rij, cluster in zip(blok, np.argmax(vectoren[blok] @ self.centroiden.T, axis=1)):
+                self.lijsten[cluster].append(int(rij))
+
+    def kandidaten(self, vraag: np.ndarray, nprobe: int) -> np.ndarray:
+        """Geeft de rijen in de nprobe clusters die het meest op de zoekvraag lijken."""
+        nprobe = min(nprobe or max(8, len(self.lijsten) // 16), len(self.lijsten))
+        clusters = np.argpartition(-(self.centroiden @ vraag), nprobe - 1)[:nprobe]
+        return np.fromiter((rij for c in clusters for rij in self.lijsten[c]), dtype=np.int64)
+
+
+class WerkprocesIndex:
+    """Persistente index van genormaliseerde werkproces-embeddings met metadata, per modelvariant."""
+
+    def __init__(self, model_naam: str = MODEL_VARIANT, map: str = STANDAARD_MAP,
+                 benaderd_vanaf: int = BENADERD_VANAF, nprobe: int = STANDAARD_NPROBE):
+        """
+        Initialiseert de index; bestaande data wordt pas bij het eerste gebruik geladen.
+
+        Args:
+            model_naam: Modelvariant van de vectoren; iedere variant heeft een eigen submap
+            map: Basismap van de index
+            benaderd_vanaf: Aantal actieve rijen vanaf waar benaderd wordt gezocht
+            nprobe: Aantal te doorzoeken clusters bij benaderd zoeken; 0 kiest automatisch
+        """
+        self.model_naam = model_naam
+        self.map = os.path.join(map, re.sub(r"[^\w.-]+", "_", model_naam))
+        self.benaderd_vanaf = benaderd_vanaf
+        self.nprobe = nprobe
+
+        self._lock = threading.Lock()
+        self._metadata_mtime: Optional[int] = None
+        self._vectoren: Optional[np.memmap] = None
+        self._rijen: List[Dict] = []
+        self._dossiers: Dict[str, Dict] = {}
+        self._actief = np.zeros(0, dtype=bool)
+        self._dossier_per_rij: Optional[np.ndarray] = None
+        self._ivf: Optional[_InvertedFile] = None
+
+    @property
+    def _metadata_pad(self) -> str:
+        return os.path.join(self.map, "metadata.json")
+
+    @property
+    def _vectoren_pad(self) -> str:
+        return os.path.join(self.map, "vectoren.npy")
+
+    @contextmanager
+    def _bestandslock(self):
+        """Exclusieve lock over processen heen voor het wijzigen van de index."""
+        os.makedirs(self.map, exist_ok=True)
+        with open(os.path.join(self.map, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _laad(self):
+        """Laadt metadata en vectoren opnieuw als een ander proces de index heeft gewijzigd."""
+        try:
+            mtime = os.stat(self._metadata_pad).st_mtime_ns
+            if mtime == self._metadata_mtime:
+                return
+            with open(self._metadata_pad, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectoren = np.load(self._vectoren_pad, mmap_mode="r+")
+        except (OSError, ValueError):
+            # Nog geen (bruikbare) index: beginnen met een lege
+            return
+
+        self._metadata_mtime = mtime
+        self._vectoren = vectoren
+        self._rijen = meta["rijen"]
+        self._dossiers = meta["dossiers"]
+        self._actief = np.array([rij["actief"] for rij in self._rijen], dtype=bool)
+        self._dossier_per_rij = None
+        self._ivf = None
+
+    def _schrijf(self):
+        """Schrijft de metadata atomair weg; alleen aanroepen met de bestandslock."""
+        self._vectoren.flush()
+        meta = {"model": self.model_naam, "rijen": self._rijen, "dossiers": self._dossiers}
+        tijdelijk_pad = f"{self._metadata_pad}.{os.getpid()}.tmp"
+        with open(tijdelijk_pad, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tijdelijk_pad, self._metadata_pad)
+        self._metadata_mtime = os.stat(self._metadata_pad).st_mtime_ns
+
+    def _herschrijf_vectoren(self, capaciteit: int, dim: int, behoud: np.ndarray):
+        """Maakt een nieuw vectorbestand met de gegeven capaciteit en neemt de rijen uit behoud over."""
+        tijdelijk_pad = f"{self._vectoren_pad}.{os.getpid()}.tmp"
+        nieuw = np.lib.format.open_memmap(tijdelijk_pad, mode="w+", dtype=np.float32, shape=(capaciteit, dim))
+        if len(behoud):
+            nieuw[:len(behoud)] = self._vectoren[behoud]
+        nieuw.flush()
+        del nieuw
+        os.replace(tijdelijk_pad, self._vectoren_pad)
+        self._vectoren = np.load(self._vectoren_pad, mmap_mode="r+")
+
+    def _ruim_op(self):
+        """Verwijdert inactieve rijen zodra die de helft van de index beslaan."""
+        inactief = len(self._rijen) - int(self._actief.sum())
+        if inactief < 1024 or inactief * 2 < len(self._rijen):
+            return
+        behoud = np.flatnonzero(self._actief)
+        self._herschrijf_vectoren(self._vectoren.shape[0], self._vectoren.shape[1], behoud)
+        self._rijen = [self._rijen[i] for i in behoud]
+        self._actief = np.ones(len(self._rijen), dtype=bool)
+        self._dossier_per_rij = None
+        self._ivf = None
+
+    def voeg_toe(self, dossier: Union[str, GeparseerdDossier], dossier_id: Optional[str] = None,
+                 vectoren: Optional[Dict[str, Optional[np.ndarray]]] = None,
+                 blokken: Optional[BlokTabel] = None) -> int:
+        """
+        Voegt de werkprocessen van een dossier toe aan de index.
+
+        Een dossier dat al met dezelfde werkprocesblokken in de index staat wordt overgeslagen;
+        met andere blokken vervangt het zijn eerdere rijen.
+
+        Args:
+            dossier: Pad naar de PDF of een GeparseerdDossier
+            dossier_id: Id van het dossier; standaard crebo en versie uit de metadata
+            vectoren: Optioneel al berekende genormaliseerde vectoren per vingerafdruk
+                (zie WerkprocesToestand.vectoren), zodat die niet opnieuw worden opgezocht
+            blokken: Optioneel de al uitgelezen werkprocesblokken van het dossier (zie
+                WerkprocesToestand.blokken); anders worden ze gestroomd met lees_werkprocesblokken
+
+        Returns:
+            Het aantal toegevoegde rijen
+        """
+        dossier = als_dossier(dossier)
+        gegevens = _dossier_gegevens(dossier, dossier_id)
+        if blokken is None:
+            blokken, _ = lees_werkprocesblokken(dossier)
+        blokken = blokken.niet_leeg()
+        teksten = blokken.teksten
+        blok_vingerafdrukken = vingerafdrukken(blokken)
+        gegevens["vingerafdrukken"] = sorted(blok_vingerafdrukken)
+
+        with self._lock:
+            self._laad()
+            bekend = self._dossiers.get(gegevens["id"])
+            if bekend is not None and bekend["vingerafdrukken"] == gegevens["vingerafdrukken"]:
+                return 0
+
+        # Encoderen buiten de locks: dat kan even duren en andere processen moeten door kunnen
+        vectoren = dict(vectoren or {})
+        ontbrekend = [i for i, fp in enumerate(blok_vingerafdrukken) if vectoren.get(fp) is None]
+        nieuwe_vectoren = np.zeros((len(blokken), 0), dtype=np.float32)
+        with meet("index_toevoegen"):
+            if ontbrekend:
+                berekend = _normaliseer(encodeer_teksten([teksten[i] for i in ontbrekend]))
+                for i, vector in zip(ontbrekend, berekend):
+                    vectoren[blok_vingerafdrukken[i]] = vector
+            if len(blokken):
+                nieuwe_vectoren = np.vstack([vectoren[fp] for fp in blok_vingerafdrukken]).astype(np.float32)
+
+            with self._lock, self._bestandslock():
+                self._laad()
+                for i, rij in enumerate(self._rijen):
+                    if rij["dossier"] == gegevens["id"] and rij["actief"]:
+                        rij["actief"] = False
+                        self._actief[i] = False
+                if self._vectoren is not None:
+                    self._ruim_op()
+
+                if len(blokken):
+                    dim = nieuwe_vectoren.shape[1]
+                    begin = len(self._rijen)
+                    if self._vectoren is None or self._vectoren.shape[1] != dim:
+                        self._rijen, self._dossiers, self._actief, begin = [], {}, np.zeros(0, dtype=bool), 0
+                        self._vectoren = None
+                        self._herschrijf_vectoren(START_CAPACITEIT, dim, np.zeros(0, dtype=np.int64))
+                    if begin + len(blokken) > self._vectoren.shape[0]:
+                        capaciteit = max(2 * self._vectoren.shape[0], begin + len(blokken))
+                        self._herschrijf_vectoren(capaciteit, dim, np.arange(begin))
+                    self._vectoren[begin:begin + len(blokken)] = nieuwe_vectoren
+                    self._rijen.extend({
+                        "dossier": gegevens["id"],
+                        "crebo": gegevens["crebo"],
+                        "code": code,
+                        "kerntaak": kerntaak,
+                        "naam": naam,
+                        "fragment": " ".join(tekst.split())[:FRAGMENT_LENGTE],
+                        "actief": True
+                    } for code, kerntaak, naam, tekst in zip(blokken.codes, blokken.kerntaken, blokken.namen, teksten))
+                    self._actief = np.concatenate([self._actief, np.ones(len(blokken), dtype=bool)])
+                    self._dossier_per_rij = None
+                    if self._ivf is not None:
+                        self._ivf.voeg_toe(self._vectoren, range(begin, begin + len(blokken)))
+
+                self._dossiers[gegevens["id"]] = gegevens
+                if self._vectoren is not None:
+                    self._schrijf()
+        tel("index_rijen_toegevoegd", len(blokken))
+        return len(blokken)
+
+    def zoek_vector(self, vraag: np.ndarray, k: int = 10, uitsluiten_dossier: Optional[str] = None,
+                    benaderd: Optional[bool] = None) -> pd.DataFrame:
+        """
+        Geeft de k werkprocessen met de hoogste cosinus-similariteit met een vector.
+
+        Args:
+            vraag: Embedding van de zoekvraag (hoeft niet genormaliseerd te zijn)
+            k: Aantal resultaten
+            uitsluiten_dossier: Id van een dossier waarvan de werkprocessen niet meetellen
+            benaderd: Forceer exact (False) of benaderd (True) zoeken; standaard op grootte
+
+        Returns:
+            DataFrame met de kolommen uit RESULTAAT_KOLOMMEN, aflopend op score
+        """
+        vraag = np.asarray(vraag, dtype=np.float32).ravel()
+        vraag = vraag / np.linalg.norm(vraag)
+        with self._lock:
+            self._laad()
+            aantal = len(self._rijen)
+            if aantal == 0:
+                return pd.DataFrame(columns=RESULTAAT_KOLOMMEN)
+            masker = self._actief
+            if uitsluiten_dossier is not None:
+                if self._dossier_per_rij is None:
+                    self._dossier_per_rij = np.array([rij["dossier"] for rij in self._rijen])
+                masker = masker & (self._dossier_per_rij != uitsluiten_dossier)
+            if benaderd is None:
+                benaderd = int(self._actief.sum()) >= self.benaderd_vanaf
+
+            # Zonder actieve rijen valt er niets te clusteren; exact zoeken geeft dan een leeg resultaat
+            if benaderd and self._actief.any():
+                if self._ivf is None or aantal > 2 * self._ivf.getrainde_rijen:
+                    self._ivf = _InvertedFile(self._vectoren, np.flatnonzero(self._actief))
+                kandidaten = self._ivf.kandidaten(vraag, self.nprobe)
+                kandidaten = kandidaten[masker[kandidaten]]
+                scores = self._vectoren[kandidaten] @ vraag
+            else:
+                kandidaten = np.flatnonzero(masker)
+                scores = (self._vectoren[:aantal] @ vraag)[kandidaten]
+            tel("index_zoekvragen")
+
+            k = min(k, len(kandidaten))
+            if k == 0:
+                return pd.DataFrame(columns=RESULTAAT_KOLOMMEN)
+            beste = np.argpartition(-scores, k - 1)[:k]
+            beste = beste[np.argsort(-scores[beste], kind="stable")]
+            resultaten = []
+            for positie in beste:
+                rij = self._rijen[kandidaten[positie]]
+                dossier = self._dossiers.get(rij["dossier"], {})
+                resultaten.append([
+                    round(float(scores[positie]), 4), rij["dossier"], rij["crebo"], dossier.get("kwalificatie", "-"),
+                    rij["code"], rij["kerntaak"], rij["naam"], rij["fragment"]
+                ])
+        return pd.DataFrame(resultaten, columns=RESULTAAT_KOLOMMEN)
+
+    def zoek(self, tekst: str, k: int = 10, uitsluiten_dossier: Optional[str] = None) -> pd.DataFrame:
+        """Geeft de k werkprocessen die inhoudelijk het meest op een vrije tekst lijken."""
+        return self.zoek_vector(encodeer_teksten([tekst])[0], k, uitsluiten_dossier)
+
+    def zoek_werkproces(self, dossier_id: str, code: str, k: int = 10,
+                        ander_dossier: bool = True) -> pd.DataFrame:
+        """
+        Geeft de k werkprocessen die het meest lijken op een werkproces uit de index.
+
+        Args:
+            dossier_id: Id van het dossier van het werkproces
+            code: Code van het werkproces, bijv. B1-K1-W2
+            k: Aantal resultaten
+            ander_dossier: Alleen werkprocessen uit andere dossiers teruggeven
+        """
+        with self._lock:
+            self._laad()
+            positie = next(
+                (i for i, rij in enumerate(self._rijen)
+                 if rij["actief"] and rij["dossier"] == dossier_id and rij["code"] == code),
+                None
+            )
+            if positie is None:
+                raise KeyError(f"Werkproces {code} van dossier {dossier_id} staat niet in de index")
+            vraag = np.array(self._vectoren[positie])
+        resultaat = self.zoek_vector(vraag, k + (0 if ander_dossier else 1),
+                                     uitsluiten_dossier=dossier_id if ander_dossier else None)
+        if not ander_dossier:
+            resultaat = resultaat[~((resultaat["Dossier"] == dossier_id) & (resultaat["Code"] == code))].head(k)
+        return resultaat.reset_index(drop=True)
+
+    def dossiers(self) -> pd.DataFrame:
+        """Geeft een overzicht van de dossiers in de index met hun aantal werkprocessen."""
+        with self._lock:
+            self._laad()
+            aantallen: Dict[str, int] = {}
+            for rij in self._rijen:
+                if rij["actief"]:
+                    aantallen[rij["dossier"]] = aantallen.get(rij["dossier"], 0) + 1
+            return pd.DataFrame(
+                [[d["id"], d["crebo"], d["kwalificatie"], d["versie"], d["bron"], aantallen.get(d["id"], 0)]
+                 for d in self._dossiers.values()],
+                columns=["Dossier", "Crebo", "Kwalificatie", "Versie", "Bron", "Werkprocessen"]
+            )
+
+    def werkprocessen(self, dossier_id: str) -> List[Dict]:
+        """Geeft code en naam van de werkprocessen van een dossier in de index."""
+        with self._lock:
+            self._laad()
+            return [{"code": rij["code"], "naam": rij["naam"]}
+                    for rij in self._rijen if rij["actief"] and rij["dossier"] == dossier_id]
+
+    def statistieken(self) -> Dict:
+        """Geeft de omvang van de index en de zoekmethode die daarbij hoort."""
+        with self._lock:
+            self._laad()
+            actief = int(self._actief.sum())
+            return {
+                "dossiers": len(self._dossiers),
+                "werkprocessen": actief,
+                "inactieve_rijen": len(self._rijen) - actief,
+                "capaciteit": 0 if self._vectoren is None else int(self._vectoren.shape[0]),
+                "methode": "benaderd" if actief >= self.benaderd_vanaf else "exact"
+            }
+
+
+# Gedeelde index voor alle sessies in dit proces
+werkproces_index = WerkprocesIndex()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Beheer en doorzoek de werkprocesindex over alle dossiers.")
+    subparsers = parser.add_subparsers(dest="opdracht", required=True)
+    toevoegen = subparsers.add_parser("voeg-toe", help="Voeg de werkprocessen van dossiers toe")
+    toevoegen.add_argument("pdf", nargs="+")
+    zoeken = subparsers.add_parser("zoek", help="Zoek werkprocessen die op een tekst lijken")
+    zoeken.add_argument("tekst")
+    zoeken.add_argument("-k", type=int, default=10)
+    subparsers.add_parser("overzicht", help="Toon de dossiers in de index")
+    args = parser.parse_args(argv)
+
+    if args.opdracht == "voeg-toe":
+        for pad in args.pdf:
+            print(f"{pad}: {werkproces_index.voeg_toe(pad)} werkprocessen toegevoegd", file=sys.stderr)
+    elif args.opdracht == "zoek":
+        print(werkproces_index.zoek(args.tekst, args.k).to_string(index=False))
+    else:
+        print(werkproces_index.dossiers().to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())